@@ -0,0 +1 @@
+from . import session
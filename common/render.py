@@ -0,0 +1,737 @@
+import io
+import os
+import json
+import math
+import time
+import queue
+import asyncio
+import hashlib
+import weakref
+import pathlib
+import tempfile
+import functools
+import threading
+import collections
+import concurrent.futures
+from PIL import Image, ImageChops, ImageDraw, ImageFilter, ImageFont, ImageOps
+import playwright.sync_api
+import playwright.async_api
+
+IMAGE_FORMATS = {
+    "WEBP": {"suffix": ".webp", "options": {"method": 4}},
+    "JPEG": {"suffix": ".jpg", "options": {"optimize": True}},
+    "AVIF": {"suffix": ".avif", "options": {"speed": 8}},
+    "PNG": {"suffix": ".png", "options": {"compress_level": 6}}
+}
+encode_metrics = collections.deque(maxlen=100)
+
+def _encode(img, image_format, quality, scale=1.0) -> bytes:
+    if scale < 1:
+        img = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.LANCZOS)
+    options = dict(IMAGE_FORMATS[image_format]["options"])
+    if image_format != "PNG": options["quality"] = quality
+    output = io.BytesIO()
+    img.save(output, format=image_format, **options)
+    return output.getvalue()
+
+def _sample_bands(img, sample_pixels=512 * 512, bands=8):
+    band_height = max(16, sample_pixels // (img.width * bands) // 16 * 16)
+    if band_height * bands >= img.height:
+        return img
+    step = img.height // bands
+    sample = Image.new(img.mode, (img.width, band_height * bands))
+    for index in range(bands):
+        top = index * step + (step - band_height) // 2
+        sample.paste(img.crop((0, top, img.width, top + band_height)), (0, index * band_height))
+    return sample
+
+def _estimate_quality_and_scale(img, image_format, quality, scale, size, max_size_bytes, min_quality=30):
+    target_size = max_size_bytes * 0.9
+    if image_format == "PNG":
+        return quality, scale * (target_size / size) ** 0.5
+    
+    if scale < 1:
+        img = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.LANCZOS)
+    sample = _sample_bands(img)
+    ratio = size / len(_encode(sample, image_format, quality))
+    
+    low, high = min_quality, quality
+    while low < high:
+        middle = (low + high + 1) // 2
+        if len(_encode(sample, image_format, middle)) * ratio <= target_size: low = middle
+        else: high = middle - 1
+    
+    estimated_size = len(_encode(sample, image_format, low)) * ratio
+    if estimated_size > target_size:
+        scale *= (target_size / estimated_size) ** 0.5
+    return low, scale
+
+def encode_image(img, max_size_mb=9.5, image_format="WEBP", quality=95, min_quality=30, max_passes=5, strict=False) -> tuple[bytes, dict]:
+    started_at = time.perf_counter()
+    max_size_bytes = max_size_mb * 1024 * 1024
+    image_format = image_format.upper().replace("JPG", "JPEG")
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image format `{image_format}`")
+    if img.mode not in ["RGB", "RGBA", "L"]:
+        img = img.convert("RGBA")
+    
+    scale = 1.0
+    passes = 0
+    previous = None
+    while True:
+        if image_format == "JPEG" and img.mode == "RGBA":
+            img = img.convert("RGB")
+        try:
+            image_bytes = _encode(img, image_format, quality, scale)
+        except (OSError, ValueError, KeyError):
+            if image_format == "JPEG": raise
+            image_format = "JPEG"
+            continue
+        passes += 1
+        if len(image_bytes) <= max_size_bytes or passes >= max_passes: break
+        if passes == 1:
+            previous = (quality, scale, len(image_bytes))
+            quality, scale = _estimate_quality_and_scale(img, image_format, quality, scale, len(image_bytes), max_size_bytes, min_quality=min_quality)
+            continue
+        exponent = 2.0
+        if previous[0] == quality and previous[1] != scale:
+            exponent = min(2.0, max(0.5, math.log(len(image_bytes) / previous[2]) / math.log(scale / previous[1])))
+        previous = (quality, scale, len(image_bytes))
+        scale *= (max_size_bytes * 0.9 / len(image_bytes)) ** (1 / exponent)
+    
+    metrics = {
+        "format": image_format,
+        "quality": quality,
+        "scale": scale,
+        "size": len(image_bytes),
+        "passes": passes,
+        "fits": len(image_bytes) <= max_size_bytes,
+        "encode_time": time.perf_counter() - started_at
+    }
+    encode_metrics.append(metrics)
+    if strict and not metrics["fits"]:
+        raise ValueError(f"Could not encode image under {max_size_mb} MB in {passes} passes ({len(image_bytes)} bytes)")
+    return image_bytes, metrics
+
+def compress_image(image_path, max_size_mb=9.5, quality=95, image_format="WEBP", temp_dir=None):
+    if os.path.getsize(image_path) <= max_size_mb * 1024 * 1024:
+        return image_path
+    with Image.open(image_path) as img:
+        image_bytes, metrics = encode_image(img, max_size_mb=max_size_mb, image_format=image_format, quality=quality)
+    with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix=IMAGE_FORMATS[metrics["format"]]["suffix"], dir=temp_dir or os.path.dirname(os.path.abspath(image_path))) as tmp:
+        tmp.write(image_bytes)
+        return tmp.name
+
+def compress_image_bytes(image_bytes: bytes, max_size_mb=9.5, quality=95, image_format="WEBP") -> bytes:
+    if len(image_bytes) <= max_size_mb * 1024 * 1024:
+        return image_bytes
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        return encode_image(img, max_size_mb=max_size_mb, image_format=image_format, quality=quality)[0]
+
+class TemplateCache:
+    def __init__(self) -> None:
+        self._templates = {}
+
+    def get(self, template_path, key=None, compile=None):
+        stat = os.stat(template_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._templates.get((str(template_path), key))
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        with open(template_path, "r", encoding="utf-8") as f:
+            template = f.read()
+        if compile is not None:
+            template = compile(template)
+        self._templates[(str(template_path), key)] = (signature, template)
+        return template
+
+template_cache = TemplateCache()
+
+FONT_PATHS = ["NotoSansCJK-Regular.ttc", "NotoSansSC-Regular.otf", "msyh.ttc", "SegoeUI.ttf", "DejaVuSans.ttf"]
+BOLD_FONT_PATHS = ["NotoSansCJK-Bold.ttc", "NotoSansSC-Bold.otf", "msyhbd.ttc", "SegoeUIBold.ttf", "DejaVuSans-Bold.ttf"]
+
+@functools.lru_cache(maxsize=128)
+def load_font(size: int, bold: bool = False) -> ImageFont.FreeTypeFont:
+    for font_path in (BOLD_FONT_PATHS if bold else FONT_PATHS):
+        try:
+            return ImageFont.truetype(font_path, size, layout_engine=ImageFont.Layout.BASIC)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+@functools.lru_cache(maxsize=256)
+def rounded_mask(size: tuple, radius: float) -> Image.Image:
+    mask = Image.new("L", (size[0] * 4, size[1] * 4), 0)
+    ImageDraw.Draw(mask).rounded_rectangle((0, 0, size[0] * 4 - 1, size[1] * 4 - 1), radius=radius * 4, fill=255)
+    return mask.resize(size, Image.LANCZOS)
+
+class TileCache:
+    def __init__(self, max_items: int = 1024) -> None:
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._tiles = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, image_path, size: tuple, radius: float = 0, blur: float = 0, opacity: float = 1, fill=(34, 34, 34, 255)) -> Image.Image:
+        try:
+            signature = os.stat(image_path).st_mtime_ns
+        except OSError:
+            signature = None
+        key = (str(image_path), tuple(size), radius, blur, opacity)
+        with self._lock:
+            entry = self._tiles.get(key)
+            if entry is not None and entry[0] == signature:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        if signature is None:
+            tile = Image.new("RGBA", tuple(size), fill)
+        else:
+            with Image.open(image_path) as img:
+                tile = ImageOps.fit(img.convert("RGBA"), tuple(size), Image.LANCZOS)
+        if blur: tile = tile.filter(ImageFilter.GaussianBlur(blur))
+        if radius or opacity < 1:
+            alpha = tile.getchannel("A")
+            if opacity < 1: alpha = alpha.point(lambda value: int(value * opacity))
+            if radius: alpha = ImageChops.multiply(alpha, rounded_mask(tuple(size), radius))
+            tile.putalpha(alpha)
+
+        with self._lock:
+            self._tiles[key] = (signature, tile)
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.max_items:
+                self._tiles.popitem(last=False)
+        return tile
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"tiles": len(self._tiles), "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else None}
+
+tile_cache = TileCache()
+
+class RenderCache:
+    def __init__(self, cache_dir, max_memory_bytes: int = 64 * 1024 * 1024, max_disk_bytes: int = 512 * 1024 * 1024, ttl: float = 3600) -> None:
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory = collections.OrderedDict()
+        self._memory_bytes = 0
+        self._disk = collections.OrderedDict()
+        self._disk_bytes = 0
+        self._template_digests = {}
+        self._lock = threading.Lock()
+        
+        os.makedirs(cache_dir, exist_ok=True)
+        for entry in sorted(os.scandir(cache_dir), key=lambda entry: entry.stat().st_mtime):
+            if not entry.is_file() or entry.name.endswith(".tmp"): continue
+            stat = entry.stat()
+            self._disk[os.path.splitext(entry.name)[0]] = (entry.path, stat.st_mtime, stat.st_size)
+            self._disk_bytes += stat.st_size
+
+    def template_digest(self, template_path) -> str:
+        stat = os.stat(template_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._template_digests.get(str(template_path))
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        with open(template_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        self._template_digests[str(template_path)] = (signature, digest)
+        return digest
+
+    def make_key(self, template_path, data, locale: dict = None, window_size: tuple = None, image_format: str = "WEBP", max_size_mb: float = 9.5) -> str:
+        image_format = image_format.upper().replace("JPG", "JPEG")
+        payload = json.dumps([self.template_digest(template_path), locale, data, window_size, image_format, max_size_mb], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                self._memory_bytes -= len(self._memory.pop(key)[1])
+            elif entry is not None:
+                self._memory.move_to_end(key)
+                if key in self._disk: self._disk.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            path = self._get_disk_path(key)
+            if path is None:
+                self.misses += 1
+                return None
+            created_at = self._disk[key][1]
+        try:
+            with open(path, "rb") as f:
+                image_bytes = f.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self._put_memory(key, image_bytes, created_at)
+        return image_bytes
+
+    def get_path(self, key: str) -> str | None:
+        with self._lock:
+            path = self._get_disk_path(key)
+            if path is None: self.misses += 1
+            else: self.hits += 1
+            return path
+
+    def put(self, key: str, image_bytes: bytes, persist: bool = True) -> str | None:
+        if not persist or len(image_bytes) > self.max_disk_bytes:
+            with self._lock:
+                self._put_memory(key, image_bytes, time.time())
+            return None
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            path = os.path.join(self.cache_dir, key + IMAGE_FORMATS.get(img.format, {"suffix": ".img"})["suffix"])
+        with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix=".tmp", dir=self.cache_dir) as tmp:
+            tmp.write(image_bytes)
+        os.replace(tmp.name, path)
+        
+        created_at = time.time()
+        with self._lock:
+            if key in self._disk and self._disk[key][0] != path:
+                self._remove_disk(key)
+            elif key in self._disk:
+                self._disk_bytes -= self._disk.pop(key)[2]
+            self._disk[key] = (path, created_at, len(image_bytes))
+            self._disk_bytes += len(image_bytes)
+            while self._disk_bytes > self.max_disk_bytes:
+                self._remove_disk(next(iter(self._disk)))
+                self.evictions += 1
+            self._put_memory(key, image_bytes, created_at)
+        return path
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes
+            }
+
+    def _get_disk_path(self, key: str) -> str | None:
+        entry = self._disk.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[1] > self.ttl or not os.path.exists(entry[0]):
+            self._remove_disk(key)
+            return None
+        self._disk.move_to_end(key)
+        return entry[0]
+
+    def _remove_disk(self, key: str) -> None:
+        path, _, size = self._disk.pop(key)
+        self._disk_bytes -= size
+        self._memory_bytes -= len(self._memory.pop(key, (None, b""))[1])
+        if os.path.exists(path): os.remove(path)
+
+    def _put_memory(self, key: str, image_bytes: bytes, created_at: float) -> None:
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key)[1])
+        if len(image_bytes) > self.max_memory_bytes:
+            return
+        self._memory[key] = (created_at, image_bytes)
+        self._memory_bytes += len(image_bytes)
+        while self._memory_bytes > self.max_memory_bytes:
+            self._memory_bytes -= len(self._memory.popitem(last=False)[1][1])
+            self.evictions += 1
+
+SHELL_RENDER_SCRIPT = """async data => {
+    await window.renderData(data);
+    await Promise.all(Array.from(document.images).filter(img => !img.complete).map(img => new Promise(resolve => { img.onload = img.onerror = resolve; })));
+}"""
+
+def _shell_digest(html: str) -> str:
+    return hashlib.sha1(html.encode("utf-8")).hexdigest()
+
+def _base_url(temp_dir) -> str:
+    return pathlib.Path(temp_dir).resolve().as_uri() + "/"
+
+def _render_page(page, window_size, temp_dir, html=None, html_path=None, in_memory=False, data=None) -> str | bytes:
+    page.set_viewport_size({"width": window_size[0], "height": window_size[1]})
+    if data is not None:
+        page.evaluate(SHELL_RENDER_SCRIPT, data)
+    elif in_memory and html is not None:
+        if not page.url.startswith(_base_url(temp_dir)): page.goto(_base_url(temp_dir))
+        page.set_content(html, wait_until="load")
+    else:
+        temp_html_path = None
+        if html is not None:
+            with tempfile.NamedTemporaryFile(mode='w+t', delete=False, suffix=".html", dir=temp_dir) as tmp:
+                html_path = temp_html_path = tmp.name
+                with open(html_path, "w", encoding="utf-8") as f:
+                    f.write(html)
+
+        abs_html_path = os.path.abspath(html_path)
+        file_url = f"file://{abs_html_path}"
+
+        try:
+            page.goto(file_url, wait_until="load")
+        finally:
+            if temp_html_path is not None: os.remove(temp_html_path)
+
+    total_height = page.evaluate("document.body.scrollHeight")
+    page.set_viewport_size({"width": window_size[0], "height": total_height})
+    page.evaluate("document.body.style.overflow = 'hidden';")
+
+    if in_memory:
+        return page.screenshot(timeout=180000, full_page=True)
+    with tempfile.NamedTemporaryFile(mode='w+t', delete=False, suffix=".png", dir=temp_dir) as tmp:
+        screenshot_path = tmp.name
+        page.screenshot(path=screenshot_path, timeout=180000, full_page=True)
+    return screenshot_path
+
+class RenderPool:
+    def __init__(self, browsers: int = 2, max_queue: int = 64, latency_window: int = 100, max_shells: int = 4, shell_max_uses: int = 200, temp_dir=None) -> None:
+        self.browsers = browsers
+        self.temp_dir = temp_dir or tempfile.gettempdir()
+        self.max_shells = max_shells
+        self.shell_max_uses = shell_max_uses
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.latencies = collections.deque(maxlen=latency_window)
+        self.rendered = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._workers = []
+
+    def start(self) -> None:
+        with self._lock:
+            if self._workers: return
+            for index in range(self.browsers):
+                worker = threading.Thread(target=self._work, name=f"render-pool-{index}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def close(self) -> None:
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for _ in workers:
+            self.queue.put(None)
+        for worker in workers:
+            worker.join()
+
+    def submit(self, window_size, html=None, html_path=None, in_memory=False, data=None, timeout=None) -> concurrent.futures.Future:
+        self.start()
+        future = concurrent.futures.Future()
+        self.queue.put((future, time.perf_counter(), window_size, html, html_path, in_memory, data), timeout=timeout)
+        return future
+
+    def render(self, window_size, html=None, html_path=None, in_memory=False, data=None, timeout=None) -> str | bytes:
+        return self.submit(window_size, html=html, html_path=html_path, in_memory=in_memory, data=data, timeout=timeout).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = list(self.latencies)
+            return {
+                "browsers": len(self._workers),
+                "queue_depth": self.queue.qsize(),
+                "rendered": self.rendered,
+                "failed": self.failed,
+                "last_latency": latencies[-1][1] if latencies else None,
+                "avg_latency": sum(latency for _, latency in latencies) / len(latencies) if latencies else None,
+                "avg_queue_wait": sum(wait for wait, _ in latencies) / len(latencies) if latencies else None
+            }
+
+    def _get_shell_page(self, browser, shells: collections.OrderedDict, html: str):
+        digest = _shell_digest(html)
+        entry = shells.pop(digest, None)
+        if entry is not None and (entry[0].is_closed() or entry[1] >= self.shell_max_uses):
+            if not entry[0].is_closed(): entry[0].close()
+            entry = None
+        if entry is None:
+            page = browser.new_page()
+            page.goto(_base_url(self.temp_dir))
+            page.set_content(html, wait_until="load")
+            entry = [page, 0]
+        entry[1] += 1
+        shells[digest] = entry
+        while len(shells) > self.max_shells:
+            shells.popitem(last=False)[1][0].close()
+        return entry[0]
+
+    def _work(self) -> None:
+        driver = None
+        browser = None
+        page = None
+        shells = collections.OrderedDict()
+        try:
+            while (job := self.queue.get()) is not None:
+                future, queued_at, window_size, html, html_path, in_memory, data = job
+                if not future.set_running_or_notify_cancel(): continue
+                started_at = time.perf_counter()
+                target = None
+                try:
+                    if driver is None:
+                        driver = playwright.sync_api.sync_playwright().start()
+                    if browser is None or not browser.is_connected():
+                        browser = driver.chromium.launch(headless=True)
+                        page = None
+                        shells.clear()
+                    if data is not None:
+                        target = self._get_shell_page(browser, shells, html)
+                    else:
+                        if page is None or page.is_closed():
+                            page = browser.new_page()
+                        target = page
+                    screenshot = _render_page(target, window_size, self.temp_dir, html=html, html_path=html_path, in_memory=in_memory, data=data)
+                except Exception as e:
+                    if target is not None and browser.is_connected(): target.close()
+                    if target is page: page = None
+                    if data is not None: shells.pop(_shell_digest(html), None)
+                    with self._lock:
+                        self.failed += 1
+                    future.set_exception(e)
+                else:
+                    with self._lock:
+                        self.rendered += 1
+                        self.latencies.append((started_at - queued_at, time.perf_counter() - started_at))
+                    future.set_result(screenshot)
+        finally:
+            if browser is not None: browser.close()
+            if driver is not None: driver.stop()
+
+def _write_temp_image(image_bytes: bytes, temp_dir) -> str:
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        suffix = IMAGE_FORMATS[img.format]["suffix"]
+    with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix=suffix, dir=temp_dir) as tmp:
+        tmp.write(image_bytes)
+        return tmp.name
+
+def _finish_screenshot_path(screenshot_path: str, image_format: str, max_size_mb: float, cache_key: str, cache: RenderCache) -> str:
+    image_path = compress_image(screenshot_path, max_size_mb, image_format=image_format)
+    if image_path != screenshot_path: os.remove(screenshot_path)
+    if cache_key is not None:
+        with open(image_path, "rb") as f:
+            cache.put(cache_key, f.read())
+    return image_path
+
+def _finish_screenshot_bytes(screenshot: bytes, image_format: str, max_size_mb: float, cache_key: str, cache: RenderCache) -> bytes:
+    image_bytes = compress_image_bytes(screenshot, max_size_mb, image_format=image_format)
+    if cache_key is not None: cache.put(cache_key, image_bytes, persist=False)
+    return image_bytes
+
+def _raster_to_png(draw) -> bytes:
+    output = io.BytesIO()
+    draw().save(output, format="PNG", compress_level=1)
+    return output.getvalue()
+
+async def _async_render_page(page, window_size, temp_dir, html=None, html_path=None, in_memory=False, data=None) -> str | bytes:
+    await page.set_viewport_size({"width": window_size[0], "height": window_size[1]})
+    if data is not None:
+        await page.evaluate(SHELL_RENDER_SCRIPT, data)
+    elif in_memory and html is not None:
+        if not page.url.startswith(_base_url(temp_dir)): await page.goto(_base_url(temp_dir))
+        await page.set_content(html, wait_until="load")
+    else:
+        temp_html_path = None
+        if html is not None:
+            with tempfile.NamedTemporaryFile(mode='w+t', delete=False, suffix=".html", dir=temp_dir) as tmp:
+                html_path = temp_html_path = tmp.name
+                with open(html_path, "w", encoding="utf-8") as f:
+                    f.write(html)
+
+        abs_html_path = os.path.abspath(html_path)
+        file_url = f"file://{abs_html_path}"
+
+        try:
+            await page.goto(file_url, wait_until="load")
+        finally:
+            if temp_html_path is not None: os.remove(temp_html_path)
+
+    total_height = await page.evaluate("document.body.scrollHeight")
+    await page.set_viewport_size({"width": window_size[0], "height": total_height})
+    await page.evaluate("document.body.style.overflow = 'hidden';")
+
+    if in_memory:
+        return await page.screenshot(timeout=180000, full_page=True)
+    with tempfile.NamedTemporaryFile(mode='w+t', delete=False, suffix=".png", dir=temp_dir) as tmp:
+        screenshot_path = tmp.name
+        await page.screenshot(path=screenshot_path, timeout=180000, full_page=True)
+    return screenshot_path
+
+class AsyncRenderer:
+    def __init__(self, concurrency: int = 8, shell_max_uses: int = 200, temp_dir=None) -> None:
+        self.concurrency = concurrency
+        self.temp_dir = temp_dir or tempfile.gettempdir()
+        self.shell_max_uses = shell_max_uses
+        self._states = weakref.WeakKeyDictionary()
+
+    def _state(self) -> dict:
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            state = {"semaphore": asyncio.Semaphore(self.concurrency), "lock": asyncio.Lock(), "driver": None, "browser": None, "shells": {}}
+            self._states[loop] = state
+        return state
+
+    async def _get_browser(self, state: dict):
+        async with state["lock"]:
+            if state["driver"] is None:
+                state["driver"] = await playwright.async_api.async_playwright().start()
+            if state["browser"] is None or not state["browser"].is_connected():
+                state["browser"] = await state["driver"].chromium.launch(headless=True)
+                state["shells"] = {}
+            return state["browser"]
+
+    async def _render_shell(self, state: dict, browser, window_size, html, in_memory, data) -> str | bytes:
+        idle = state["shells"].setdefault(_shell_digest(html), [])
+        if idle:
+            page, uses = idle.pop()
+        else:
+            page, uses = await browser.new_page(), 0
+            await page.goto(_base_url(self.temp_dir))
+            await page.set_content(html, wait_until="load")
+        try:
+            screenshot = await _async_render_page(page, window_size, self.temp_dir, in_memory=in_memory, data=data)
+        except Exception:
+            await page.close()
+            raise
+        if uses + 1 < self.shell_max_uses and len(idle) < self.concurrency:
+            idle.append((page, uses + 1))
+        else:
+            await page.close()
+        return screenshot
+
+    async def render(self, window_size, html=None, html_path=None, in_memory=False, data=None) -> str | bytes:
+        state = self._state()
+        async with state["semaphore"]:
+            browser = await self._get_browser(state)
+            if data is not None:
+                return await self._render_shell(state, browser, window_size, html, in_memory, data)
+            page = await browser.new_page()
+            try:
+                return await _async_render_page(page, window_size, self.temp_dir, html=html, html_path=html_path, in_memory=in_memory)
+            finally:
+                await page.close()
+
+    async def close(self) -> None:
+        state = self._states.pop(asyncio.get_running_loop(), None)
+        if state is None: return
+        async with state["lock"]:
+            if state["browser"] is not None: await state["browser"].close()
+            if state["driver"] is not None: await state["driver"].stop()
+
+class RenderService:
+    def __init__(self, temp_dir, cache: RenderCache = None, pool: RenderPool = None, async_renderer: AsyncRenderer = None) -> None:
+        self.temp_dir = temp_dir
+        os.makedirs(temp_dir, exist_ok=True)
+        self.cache = cache or RenderCache(os.path.join(temp_dir, "render_cache"))
+        self.pool = pool or RenderPool(temp_dir=temp_dir)
+        self.async_renderer = async_renderer or AsyncRenderer(temp_dir=temp_dir)
+
+    def render_html_to_jpg(self, window_size, html=None, html_path=None, data=None, pool: RenderPool = None, image_format: str = "WEBP", max_size_mb: float = 9.5, cache_key: str = None, cache: RenderCache = None):
+        cache = cache or self.cache
+        if cache_key is not None and (image_bytes := cache.get(cache_key)) is not None:
+            return _write_temp_image(image_bytes, self.temp_dir)
+        screenshot_path = (pool or self.pool).render(window_size, html=html, html_path=html_path, data=data)
+        return _finish_screenshot_path(screenshot_path, image_format, max_size_mb, cache_key, cache)
+
+    def render_html_to_bytes(self, window_size, html=None, html_path=None, data=None, pool: RenderPool = None, image_format: str = "WEBP", max_size_mb: float = 9.5, cache_key: str = None, cache: RenderCache = None) -> bytes:
+        cache = cache or self.cache
+        if cache_key is not None and (image_bytes := cache.get(cache_key)) is not None:
+            return image_bytes
+        screenshot = (pool or self.pool).render(window_size, html=html, html_path=html_path, in_memory=True, data=data)
+        return _finish_screenshot_bytes(screenshot, image_format, max_size_mb, cache_key, cache)
+
+    def render_many(self, jobs, pool: RenderPool = None, in_memory: bool = False, image_format: str = "WEBP", max_size_mb: float = 9.5, cache: RenderCache = None, return_exceptions: bool = False):
+        pool = pool or self.pool
+        cache = cache or self.cache
+        finish = _finish_screenshot_bytes if in_memory else _finish_screenshot_path
+        results = queue.Queue()
+        renders = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=pool.browsers) as executor:
+            def on_rendered(index, cache_key, render_future):
+                if render_future.cancelled(): return
+                if render_future.exception() is not None:
+                    results.put((index, render_future.exception()))
+                    return
+                def compress():
+                    try:
+                        results.put((index, finish(render_future.result(), image_format, max_size_mb, cache_key, cache)))
+                    except Exception as e:
+                        results.put((index, e))
+                try:
+                    executor.submit(compress)
+                except RuntimeError:
+                    pass
+            
+            try:
+                pending = 0
+                for index, job in enumerate(jobs):
+                    job = dict(job)
+                    cache_key = job.pop("cache_key", None)
+                    if cache_key is not None and (cached := cache.get(cache_key)) is not None:
+                        results.put((index, cached if in_memory else _write_temp_image(cached, self.temp_dir)))
+                    else:
+                        render_future = pool.submit(in_memory=in_memory, **job)
+                        render_future.add_done_callback(functools.partial(on_rendered, index, cache_key))
+                        renders.append(render_future)
+                    pending += 1
+                for _ in range(pending):
+                    index, result = results.get()
+                    if isinstance(result, Exception):
+                        if not return_exceptions: raise result
+                    yield index, result
+            finally:
+                for render_future in renders: render_future.cancel()
+
+    def render_image_to_jpg(self, draw, image_format: str = "WEBP", max_size_mb: float = 9.5, cache_key: str = None, cache: RenderCache = None):
+        cache = cache or self.cache
+        if cache_key is not None and (image_bytes := cache.get(cache_key)) is not None:
+            return _write_temp_image(image_bytes, self.temp_dir)
+        image_bytes = compress_image_bytes(_raster_to_png(draw), max_size_mb, image_format=image_format)
+        if cache_key is not None: cache.put(cache_key, image_bytes)
+        return _write_temp_image(image_bytes, self.temp_dir)
+
+    def render_image_to_bytes(self, draw, image_format: str = "WEBP", max_size_mb: float = 9.5, cache_key: str = None, cache: RenderCache = None) -> bytes:
+        cache = cache or self.cache
+        if cache_key is not None and (image_bytes := cache.get(cache_key)) is not None:
+            return image_bytes
+        image_bytes = compress_image_bytes(_raster_to_png(draw), max_size_mb, image_format=image_format)
+        if cache_key is not None: cache.put(cache_key, image_bytes, persist=False)
+        return image_bytes
+
+    async def async_render_html_to_jpg(self, window_size, html=None, html_path=None, data=None, renderer: AsyncRenderer = None, image_format: str = "WEBP", max_size_mb: float = 9.5, cache_key: str = None, cache: RenderCache = None):
+        cache = cache or self.cache
+        if cache_key is not None and (image_bytes := await asyncio.to_thread(cache.get, cache_key)) is not None:
+            return await asyncio.to_thread(_write_temp_image, image_bytes, self.temp_dir)
+        screenshot_path = await (renderer or self.async_renderer).render(window_size, html=html, html_path=html_path, data=data)
+        return await asyncio.to_thread(_finish_screenshot_path, screenshot_path, image_format, max_size_mb, cache_key, cache)
+
+    async def async_render_html_to_bytes(self, window_size, html=None, html_path=None, data=None, renderer: AsyncRenderer = None, image_format: str = "WEBP", max_size_mb: float = 9.5, cache_key: str = None, cache: RenderCache = None) -> bytes:
+        cache = cache or self.cache
+        if cache_key is not None and (image_bytes := await asyncio.to_thread(cache.get, cache_key)) is not None:
+            return image_bytes
+        screenshot = await (renderer or self.async_renderer).render(window_size, html=html, html_path=html_path, in_memory=True, data=data)
+        return await asyncio.to_thread(_finish_screenshot_bytes, screenshot, image_format, max_size_mb, cache_key, cache)
+
+    async def async_render_many(self, jobs, renderer: AsyncRenderer = None, in_memory: bool = False, image_format: str = "WEBP", max_size_mb: float = 9.5, cache: RenderCache = None, return_exceptions: bool = False):
+        render = self.async_render_html_to_bytes if in_memory else self.async_render_html_to_jpg
+        async def run(index, job):
+            try:
+                return index, await render(renderer=renderer, image_format=image_format, max_size_mb=max_size_mb, cache=cache, **job)
+            except Exception as e:
+                if not return_exceptions: raise
+                return index, e
+        tasks = [asyncio.ensure_future(run(index, job)) for index, job in enumerate(jobs)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks: task.cancel()
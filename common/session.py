@@ -0,0 +1,200 @@
+import json
+import time
+import asyncio
+import collections
+import aiohttp
+import weakref
+import threading
+import requests
+import http.cookiejar
+import urllib.parse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Any
+
+class TraceRecorder:
+    def __init__(self, max_records: int = 1000) -> None:
+        self._records = collections.deque(maxlen=max_records)
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record: dict) -> None:
+        host = urllib.parse.urlsplit(record["url"]).netloc
+        with self._lock:
+            self._records.append(record)
+            stats = self._hosts.setdefault(host, {"requests": 0, "errors": 0, "bytes": 0, "latency": 0.0, "maxLatency": 0.0})
+            stats["requests"] += 1
+            if record["status"] is None or record["status"] >= 400: stats["errors"] += 1
+            stats["bytes"] += record["bytes"] or 0
+            stats["latency"] += record["latency"]
+            stats["maxLatency"] = max(stats["maxLatency"], record["latency"])
+
+    def records(self) -> list[dict]:
+        with self._lock:
+            return list(self._records)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {host: dict(stats, averageLatency=stats["latency"] / stats["requests"]) for host, stats in self._hosts.items()}
+
+def _emit_trace(sink, record: dict) -> None:
+    try:
+        sink(record)
+    except Exception as e:
+        print(f"Request trace sink failed: {e}")
+
+class SessionPool:
+    def __init__(self, pool_maxsize: int = 32, max_retries: int = 3, backoff_factor: float = 0.3, status_forcelist: tuple = (429, 500, 502, 503, 504), keep_alive: bool = True) -> None:
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.status_forcelist = status_forcelist
+        self.keep_alive = keep_alive
+        self.trace_sink = None
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=self.max_retries,
+            status=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.status_forcelist,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+        if not self.keep_alive: session.headers["Connection"] = "close"
+        if self.trace_sink is not None: session.hooks["response"].append(self._trace)
+        return session
+
+    def _trace(self, response: requests.Response, *args, **kwargs) -> None:
+        sink = self.trace_sink
+        if sink is None: return
+        _emit_trace(sink, {
+            "method": response.request.method,
+            "url": response.url,
+            "status": response.status_code,
+            "bytes": None if kwargs.get("stream") else len(response.content),
+            "latency": response.elapsed.total_seconds()
+        })
+
+    def set_trace_sink(self, sink) -> None:
+        with self._lock:
+            self.trace_sink = sink
+            for session in self._sessions.values():
+                hooks = session.hooks["response"]
+                if sink is None and self._trace in hooks: hooks.remove(self._trace)
+                elif sink is not None and self._trace not in hooks: hooks.append(self._trace)
+
+    def session(self, url: str) -> requests.Session:
+        parsed_url = urllib.parse.urlsplit(url)
+        host = (parsed_url.scheme, parsed_url.netloc)
+        with self._lock:
+            if host not in self._sessions: self._sessions[host] = self._create_session()
+            return self._sessions[host]
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.session(url).request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    def configure(self, **options) -> None:
+        unknown = [name for name in options if name not in ["pool_maxsize", "max_retries", "backoff_factor", "status_forcelist", "keep_alive"]]
+        if unknown: raise ValueError(f"Unknown session pool options: {', '.join(unknown)}")
+        with self._lock:
+            for name, value in options.items(): setattr(self, name, value)
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values(): session.close()
+
+    def close(self) -> None:
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values(): session.close()
+
+class AsyncResponse:
+    def __init__(self, status_code: int, headers: dict, content: bytes) -> None:
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+class AsyncSessionPool:
+    def __init__(self, limit: int = 256, limit_per_host: int = 32, max_retries: int = 3, backoff_factor: float = 0.3, status_forcelist: tuple = (429, 500, 502, 503, 504), keep_alive: bool = True) -> None:
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.status_forcelist = status_forcelist
+        self.keep_alive = keep_alive
+        self.trace_sink = None
+        self._sessions = weakref.WeakKeyDictionary()
+
+    def session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host, force_close=not self.keep_alive)
+            session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar())
+            self._sessions[loop] = session
+        return session
+
+    async def request(self, method: str, url: str, params: dict = None, json: Any = None, headers: dict = None, proxies: dict = None, timeout: float = 10, verify: bool = True, allow_redirects: bool = True) -> AsyncResponse:
+        proxy = (proxies or {}).get(urllib.parse.urlsplit(url).scheme)
+        idempotent = method.upper() in Retry.DEFAULT_ALLOWED_METHODS
+        for attempt in range(self.max_retries + 1):
+            sink = self.trace_sink
+            if sink is not None: started = time.perf_counter()
+            try:
+                async with self.session().request(
+                    method, url, params=params, json=json, headers=headers, proxy=proxy,
+                    timeout=aiohttp.ClientTimeout(total=timeout), ssl=None if verify else False, allow_redirects=allow_redirects
+                ) as response:
+                    content = await response.read()
+                    if sink is not None: _emit_trace(sink, {"method": method.upper(), "url": str(response.url), "status": response.status, "bytes": len(content), "latency": time.perf_counter() - started})
+                    if not (idempotent and response.status in self.status_forcelist and attempt < self.max_retries):
+                        return AsyncResponse(response.status, dict(response.headers), content)
+            except aiohttp.ClientConnectorError:
+                if sink is not None: _emit_trace(sink, {"method": method.upper(), "url": url, "status": None, "bytes": None, "latency": time.perf_counter() - started})
+                if attempt >= self.max_retries: raise
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if sink is not None: _emit_trace(sink, {"method": method.upper(), "url": url, "status": None, "bytes": None, "latency": time.perf_counter() - started})
+                if not idempotent or attempt >= self.max_retries: raise
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+    async def get(self, url: str, **kwargs) -> AsyncResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> AsyncResponse:
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs) -> AsyncResponse:
+        return await self.request("PUT", url, **kwargs)
+
+    def set_trace_sink(self, sink) -> None:
+        self.trace_sink = sink
+
+    async def close(self) -> None:
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None: await session.close()
+
+session_pool = SessionPool()
+async_session_pool = AsyncSessionPool()
@@ -1,9 +1,11 @@
 from . import request
 from . import model
 from . import processor
+from common import session
 
 __all__ = [
     "request",
     "model",
-    "processor"
+    "processor",
+    "session"
 ]
@@ -1,4 +1,4 @@
-from .request import MobileUserAPI
+from .request import MobileUserAPI, AsyncMobileUserAPI
 
 import io
 import gzip
@@ -9,8 +9,8 @@ class MobileProcessor(MobileUserAPI):
     def login(self):
         return super()._get_token()
     
-    def get_user_info(self) -> dict:
-        result = super().get_user_info()["data"]
+    def get_user_info(self, raw_data: dict = None) -> dict:
+        result = (raw_data if raw_data is not None else super().get_user_info())["data"]
         user_data = result["user"]
         user_profile = result["userProfile"]
         
@@ -48,8 +48,21 @@ class MobileProcessor(MobileUserAPI):
             "playerLevel": user_profile["performerLevel"]
         }
     
-    def get_initialinfo(self, get_token = False):
-        gzip_base64 = super().get_initialinfo(get_token)["data"]
+    def get_initialinfo(self, get_token = False, raw_data: dict = None):
+        gzip_base64 = (raw_data if raw_data is not None else super().get_initialinfo(get_token))["data"]
         gzip_hex = base64.b64decode(gzip_base64)
         with gzip.GzipFile(fileobj=io.BytesIO(gzip_hex)) as f:
             user_data = json.loads(f.read().decode("utf-8"))
+
+class AsyncMobileProcessor(AsyncMobileUserAPI):
+    def _processor(self) -> MobileProcessor:
+        return MobileProcessor(client_version=self.client_version, user_profile=self.user_profile, proxies=self.proxies)
+    
+    async def login(self):
+        return await super()._get_token()
+    
+    async def get_user_info(self) -> dict:
+        return self._processor().get_user_info(raw_data=await super().get_user_info())
+    
+    async def get_initialinfo(self, get_token = False):
+        return self._processor().get_initialinfo(raw_data=await super().get_initialinfo(get_token))
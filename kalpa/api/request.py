@@ -1,7 +1,7 @@
 import time
 import json
 import hashlib
-import requests
+from common import session
 from .model import *
 
 class BaseAPI:
@@ -27,7 +27,7 @@ class BaseAPI:
     def get(self, endpoint: str, params: dict = None, need_token: bool = True) -> dict:
         if need_token and not self.user_profile.get("token", None):
             raise ValueError("User token is required for this request")
-        return requests.get(
+        return session.session_pool.get(
             f"{self.base_url}/{endpoint}",
             headers=self._build_headers(),
             params=params,
@@ -37,7 +37,7 @@ class BaseAPI:
     def post(self, endpoint: str, data: dict = None, need_token: bool = True) -> dict:
         if need_token and not self.user_profile.get("token", None):
             raise ValueError("User token is required for this request")
-        return requests.post(
+        return session.session_pool.post(
             f"{self.base_url}/{endpoint}",
             headers=self._build_headers(),
             json=data,
@@ -47,7 +47,7 @@ class BaseAPI:
     def put(self, endpoint: str, data: dict = None, need_token: bool = True) -> dict:
         if need_token and not self.user_profile.get("token", None):
             raise ValueError("User token is required for this request")
-        return requests.put(
+        return session.session_pool.put(
             f"{self.base_url}/{endpoint}",
             headers=self._build_headers(),
             json=data,
@@ -80,3 +80,57 @@ class MobileUserAPI(BaseAPI):
     def get_all_darkmoons(self, get_token: bool = False) -> dict:
         if get_token: self.user_profile["token"] = self._get_token()
         return self.get("/api/darkmoon/all")
+
+class AsyncBaseAPI(BaseAPI):
+    async def get(self, endpoint: str, params: dict = None, need_token: bool = True) -> dict:
+        if need_token and not self.user_profile.get("token", None):
+            raise ValueError("User token is required for this request")
+        return (await session.async_session_pool.get(
+            f"{self.base_url}/{endpoint}",
+            headers=self._build_headers(),
+            params=params,
+            allow_redirects=True, proxies=self.proxies, timeout=10, verify=False
+        )).json()
+
+    async def post(self, endpoint: str, data: dict = None, need_token: bool = True) -> dict:
+        if need_token and not self.user_profile.get("token", None):
+            raise ValueError("User token is required for this request")
+        return (await session.async_session_pool.post(
+            f"{self.base_url}/{endpoint}",
+            headers=self._build_headers(),
+            json=data,
+            allow_redirects=True, proxies=self.proxies, timeout=10, verify=False
+        )).json()
+
+    async def put(self, endpoint: str, data: dict = None, need_token: bool = True) -> dict:
+        if need_token and not self.user_profile.get("token", None):
+            raise ValueError("User token is required for this request")
+        return (await session.async_session_pool.put(
+            f"{self.base_url}/{endpoint}",
+            headers=self._build_headers(),
+            json=data,
+            allow_redirects=True, proxies=self.proxies, timeout=10, verify=False
+        )).json()
+
+class AsyncMobileUserAPI(AsyncBaseAPI):
+    def __init__(self, client_version: int, user_profile: dict, proxies: dict = None):
+        super().__init__(server=ServerType.MOBILE, client_version=client_version, user_profile=user_profile, proxies=proxies)
+    
+    async def login(self) -> dict:
+        data = {
+            "id": self.user_profile["userid"],
+            "pw": self.user_profile["password"]
+        }
+        result = await self.post("/api/auth/login", data=data, need_token=False)
+        return result
+
+    async def _get_token(self) -> str:
+        return (await self.login())["data"]["token"]
+
+    async def get_user_info(self, get_token: bool = False) -> dict:
+        if get_token: self.user_profile["token"] = await self._get_token()
+        return await self.get("/api/user/me")
+    
+    async def get_initialinfo(self, get_token: bool = False) -> dict:
+        if get_token: self.user_profile["token"] = await self._get_token()
+        return await self.get("/api/initialinfo")
@@ -1,9 +1,11 @@
 from . import model
 from . import request
 from . import processor
+from common import session
 
 __all__ = [
     "model",
     "request",
-    "processor"
+    "processor",
+    "session"
 ]
@@ -1,9 +1,11 @@
-from .request import UserAPI
+from .request import UserAPI, AsyncUserAPI
+from common import session
 from .. import config
 from ..database import song_data as song_data_database
 
 import io
 import time
+import asyncio
 import struct
 import base64
 import zipfile
@@ -176,7 +178,7 @@ class Processor(UserAPI):
     def _get_game_record(self, summary: dict, update: bool = False) -> list[dict]:
         reader = self.get_byte_reader(summary=summary, key="gameRecord", update=update)
         
-        song_datas = []
+        records = []
         level_map = ["EZ", "HD", "IN", "AT"]
         songs_num = reader.get_varint()
         while reader.remaining() > 0:
@@ -186,22 +188,27 @@ class Processor(UserAPI):
             length = reader.get_byte()
             full_combo = reader.get_byte()
             
-            song_info = song_data_database.song_data.get_song(song_id)
             for song_level in range(5):
                 if (length & (1 << song_level)) == 0:
                     continue
-                song_datas.append({
-                    "title": song_info["title"],
-                    "score": reader.get_int(),
-                    "accuracy": reader.get_float(),
-                    "status": "FC" if (full_combo & (1 << song_level)) != 0 else "NONE",
-                    "diff": song_info["levels"][level_map[song_level]],
-                    "level": level_map[song_level],
-                    "id": song_id
-                })
-                if song_datas[-1]["score"] >= 1000000:
-                    song_datas[-1]["status"] = "AP"
-                song_datas[-1]["rating"] = (((song_datas[-1]["accuracy"] * 100 - 55) / 45) ** 2) * song_datas[-1]["diff"]
+                records.append((song_id, song_level, reader.get_int(), reader.get_float(), (full_combo & (1 << song_level)) != 0))
+        
+        song_infos = song_data_database.song_data.get_songs([record[0] for record in records])
+        song_datas = []
+        for song_id, song_level, score, accuracy, is_full_combo in records:
+            song_info = song_infos[song_id]
+            song_datas.append({
+                "title": song_info["title"],
+                "score": score,
+                "accuracy": accuracy,
+                "status": "FC" if is_full_combo else "NONE",
+                "diff": song_info["levels"][level_map[song_level]],
+                "level": level_map[song_level],
+                "id": song_id
+            })
+            if song_datas[-1]["score"] >= 1000000:
+                song_datas[-1]["status"] = "AP"
+            song_datas[-1]["rating"] = (((song_datas[-1]["accuracy"] * 100 - 55) / 45) ** 2) * song_datas[-1]["diff"]
         
         return song_datas
 
@@ -297,3 +304,45 @@ class Processor(UserAPI):
         user_info = self._get_user(summary=summary, update=update)
         user_info["summary"] = summary["summary"]
         return user_info
+
+class AsyncProcessor(AsyncUserAPI):
+    def _processor(self) -> Processor:
+        return Processor(user_profile=self.user_profile, proxies=self.proxies)
+    
+    async def fetch(self, summary: dict = None, update: bool = False) -> None:
+        saves_dir = config.SAVES_DIR / self.user_profile["sessionToken"]
+        if update or not sorted_files_by_extension(saves_dir / "user_data", extension=".msgpack"):
+            save_data_to_file(await super().get_user_data(), saves_dir / "user_data" / f"{time.time()}")
+        if update or not sorted_files_by_extension(saves_dir / "summaries", extension=".msgpack"):
+            save_data_to_file(await super().get_summaries(), saves_dir / "summaries" / f"{time.time()}")
+        
+        if summary is None:
+            summary = self._processor().get_latest_summary()
+        save_dir = saves_dir / "save" / summary["saveKey"].split("/")[-2]
+        if update or not sorted_files_by_extension(save_dir, extension=".bin"):
+            data = (await session.async_session_pool.get(summary["saveURL"], allow_redirects=True, proxies=self.proxies, timeout=10, verify=False)).content
+            save_data_to_file(data, save_dir / f"{datetime.datetime.strptime(summary['updatedAt'], '%Y-%m-%dT%H:%M:%S.%fZ').timestamp()}")
+    
+    async def get_display_name(self, update: bool = False) -> str:
+        await self.fetch(update=update)
+        return self._processor().get_display_name()
+    
+    async def get_summaries(self, update: bool = False) -> dict:
+        await self.fetch(update=update)
+        return self._processor().get_summaries()
+    
+    async def get_latest_summary(self, update: bool = False) -> dict:
+        await self.fetch(update=update)
+        return self._processor().get_latest_summary()
+    
+    async def get_game_record(self, summary: dict = None, update: bool = False) -> list[dict]:
+        await self.fetch(summary=summary, update=update)
+        return await asyncio.to_thread(self._processor().get_game_record, summary=summary)
+    
+    async def get_user(self, summary: dict = None, update: bool = False) -> dict:
+        await self.fetch(summary=summary, update=update)
+        return await asyncio.to_thread(self._processor().get_user, summary=summary)
+    
+    async def get_user_info(self, summary: dict = None, update: bool = False) -> dict:
+        await self.fetch(summary=summary, update=update)
+        return await asyncio.to_thread(self._processor().get_user_info, summary=summary)
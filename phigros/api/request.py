@@ -1,20 +1,13 @@
-import curlify
-import requests
+from common import session
 from .model import *
 
-_original_send = requests.Session.send
-def sendWithCURL(self, request, **kwargs):
-    print("[CURL]", curlify.to_curl(request))
-    return _original_send(self, request, **kwargs)
-requests.Session.send = sendWithCURL
-
 class BaseAPI:
     def __init__(self, user_profile: dict, proxies: dict = None) -> None:
         self.region = ServerRegion(user_profile.get("server", None))
         self.user_profile = user_profile
         self.proxies = proxies
         
-        self.requests = requests.Session()
+        self.requests = session.session_pool
 
         if self.region == ServerRegion.CN:
             self.base_url = ServerURL.CN
@@ -63,3 +56,35 @@ class UserAPI(BaseAPI):
     
     def get_summaries(self) -> dict:
         return self.get("/1.1/classes/_GameSave")
+
+class AsyncBaseAPI(BaseAPI):
+    async def get(self, endpoint: str, params: dict = None) -> dict:
+        return (await session.async_session_pool.get(
+            f"{self.base_url}/{endpoint}",
+            headers=self._build_headers(),
+            params=params,
+            allow_redirects=True, proxies=self.proxies, timeout=10, verify=False
+        )).json()
+
+    async def post(self, endpoint: str, data: dict = None) -> dict:
+        return (await session.async_session_pool.post(
+            f"{self.base_url}/{endpoint}",
+            headers=self._build_headers(),
+            json=data,
+            allow_redirects=True, proxies=self.proxies, timeout=10, verify=False
+        )).json()
+
+    async def put(self, endpoint: str, data: dict = None) -> dict:
+        return (await session.async_session_pool.put(
+            f"{self.base_url}/{endpoint}",
+            headers=self._build_headers(),
+            json=data,
+            allow_redirects=True, proxies=self.proxies, timeout=10, verify=False
+        )).json()
+
+class AsyncUserAPI(AsyncBaseAPI):
+    async def get_user_data(self) -> dict:
+        return await self.get("/1.1/users/me")
+    
+    async def get_summaries(self) -> dict:
+        return await self.get("/1.1/classes/_GameSave")
@@ -1,5 +1,7 @@
+from . import engine
 from . import song_data
 
 __all__ = [
+    "engine",
     "song_data"
 ]
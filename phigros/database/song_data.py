@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine, Column, String, Integer, JSON, Float
+from . import engine
+from sqlalchemy import Column, String, Integer, JSON, Float
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from typing import Dict, List, Union, Any
@@ -24,12 +25,18 @@ class SongData:
         IN = Column(Float, nullable=False)
         AT = Column(Float, nullable=True)
     
-    def __init__(self, database_path: str):
-        self.engine = create_engine(f'sqlite:///{database_path}')
-        self._Base.metadata.create_all(self.engine)
+    def __init__(self, database_path: str, read_only: bool = False):
+        self.database_path = database_path
+        self.read_only = read_only and os.path.exists(database_path)
+        if self.read_only:
+            self.engine = engine.read_only_engine(database_path)
+        else:
+            self.engine = engine.sqlite_engine(database_path, wal=False)
+            self._Base.metadata.create_all(self.engine)
         self.Session = sessionmaker(bind=self.engine)
     
     def add_song(self, id: str, title: str, composer: str, illustrator: Dict[str, str], charter: Dict[str, str], EZ: float, HD: float, IN: float, AT: Union[float, None] = None) -> None:
+        if self.read_only: raise PermissionError(f"Song catalogue `{self.database_path}` was opened read-only")
         session = self.Session()
         try:
             if isinstance(illustrator, str): illustrator = [illustrator]
@@ -60,45 +67,55 @@ class SongData:
         finally:
             session.close()
     
-    def get_song(self, id: str) -> Dict[str, Any]:
+    def _empty_song(self, id: str) -> Dict[str, Any]:
+        return {
+            "id": id,
+            "title": "",
+            "composer": "",
+            "illustrator": [],
+            "charter": [],
+            "levels": {
+                "EZ": 0.0,
+                "HD": 0.0,
+                "IN": 0.0,
+                "AT": 0.0
+            }
+        }
+    
+    def get_songs(self, ids: List[str], chunk_size: int = 500) -> Dict[str, Dict[str, Any]]:
+        ids = list(dict.fromkeys(ids))
+        results = {}
         session = self.Session()
         try:
-            song = session.query(self.Song).filter(self.Song.id == id).first()
-            if not song:
-                return {
-                    "id": id,
-                    "title": "",
-                    "composer": "",
-                    "illustrator": [],
-                    "charter": [],
-                    "levels": {
-                        "EZ": 0.0,
-                        "HD": 0.0,
-                        "IN": 0.0,
-                        "AT": 0.0
+            for index in range(0, len(ids), chunk_size):
+                rows = session.query(self.Song, self.SongLevel).outerjoin(self.SongLevel, self.SongLevel.id == self.Song.id).filter(self.Song.id.in_(ids[index:index + chunk_size])).all()
+                for song, levels in rows:
+                    if levels is None:
+                        levels_dict = self._empty_song(song.id)["levels"]
+                    else:
+                        levels_dict = {
+                            "EZ": levels.EZ,
+                            "HD": levels.HD,
+                            "IN": levels.IN
+                        }
+                        if levels.AT is not None:
+                            levels_dict["AT"] = levels.AT
+                    
+                    results[song.id] = {
+                        "id": song.id,
+                        "title": song.title,
+                        "composer": song.composer,
+                        "illustrator": song.illustrator,
+                        "charter": song.charter,
+                        "levels": levels_dict
                     }
-                }
-            
-            levels = session.query(self.SongLevel).filter(self.SongLevel.id == id).first()
-            
-            levels_dict = {
-                "EZ": levels.EZ,
-                "HD": levels.HD,
-                "IN": levels.IN
-            }
-            if levels.AT is not None:
-                levels_dict["AT"] = levels.AT
-
-            return {
-                "id": song.id,
-                "title": song.title,
-                "composer": song.composer,
-                "illustrator": song.illustrator,
-                "charter": song.charter,
-                "levels": levels_dict
-            }
         finally:
             session.close()
+        
+        return {id: results[id] if id in results else self._empty_song(id) for id in ids}
+    
+    def get_song(self, id: str) -> Dict[str, Any]:
+        return self.get_songs([id])[id]
 
 import os
 
@@ -1,14 +1,37 @@
 from . import api
 from . import utils
+from . import raster
 from . import config
 from . import database
 
 import json
+import asyncio
+import functools
+
+SHELL_SCRIPT = """<script>
+      window.renderData = function (data) {
+        window.SOURCE_DATA = data;
+        const root = document.createElement("div");
+        root.id = "root";
+        document.getElementById("root").replaceWith(root);
+        document.getElementById("app-run")?.remove();
+        const app = document.createElement("script");
+        app.type = "module";
+        app.id = "app-run";
+        app.textContent = document.getElementById("app").textContent;
+        document.body.appendChild(app);
+        return new Promise(resolve => {
+          const check = () => root.childElementCount ? resolve() : requestAnimationFrame(check);
+          check();
+        });
+      };
+    </script>
+"""
 
 def get_api_processor(user_profile: dict) -> api.processor.Processor:
     return api.processor.Processor(user_profile=user_profile)
 
-def best30(user_profile: dict, just_data: bool = False, just_html: bool = False) -> str | dict:
+def _get_best30_data(user_profile: dict) -> dict:
     processor = get_api_processor(user_profile)
     
     latest_summary = processor.get_latest_summary(update=user_profile.get("update", False))
@@ -27,17 +50,64 @@ def best30(user_profile: dict, just_data: bool = False, just_html: bool = False)
     
     user_info = processor.get_user_info(summary=latest_summary, update=user_profile.get("update", False))
     
-    result = {
+    return {
         "user_info": user_info,
         "song_data": best30_song_datas
     }
+
+def _build_html(template_path, result: dict) -> str:
+    html_fragments = utils.template_cache.get(template_path, compile=lambda template: template.split("/{{{data}}}/"))
+    return json.dumps(result, ensure_ascii=False, indent=4).join(html_fragments)
+
+def get_shell(template_path) -> str:
+    return utils.template_cache.get(template_path, key="shell", compile=lambda template: template
+        .replace("/{{{data}}}/", "null")
+        .replace('<script type="module">', '<script type="text/plain" id="app">', 1)
+        .replace("</body>", SHELL_SCRIPT + "</body>", 1))
+
+def _render_job(template_name: str, result: dict, window_size: tuple = (1100, 1350), client_side: bool = False) -> dict:
+    template_path = config.HTML_ASSETS_DIR / template_name
+    if client_side: html, data = get_shell(template_path), result
+    else: html, data = _build_html(template_path, result), None
+    cache_key = utils.render_cache.make_key(template_path, result, window_size=window_size)
+    return {"window_size": window_size, "html": html, "data": data, "cache_key": cache_key}
+
+def _render_raster(draw, result: dict, in_memory: bool = False) -> str | bytes:
+    cache_key = utils.render_cache.make_key(raster.__file__, {"draw": draw.__name__, "data": result})
+    if in_memory: return utils.render_image_to_bytes(functools.partial(draw, result), cache_key=cache_key)
+    return utils.render_image_to_jpg(functools.partial(draw, result), cache_key=cache_key)
+
+def best30(user_profile: dict, just_data: bool = False, just_html: bool = False, in_memory: bool = False, client_side: bool = False, renderer: str = "html") -> str | dict | bytes:
+    if renderer not in ["html", "pillow"]: raise ValueError(f"Unsupported renderer `{renderer}`")
+    result = _get_best30_data(user_profile)
+    
+    if just_data: return result
+    
+    if renderer == "pillow" and not just_html: return _render_raster(raster.draw_best30, result, in_memory=in_memory)
+    
+    if just_html: return _build_html(config.HTML_ASSETS_DIR / "best30.html", result)
+    
+    job = _render_job("best30.html", result, client_side=client_side)
+    if in_memory: return utils.render_html_to_bytes(**job)
+    return utils.render_html_to_jpg(**job)
+
+async def async_best30(user_profile: dict, just_data: bool = False, just_html: bool = False, in_memory: bool = False, client_side: bool = False, renderer: str = "html") -> str | dict | bytes:
+    if renderer not in ["html", "pillow"]: raise ValueError(f"Unsupported renderer `{renderer}`")
+    result = await asyncio.to_thread(_get_best30_data, user_profile)
     
     if just_data: return result
     
-    with open(config.HTML_ASSETS_DIR / "best30.html", "r", encoding="utf-8") as f:
-        html_template = f.read()
-    html = html_template.replace("/{{{data}}}/", json.dumps(result, ensure_ascii=False, indent=4))
+    if renderer == "pillow" and not just_html: return await asyncio.to_thread(_render_raster, raster.draw_best30, result, in_memory)
     
-    if just_html: return html
+    if just_html: return _build_html(config.HTML_ASSETS_DIR / "best30.html", result)
     
-    return utils.render_html_to_jpg(window_size=(1100, 1350), html=html)
+    job = _render_job("best30.html", result, client_side=client_side)
+    if in_memory: return await utils.async_render_html_to_bytes(**job)
+    return await utils.async_render_html_to_jpg(**job)
+
+def render_many(jobs: list[tuple], in_memory: bool = False, client_side: bool = True, return_exceptions: bool = False):
+    yield from utils.render_many([_render_job(template_name, result, window_size, client_side) for template_name, result, window_size in jobs], in_memory=in_memory, return_exceptions=return_exceptions)
+
+async def async_render_many(jobs: list[tuple], in_memory: bool = False, client_side: bool = True, return_exceptions: bool = False):
+    async for item in utils.async_render_many([_render_job(template_name, result, window_size, client_side) for template_name, result, window_size in jobs], in_memory=in_memory, return_exceptions=return_exceptions):
+        yield item
@@ -0,0 +1,196 @@
+from . import utils
+from . import config
+
+import math
+import time
+import functools
+from PIL import Image, ImageDraw
+
+WIDTH = 1100
+PADDING_X = 24
+PADDING_Y = 40
+ROW_HEIGHT = 128
+ROW_MARGIN = 12
+ROW_GAP = 4
+COLUMN_GAP = 32
+SKEW = math.tan(math.radians(12))
+
+LEFT_WIDTH = 144
+RIGHT_WIDTH = 96
+GRADES = {
+    "PHI": {"text": "Φ", "color": (250, 204, 21), "fill": (113, 63, 18, 51), "border": (250, 204, 21, 255)},
+    "V_BLUE": {"text": "V", "color": (59, 130, 246), "fill": (30, 58, 138, 77), "border": (59, 130, 246, 255)},
+    "V_WHITE": {"text": "V", "color": (255, 255, 255), "fill": (55, 65, 81, 102), "border": (255, 255, 255, 255)}
+}
+
+def get_grade(score: int, status: str) -> str:
+    if status == "AP": return "PHI"
+    if status == "FC": return "V_BLUE"
+    for grade, threshold in [("V_WHITE", 960000), ("S", 920000), ("A", 880000), ("B", 820000), ("C", 700000)]:
+        if score >= threshold: return grade
+    return "F"
+
+def get_rank_labels(song_datas: list) -> list:
+    labels = []
+    phi_rank, rank, ended = 0, 0, False
+    for index, song_data in enumerate(song_datas):
+        if index < 3 and song_data["status"] == "AP" and not ended:
+            phi_rank += 1
+            labels.append(f"#Φ{phi_rank}")
+        else:
+            ended = True
+            rank += 1
+            labels.append(f"#{rank:02d}")
+    return labels
+
+def fit_text(draw: ImageDraw.ImageDraw, text: str, font, max_width: float) -> str:
+    if draw.textlength(text, font=font) <= max_width: return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if draw.textlength(text[:middle] + "…", font=font) <= max_width: low = middle
+        else: high = middle - 1
+    return text[:low] + "…"
+
+@functools.lru_cache(maxsize=32)
+def _skew_panel(width: int, height: int, fill: tuple, border: tuple = None, border_width: int = 1, outline: bool = False) -> Image.Image:
+    offset = height / 2 * SKEW
+    scale = 4
+    panel = Image.new("RGBA", ((width + math.ceil(offset * 2)) * scale, height * scale), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(panel)
+    points = [(offset * 2, 0), (width + offset * 2, 0), (width, height), (0, height)]
+    draw.polygon([(x * scale, y * scale) for x, y in points], fill=fill)
+    if border is not None and outline:
+        draw.line([(x * scale, y * scale) for x, y in points + points[:1]], fill=border, width=border_width * scale, joint="curve")
+    elif border is not None:
+        draw.line([(points[3][0] * scale, points[3][1] * scale), (points[0][0] * scale, points[0][1] * scale)], fill=border, width=border_width * scale)
+    return panel.resize((panel.width // scale, height), Image.LANCZOS)
+
+@functools.lru_cache(maxsize=8)
+def _fade(width: int, height: int, stops: tuple) -> Image.Image:
+    strip = Image.new("RGBA", (len(stops), 1))
+    strip.putdata(list(stops))
+    return strip.resize((width, height), Image.BILINEAR)
+
+def _draw_middle(img: Image.Image, x: float, y: int, width: int, cover_path=None) -> None:
+    offset = ROW_HEIGHT / 2 * SKEW
+    panel = _skew_panel(width, ROW_HEIGHT, (31, 41, 55, 255))
+    layer = Image.new("RGBA", panel.size, (31, 41, 55, 255))
+    if cover_path is None:
+        layer.alpha_composite(_fade(panel.width, ROW_HEIGHT, ((17, 24, 39, 255), (31, 41, 55, 255), (17, 24, 39, 255))))
+    else:
+        cover = utils.tile_cache.get(cover_path, (int(panel.width * 1.25), int(ROW_HEIGHT * 1.25)), opacity=0.6, fill=(0, 0, 0, 0))
+        layer.alpha_composite(cover, source=((cover.width - panel.width) // 2, (cover.height - ROW_HEIGHT) // 2))
+        layer.alpha_composite(_fade(panel.width, ROW_HEIGHT, ((3, 7, 18, 255), (17, 24, 39, 102), (0, 0, 0, 0))))
+    layer.putalpha(panel.getchannel("A"))
+    img.alpha_composite(layer, (int(x - offset), y))
+    img.alpha_composite(_skew_panel(width, ROW_HEIGHT, (0, 0, 0, 0), (255, 255, 255, 51)), (int(x - offset), y))
+
+def _draw_left(img: Image.Image, draw: ImageDraw.ImageDraw, x: float, y: int, border: str) -> None:
+    draw.rectangle((x, y, x + LEFT_WIDTH - 1, y + ROW_HEIGHT - 1), fill=(3, 7, 18))
+    draw.rectangle((x, y, x + 5, y + ROW_HEIGHT - 1), fill=border)
+
+def _draw_right(img: Image.Image, x: float, y: int, width: int) -> None:
+    offset = ROW_HEIGHT / 2 * SKEW
+    img.alpha_composite(_skew_panel(width, ROW_HEIGHT, (3, 7, 18, 204), (255, 255, 255, 26)), (int(x - offset), y))
+
+def _draw_grade(img: Image.Image, draw: ImageDraw.ImageDraw, center: tuple, grade: str) -> None:
+    cx, cy = center
+    style = GRADES.get(grade, {"text": grade, "color": (255, 255, 255), "fill": (31, 41, 55, 102), "border": (255, 255, 255, 153)})
+    if grade == "PHI":
+        layer = Image.new("RGBA", (68, 68), (0, 0, 0, 0))
+        ImageDraw.Draw(layer).regular_polygon((34, 34, 34), 4, fill=style["fill"], outline=style["border"], width=3)
+        img.alpha_composite(layer, (int(cx - 34), int(cy - 34)))
+        font = utils.load_font(36, bold=True)
+    else:
+        panel = _skew_panel(56, 48, style["fill"])
+        img.alpha_composite(panel, (int(cx - panel.width / 2), int(cy - 24)))
+        img.alpha_composite(_skew_panel(56, 48, (0, 0, 0, 0), style["border"], 2 if grade in GRADES else 1, outline=True), (int(cx - panel.width / 2), int(cy - 24)))
+        font = utils.load_font(48, bold=True)
+    draw.text((cx, cy), style["text"], font=font, fill=style["color"], anchor="mm")
+
+def _draw_song(img: Image.Image, draw: ImageDraw.ImageDraw, x: float, y: int, width: int, song_data: dict, rank_label: str) -> None:
+    middle_x = x + LEFT_WIDTH - 24
+    middle_width = width - LEFT_WIDTH - RIGHT_WIDTH + 28
+    _draw_middle(img, middle_x, y, middle_width, config.IMAGES_ASSETS_DIR / "cover" / f"{song_data['id']}.png")
+
+    title_font = utils.load_font(24, bold=True)
+    title = song_data.get("title") or song_data["id"].split(".")[0]
+    draw.text((middle_x + 40, y + ROW_HEIGHT - 8), fit_text(draw, title, title_font, middle_width - 104), font=title_font, fill="white", anchor="ls")
+
+    label_font = utils.load_font(20, bold=True)
+    label_width = max(48, draw.textlength(rank_label, font=label_font) + 32)
+    label_right = middle_x + middle_width + ROW_HEIGHT / 4 * SKEW
+    draw.rectangle((label_right - label_width, y + 16, label_right, y + 52), fill=(0, 0, 0))
+    draw.rectangle((label_right - label_width, y + 16, label_right - label_width + 3, y + 52), fill=(38, 38, 38))
+    draw.text((label_right - label_width + 16 + (label_width - 32) / 2, y + 34), rank_label, font=label_font, fill="white", anchor="mm")
+
+    _draw_left(img, draw, x, y, "white")
+    rows = [
+        (str(song_data["score"]).zfill(7), utils.load_font(30), (255, 255, 255)),
+        (f"{song_data['accuracy']:.2f}%", utils.load_font(18), (230, 230, 230)),
+        (f"{song_data['rating']:.2f}", utils.load_font(14), (179, 179, 179)),
+        (f"{song_data['diff']} {song_data['level']}", utils.load_font(14), (179, 179, 179))
+    ]
+    for index, (text, font, color) in enumerate(rows):
+        if index < 3: draw.line((x + 6, y + (index + 1) * 32 - 1, x + LEFT_WIDTH - 1, y + (index + 1) * 32 - 1), fill=(28, 32, 42))
+        draw.text((x + 22, y + index * 32 + 16), text, font=font, fill=color, anchor="lm")
+
+    right_x = x + width - RIGHT_WIDTH
+    _draw_right(img, right_x, y, RIGHT_WIDTH)
+    _draw_grade(img, draw, (right_x + RIGHT_WIDTH / 2, y + ROW_HEIGHT / 2), get_grade(song_data["score"], song_data["status"]))
+
+def _draw_query_time(img: Image.Image, draw: ImageDraw.ImageDraw, x: float, y: int, width: int) -> None:
+    middle_x = x + LEFT_WIDTH - 24
+    _draw_middle(img, middle_x, y, width - LEFT_WIDTH - 48 + 28)
+    draw.text((middle_x + 48, y + 50), time.strftime("%m/%d/%Y"), font=utils.load_font(30), fill="white", anchor="lm")
+    draw.text((middle_x + 48, y + 84), time.strftime("%I:%M:%S %p"), font=utils.load_font(20), fill=(204, 204, 204), anchor="lm")
+    _draw_left(img, draw, x, y, "white")
+    draw.multiline_text((x + 3 + LEFT_WIDTH / 2, y + ROW_HEIGHT / 2), "QUERY\nTIME", font=utils.load_font(30, bold=True), fill="white", anchor="mm", align="center", spacing=0)
+    _draw_right(img, x + width - 48, y, 48)
+
+def _draw_powered_by(img: Image.Image, draw: ImageDraw.ImageDraw, x: float, y: int, width: int) -> None:
+    middle_x = x + LEFT_WIDTH - 24
+    _draw_middle(img, middle_x, y, width - LEFT_WIDTH - 48 + 28)
+    draw.text((middle_x + 48, y + 52), "DISCORD", font=utils.load_font(12, bold=True), fill=(96, 165, 250), anchor="lm")
+    draw.text((middle_x + 48, y + 74), "discord.gg/sHxk93qtkZ", font=utils.load_font(14), fill=(156, 163, 175), anchor="lm")
+    _draw_left(img, draw, x, y, (249, 115, 22))
+    draw.text((x + 3 + LEFT_WIDTH / 2, y + 54), "POWERED BY", font=utils.load_font(12), fill=(249, 115, 22), anchor="mm")
+    draw.text((x + 3 + LEFT_WIDTH / 2, y + 76), "RotaBot", font=utils.load_font(18, bold=True), fill="white", anchor="mm")
+    _draw_right(img, x + width - 48, y, 48)
+
+def _draw_header(img: Image.Image, draw: ImageDraw.ImageDraw, user_info: dict) -> None:
+    x, y = PADDING_X + 16, PADDING_Y
+    offset = ROW_HEIGHT / 2 * SKEW
+    avatar_panel = _skew_panel(160, ROW_HEIGHT, (31, 41, 55, 255))
+    avatar = Image.new("RGBA", avatar_panel.size, (31, 41, 55, 255))
+    avatar.alpha_composite(utils.tile_cache.get(config.IMAGES_ASSETS_DIR / "avatar" / f"{user_info['avatar']}.png", avatar_panel.size, opacity=0.8, fill=(0, 0, 0, 0)))
+    avatar.putalpha(avatar_panel.getchannel("A"))
+    img.alpha_composite(avatar, (int(x + 80 - offset), y))
+    img.alpha_composite(_skew_panel(160, ROW_HEIGHT, (0, 0, 0, 0), (255, 255, 255, 51), 2), (int(x + 80 - offset), y))
+    img.alpha_composite(_skew_panel(96, ROW_HEIGHT, (255, 255, 255, 255), (0, 0, 0, 255), 4), (int(x - offset), y))
+    draw.text((x + 48, y + ROW_HEIGHT / 2 - 4), f"{user_info['summary']['rks']:.3f}", font=utils.load_font(24, bold=True), fill="black", anchor="mm")
+    draw.text((x + 272, y + 8), user_info["nickname"], font=utils.load_font(48), fill="white")
+    draw.text((x + 276, y + 60), user_info.get("intro", ""), font=utils.load_font(18), fill=(153, 153, 153))
+
+def draw_best30(result: dict) -> Image.Image:
+    song_datas = result["song_data"]
+    rank_labels = get_rank_labels(song_datas)
+    cells = [("query_time", None, None)] + [("song", song_data, rank_label) for song_data, rank_label in zip(song_datas, rank_labels)][:28] + [("powered_by", None, None)]
+
+    column_width = (WIDTH - PADDING_X * 2 - COLUMN_GAP) // 2
+    rows = (len(cells) + 1) // 2
+    grid_top = PADDING_Y + ROW_HEIGHT + 32
+    height = grid_top + rows * (ROW_HEIGHT + ROW_MARGIN * 2) + (rows - 1) * ROW_GAP + PADDING_Y
+
+    img = Image.new("RGBA", (WIDTH, height), (0, 0, 0, 255))
+    draw = ImageDraw.Draw(img)
+    _draw_header(img, draw, result["user_info"])
+    for index, (kind, song_data, rank_label) in enumerate(cells):
+        row, column = divmod(index, 2)
+        x = PADDING_X + column * (column_width + COLUMN_GAP)
+        y = grid_top + row * (ROW_HEIGHT + ROW_MARGIN * 2 + ROW_GAP) + ROW_MARGIN
+        if kind == "song": _draw_song(img, draw, x, y, column_width, song_data, rank_label)
+        elif kind == "query_time": _draw_query_time(img, draw, x, y, column_width)
+        else: _draw_powered_by(img, draw, x, y, column_width)
+    return img.convert("RGB")
@@ -1,11 +1,19 @@
 from . import model
 from . import auth
 from . import request
+from . import friend
 from . import processor
+from . import cache
+from common import session
+from . import refresh
 
 __all__ = [
     "model",
     "auth",
     "request",
-    "processor"
+    "friend",
+    "processor",
+    "cache",
+    "session",
+    "refresh"
 ]
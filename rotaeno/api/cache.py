@@ -0,0 +1,63 @@
+import time
+import threading
+import collections
+from typing import Any, Callable
+
+class CloudSaveCache:
+    def __init__(self, freshness: float = 30, max_items: int = 1024) -> None:
+        self.freshness = freshness
+        self.max_items = max_items
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def _get_key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            if key not in self._key_locks: self._key_locks[key] = threading.Lock()
+            return self._key_locks[key]
+
+    def get(self, key: str, fetch: Callable[[], tuple[str | None, Any]], check: Callable[[], str | None] = None) -> Any:
+        with self._get_key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    if time.monotonic() - entry["checked_at"] < self.freshness:
+                        self.hits += 1
+                        return entry["result"]
+
+            if entry is not None and entry["updated_at"] is not None and check is not None:
+                try:
+                    updated_at = check()
+                except Exception as e:
+                    print(f"Cloud save metadata check for `{key}` failed: {e}")
+                    updated_at = None
+                if updated_at is not None and updated_at == entry["updated_at"]:
+                    with self._lock:
+                        entry["checked_at"] = time.monotonic()
+                        self.revalidations += 1
+                    return entry["result"]
+
+            updated_at, result = fetch()
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = {"updated_at": updated_at, "checked_at": time.monotonic(), "result": result}
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_items:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._key_locks.pop(evicted, None)
+            return result
+
+    def invalidate(self, key: str = None) -> None:
+        with self._lock:
+            if key is None: self._entries.clear()
+            else: self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"items": len(self._entries), "hits": self.hits, "revalidations": self.revalidations, "misses": self.misses}
+
+cloud_save_cache = CloudSaveCache()
@@ -0,0 +1,127 @@
+from .model import ServerRegion, FriendAccount
+from .request import AsyncUserAPI
+
+import math
+import time
+import asyncio
+import threading
+import contextlib
+import collections
+
+BASE_REGIONS = {
+    ServerRegion.FRIEND_CN: ServerRegion.CN,
+    ServerRegion.FRIEND_GLOBAL: ServerRegion.GLOBAL
+}
+
+class FriendAccountPool:
+    def __init__(self, accounts: dict = None, rate: float = 5, batch_size: int = 50) -> None:
+        self.accounts = accounts or {ServerRegion.FRIEND_CN: FriendAccount.CN, ServerRegion.FRIEND_GLOBAL: FriendAccount.GLOBAL}
+        self.rate = rate
+        self.batch_size = batch_size
+        self._leased = set()
+        self._next_at = {}
+        self._waiters = collections.deque()
+        self._condition = threading.Condition()
+
+    def _get_accounts(self, region: ServerRegion) -> list[dict]:
+        accounts = self.accounts.get(region)
+        if not accounts: raise ValueError(f"No friend accounts configured for region `{region.value}`")
+        return accounts
+
+    def _try_lease(self, region: ServerRegion) -> dict | None:
+        with self._condition:
+            free = [account for account in self._get_accounts(region) if account["objectID"] not in self._leased]
+            if not free: return None
+            account = min(free, key=lambda account: self._next_at.get(account["objectID"], 0))
+            self._leased.add(account["objectID"])
+            return account
+
+    def _release(self, account: dict) -> None:
+        with self._condition:
+            self._leased.discard(account["objectID"])
+            self._condition.notify_all()
+            waiters, self._waiters = self._waiters, collections.deque()
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(lambda waiter=waiter: waiter.done() or waiter.set_result(None))
+            except RuntimeError:
+                pass
+
+    @contextlib.contextmanager
+    def lease(self, region: ServerRegion):
+        with self._condition:
+            account = None
+            while account is None:
+                account = self._try_lease(region)
+                if account is None: self._condition.wait()
+        try:
+            yield account
+        finally:
+            self._release(account)
+
+    @contextlib.asynccontextmanager
+    async def lease_async(self, region: ServerRegion):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                account = self._try_lease(region)
+                if account is not None: break
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            await waiter
+        try:
+            yield account
+        finally:
+            self._release(account)
+
+    def _reserve(self, account: dict) -> float:
+        with self._condition:
+            now = time.monotonic()
+            next_at = max(now, self._next_at.get(account["objectID"], now))
+            self._next_at[account["objectID"]] = next_at + 1 / self.rate
+            return next_at - now
+
+    def throttle(self, account: dict) -> None:
+        time.sleep(self._reserve(account))
+
+    async def throttle_async(self, account: dict) -> None:
+        await asyncio.sleep(self._reserve(account))
+
+    async def _fetch_followees(self, region: ServerRegion, short_ids: list[str], proxies: dict = None, limiter=None) -> dict:
+        async with self.lease_async(region) as account:
+            base_region = BASE_REGIONS[region]
+            api = AsyncUserAPI(region=base_region, user_profile={"serverCode": base_region.value, "objectID": account["objectID"], "sessionToken": account["sessionToken"]}, proxies=proxies)
+
+            async def call(function, *args):
+                if limiter is not None: await limiter.acquire()
+                await self.throttle_async(account)
+                return await function(*args)
+
+            follow_results = await asyncio.gather(*[call(api.follow_user, short_id) for short_id in short_ids], return_exceptions=True)
+            try:
+                social_datas = (await call(api.get_followee_data))["result"]["socialDatas"]
+            finally:
+                await asyncio.gather(*[
+                    call(api.unfollow_user, short_id)
+                    for short_id, follow_result in zip(short_ids, follow_results) if not isinstance(follow_result, BaseException)
+                ], return_exceptions=True)
+
+        followees = {}
+        for short_id, follow_result in zip(short_ids, follow_results):
+            if isinstance(follow_result, BaseException): print(f"Following `{short_id}` failed: {follow_result}")
+            elif isinstance(follow_result.get("result"), dict): followees[short_id] = follow_result["result"]
+        for social_data in social_datas:
+            if social_data["shortId"].lower() in short_ids: followees[social_data["shortId"].lower()] = social_data
+        return followees
+
+    async def fetch_followees(self, region: ServerRegion, short_ids: list[str], proxies: dict = None, limiter=None) -> dict:
+        accounts = self._get_accounts(region)
+        short_ids = list(dict.fromkeys(short_id.lower() for short_id in short_ids))
+        if not short_ids: return {}
+        size = min(self.batch_size, math.ceil(len(short_ids) / len(accounts)))
+        followees = {}
+        for result in await asyncio.gather(*[self._fetch_followees(region, short_ids[index:index + size], proxies, limiter) for index in range(0, len(short_ids), size)]):
+            followees.update(result)
+        return followees
+
+friend_account_pool = FriendAccountPool()
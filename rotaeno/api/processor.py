@@ -1,8 +1,11 @@
 from ..database import song_data as song_data_database
 from ..database import player_data as player_data_database
 from ..database import player_song_data as player_song_data_database
-from .request import UserAPI
+from ..database import ingest as ingest_database
+from .request import UserAPI, AsyncUserAPI
+from .friend import friend_account_pool
 
+import asyncio
 import msgpack
 from typing import Tuple, Any
 from datetime import datetime
@@ -90,6 +93,39 @@ def save_data_to_file(data: dict, save_path: str) -> None:
     with open(save_path, "wb") as f:
         msgpack.dump(data, f)
 
+def get_object_id(user_profile: dict) -> str:
+    if user_profile["serverCode"].startswith("friend_"):
+        return f"{user_profile['serverCode']}_{user_profile['shortID'].lower()}"
+    return user_profile.get("objectID", "")
+
+def get_database_records(object_id: str, cloud_save: dict) -> tuple[player_data_database.Player, list[tuple[str, player_song_data_database.PlayerSongScore]]]:
+    player_info = cloud_save["playerInfo"]
+    player = player_data_database.Player(
+        object_id=object_id,
+        name=player_info["displayName"],
+        rating=player_info["rating"],
+        exp=player_info["exp"],
+        level=player_info["level"],
+        all_perfect_plus=player_info["playRecords"]["TotalApp"],
+        all_perfect=player_info["playRecords"]["TotalAp"],
+        full_combo=player_info["playRecords"]["TotalFc"],
+        miss=player_info["playRecords"]["Miss"],
+        good=player_info["playRecords"]["Good"],
+        perfect=player_info["playRecords"]["Perfect"],
+        perfect_plus=player_info["playRecords"]["PerfectPlus"],
+        play_record=player_info["playRecords"]
+    )
+    song_scores = [
+        (song_data["id"], player_song_data_database.PlayerSongScore(
+            object_id=object_id,
+            difficulty=song_data["level"],
+            score=song_data["score"],
+            rating=song_data["ratingMix"]
+        ))
+        for song_data in cloud_save["songDatas"]
+    ]
+    return player, song_scores
+
 def find_keys_in_any_dict(any_dict: dict, keys: list, default: Any = None) -> Any:
     for key in keys:
         if key in any_dict:
@@ -98,6 +134,20 @@ def find_keys_in_any_dict(any_dict: dict, keys: list, default: Any = None) -> An
     raise KeyError(f"{keys} not in {list(any_dict.keys())}")
 
 class Processor(UserAPI):
+    def _get_friend_followee_data(self) -> dict:
+        short_id = self.user_profile["shortID"]
+        with friend_account_pool.lease(self.region) as account:
+            self.friend_account = account
+            self.user_profile["objectID"] = account["objectID"]
+            self.user_profile["sessionToken"] = account["sessionToken"]
+            friend_account_pool.throttle(account)
+            raw_data = self.follow_user(short_id=short_id)
+            try:
+                return self.get_followee_data(short_id=short_id, raw_data=raw_data)
+            finally:
+                friend_account_pool.throttle(account)
+                self.unfollow_user(short_id=short_id)
+    
     def get_cloud_save(self, get_object_id: bool = False, raw_data: dict = None, save_path: str = None, add_to_database: bool = False) -> dict:
         def format_duration_en(td: timedelta):
             total_seconds = int(td.total_seconds())
@@ -117,12 +167,12 @@ class Processor(UserAPI):
             cloud_save = raw_data["results"][0]["cloudSave"]
         else:
             if self.user_profile["serverCode"].startswith("friend_"):
-                followee_data = self.get_followee_data(short_id=self.user_profile["shortID"], raw_data=self.follow_user(short_id=self.user_profile["shortID"]))
-                self.unfollow_user(short_id=self.user_profile["shortID"])
+                followee_data = self._get_friend_followee_data()
                 raw_data = self.followee_data_to_cloud_save_raw_data_format(followee_data=followee_data)
             else:
                 raw_data = super().get_cloud_save(get_object_id=get_object_id)
             cloud_save = raw_data["results"][0]["cloudSave"]
+        self.cloud_save_updated_at = raw_data["results"][0].get("updatedAt")
         if save_path is not None:
             save_data_to_file(raw_data, save_path)
         
@@ -226,54 +276,27 @@ class Processor(UserAPI):
                 song_data["level"] = song_level
                 song_datas.append(song_data)
         
+        cloud_save = {
+            "playerInfo": player_info,
+            "songDatas": song_datas
+        }
+        
         if add_to_database:
-            object_id = self.user_profile.get("objectID", "")
-            if self.user_profile["serverCode"].startswith("friend_"):
-                object_id = f"{self.user_profile['serverCode']}_{self.user_profile['shortID'].lower()}"
+            object_id = get_object_id(self.user_profile)
             if object_id == "":
                 print("Why the objectID is empty, this data will not be added to the player data")
             else:
-                timestamp = datetime.now()
-                
-                player = player_data_database.Player(
-                    object_id=object_id,
-                    name=player_info["displayName"],
-                    rating=player_info["rating"],
-                    exp=player_info["exp"],
-                    level=player_info["level"],
-                    all_perfect_plus=player_info["playRecords"]["TotalApp"],
-                    all_perfect=player_info["playRecords"]["TotalAp"],
-                    full_combo=player_info["playRecords"]["TotalFc"],
-                    miss=player_info["playRecords"]["Miss"],
-                    good=player_info["playRecords"]["Good"],
-                    perfect=player_info["playRecords"]["Perfect"],
-                    perfect_plus=player_info["playRecords"]["PerfectPlus"],
-                    play_record=player_info["playRecords"]
-                )
-                player_data_database.player_data.add_player(player=player, timestamp=timestamp)
-                
-                for song_data in song_datas:
-                    player_song_score = player_song_data_database.PlayerSongScore(
-                        object_id=object_id,
-                        difficulty=song_data["level"],
-                        score=song_data["score"],
-                        rating=song_data["ratingMix"]
-                    )
-                    
-                    player_song_data_database.player_song_score_manager.get_song_data(song_data["id"]).add_score(player_song_score)
+                player, song_scores = get_database_records(object_id, cloud_save)
+                ingest_database.ingest_save(player=player, song_scores=song_scores, timestamp=datetime.now())
         
-        return {
-            "playerInfo": player_info,
-            "songDatas": song_datas
-        }
+        return cloud_save
     
     def get_user_data(self, raw_data: dict = None, save_path: str = None) -> dict:
         if raw_data:
             user_data = raw_data
         else:
             if self.user_profile["serverCode"].startswith("friend_"):
-                followee_data = self.get_followee_data(short_id=self.user_profile["shortID"], raw_data=self.follow_user(short_id=self.user_profile["shortID"]))
-                self.unfollow_user(short_id=self.user_profile["shortID"])
+                followee_data = self._get_friend_followee_data()
                 raw_data = self.followee_data_to_user_data_raw_data_format(followee_data=followee_data)
             else:
                 raw_data = super().get_user_data()
@@ -517,4 +540,46 @@ class Processor(UserAPI):
         return followee_data_raw_data_format
     
     def unfollow_user(self, short_id: str) -> dict:
-        return super().unfollow_user(short_id=short_id)
\ No newline at end of file
+        return super().unfollow_user(short_id=short_id)
+
+class AsyncProcessor(AsyncUserAPI):
+    def _processor(self) -> Processor:
+        return Processor(region=self.region, user_profile=dict(self.user_profile), proxies=self.proxies)
+    
+    async def _get_friend_followee_data(self, processor: Processor) -> dict:
+        short_id = self.user_profile["shortID"].lower()
+        social_data = (await friend_account_pool.fetch_followees(self.region, [short_id], proxies=self.proxies)).get(short_id)
+        if social_data is None: raise ValueError(f"Followee with short ID `{short_id}` not found")
+        return processor.get_followee_data(short_id=short_id, raw_data={"result": {"socialDatas": [social_data]}})
+    
+    async def get_cloud_save_raw_data(self, get_object_id: bool = False) -> dict:
+        if self.user_profile["serverCode"].startswith("friend_"):
+            processor = self._processor()
+            return processor.followee_data_to_cloud_save_raw_data_format(followee_data=await self._get_friend_followee_data(processor))
+        return await super().get_cloud_save(get_object_id=get_object_id)
+    
+    async def get_cloud_save(self, get_object_id: bool = False, save_path: str = None, add_to_database: bool = False) -> dict:
+        processor = self._processor()
+        raw_data = await self.get_cloud_save_raw_data(get_object_id=get_object_id)
+        cloud_save = await asyncio.to_thread(processor.get_cloud_save, raw_data=raw_data, save_path=save_path, add_to_database=add_to_database)
+        self.cloud_save_updated_at = processor.cloud_save_updated_at
+        return cloud_save
+    
+    async def get_user_data(self, save_path: str = None) -> dict:
+        processor = self._processor()
+        if self.user_profile["serverCode"].startswith("friend_"):
+            raw_data = processor.followee_data_to_user_data_raw_data_format(followee_data=await self._get_friend_followee_data(processor))
+        else:
+            raw_data = await super().get_user_data()
+        return processor.get_user_data(raw_data=raw_data, save_path=save_path)
+    
+    async def get_followee_data(self, short_id: str = None, save_path: str = None) -> dict | list[dict]:
+        return self._processor().get_followee_data(short_id=short_id, raw_data=await super().get_followee_data(), save_path=save_path)
+    
+    async def follow_user(self, short_id: str) -> dict:
+        followee_data_raw_data_format = {
+            "result": {
+                "socialDatas": [(await super().follow_user(short_id=short_id))["result"]]
+            }
+        }
+        return followee_data_raw_data_format
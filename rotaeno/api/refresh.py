@@ -0,0 +1,177 @@
+from ..database import ingest as ingest_database
+from ..database import engine as database_engine
+from .model import ServerRegion, ServerURL
+from .processor import Processor, AsyncProcessor, get_object_id, get_database_records
+from .friend import friend_account_pool
+
+import time
+import asyncio
+import urllib.parse
+import concurrent.futures
+from datetime import datetime
+
+def parse_cloud_save(user_profile: dict, raw_data: dict) -> tuple:
+    object_id = get_object_id(user_profile)
+    if object_id == "": raise ValueError("Why the objectID is empty, this data will not be added to the player data")
+    processor = Processor(region=ServerRegion(user_profile["serverCode"]), user_profile=dict(user_profile))
+    if user_profile["serverCode"].startswith("friend_"):
+        raw_data = processor.followee_data_to_cloud_save_raw_data_format(followee_data=processor.get_followee_data(short_id=user_profile["shortID"], raw_data=raw_data))
+    return get_database_records(object_id, processor.get_cloud_save(raw_data=raw_data))
+
+def _init_parse_worker() -> None:
+    database_engine.dispose_all(close=False)
+
+class HostRateLimiter:
+    def __init__(self, rate: float, burst: int = None) -> None:
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int = 1) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate) - tokens
+            self._updated = now
+            if self._tokens < 0: await asyncio.sleep(-self._tokens / self.rate)
+
+class RefreshScheduler:
+    def __init__(self, concurrency: int = 16, rate_limits: dict = None, default_rate: float = 10, parse_workers: int = None, batch_size: int = 50, flush_interval: float = 1.0, friend_batch_size: int = 200, proxies: dict = None, executor: concurrent.futures.Executor = None) -> None:
+        self.concurrency = concurrency
+        self.rate_limits = rate_limits or {}
+        self.default_rate = default_rate
+        self.parse_workers = parse_workers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.friend_batch_size = friend_batch_size
+        self.proxies = proxies
+        self.executor = executor
+        self._reset()
+
+    def _reset(self) -> None:
+        self._limiters = {}
+        self._queued = 0
+        self._completed = 0
+        self._batches = 0
+        self._failures = []
+        self._queue_lags = []
+        self._started_at = None
+        self._finished_at = None
+
+    def _limiter(self, host: str) -> HostRateLimiter:
+        if host not in self._limiters:
+            self._limiters[host] = HostRateLimiter(self.rate_limits.get(host, self.default_rate))
+        return self._limiters[host]
+
+    def _fail(self, user_profile: dict, stage: str, error: Exception) -> None:
+        object_id = get_object_id(user_profile)
+        print(f"Refreshing `{object_id}` failed at {stage}: {error}")
+        self._failures.append({"objectID": object_id, "stage": stage, "error": str(error)})
+
+    async def _parse(self, user_profile: dict, raw_data: dict, executor: concurrent.futures.Executor, writes: asyncio.Queue) -> None:
+        try:
+            record = await asyncio.get_running_loop().run_in_executor(executor, parse_cloud_save, user_profile, raw_data)
+        except Exception as e:
+            return self._fail(user_profile, "parse", e)
+        await writes.put((user_profile, record))
+
+    async def _refresh(self, user_profile: dict, executor: concurrent.futures.Executor, writes: asyncio.Queue) -> None:
+        processor = AsyncProcessor(region=ServerRegion(user_profile["serverCode"]), user_profile=dict(user_profile), proxies=self.proxies)
+        try:
+            await self._limiter(urllib.parse.urlsplit(processor.base_url).netloc).acquire()
+            raw_data = await processor.get_cloud_save_raw_data()
+        except Exception as e:
+            return self._fail(user_profile, "fetch", e)
+        await self._parse(user_profile, raw_data, executor, writes)
+
+    async def _refresh_friends(self, user_profiles: list[dict], executor: concurrent.futures.Executor, writes: asyncio.Queue) -> None:
+        region = ServerRegion(user_profiles[0]["serverCode"])
+        limiter = self._limiter(urllib.parse.urlsplit(ServerURL.CN if region == ServerRegion.FRIEND_CN else ServerURL.GLOBAL).netloc)
+        try:
+            social_datas = await friend_account_pool.fetch_followees(region, [user_profile["shortID"] for user_profile in user_profiles], proxies=self.proxies, limiter=limiter)
+        except Exception as e:
+            for user_profile in user_profiles: self._fail(user_profile, "fetch", e)
+            return
+        parses = []
+        for user_profile in user_profiles:
+            social_data = social_datas.get(user_profile["shortID"].lower())
+            if social_data is None: self._fail(user_profile, "fetch", ValueError(f"Followee with short ID `{user_profile['shortID']}` not found"))
+            else: parses.append(self._parse(user_profile, {"result": {"socialDatas": [social_data]}}, executor, writes))
+        await asyncio.gather(*parses)
+
+    async def _work(self, queue: asyncio.Queue, executor: concurrent.futures.Executor, writes: asyncio.Queue) -> None:
+        while True:
+            try:
+                queued_at, user_profiles = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            self._queue_lags.extend([time.monotonic() - queued_at] * len(user_profiles))
+            if user_profiles[0]["serverCode"].startswith("friend_"): await self._refresh_friends(user_profiles, executor, writes)
+            else: await self._refresh(user_profiles[0], executor, writes)
+
+    async def _flush(self, batch: list) -> None:
+        try:
+            await asyncio.to_thread(ingest_database.ingest_saves, [record for _, record in batch], datetime.now())
+        except Exception as e:
+            for user_profile, _ in batch: self._fail(user_profile, "write", e)
+            return
+        self._batches += 1
+        self._completed += len(batch)
+
+    async def _write(self, writes: asyncio.Queue) -> None:
+        batch = []
+        while True:
+            try:
+                item = await asyncio.wait_for(writes.get(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                if batch: await self._flush(batch)
+                batch = []
+                continue
+            if item is None: break
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                await self._flush(batch)
+                batch = []
+        if batch: await self._flush(batch)
+
+    async def run(self, user_profiles: list[dict]) -> dict:
+        self._reset()
+        self._started_at = time.monotonic()
+        queue, writes = asyncio.Queue(), asyncio.Queue()
+        friend_profiles = {}
+        for user_profile in user_profiles:
+            if user_profile["serverCode"].startswith("friend_"): friend_profiles.setdefault(user_profile["serverCode"], []).append(user_profile)
+            else: queue.put_nowait((self._started_at, [user_profile]))
+        for profiles in friend_profiles.values():
+            for index in range(0, len(profiles), self.friend_batch_size):
+                queue.put_nowait((self._started_at, profiles[index:index + self.friend_batch_size]))
+        self._queued = len(user_profiles)
+
+        executor = self.executor or concurrent.futures.ProcessPoolExecutor(max_workers=self.parse_workers, initializer=_init_parse_worker)
+        try:
+            writer = asyncio.create_task(self._write(writes))
+            await asyncio.gather(*[self._work(queue, executor, writes) for _ in range(max(1, min(self.concurrency, queue.qsize())))])
+            await writes.put(None)
+            await writer
+        finally:
+            if self.executor is None: executor.shutdown()
+        self._finished_at = time.monotonic()
+        return self.stats()
+
+    def stats(self) -> dict:
+        elapsed = ((self._finished_at or time.monotonic()) - self._started_at) if self._started_at is not None else 0
+        return {
+            "queued": self._queued,
+            "completed": self._completed,
+            "failed": len(self._failures),
+            "batches": self._batches,
+            "elapsed": elapsed,
+            "throughput": self._completed / elapsed if elapsed else 0,
+            "averageQueueLag": sum(self._queue_lags) / len(self._queue_lags) if self._queue_lags else 0,
+            "maxQueueLag": max(self._queue_lags, default=0),
+            "failures": list(self._failures)
+        }
+
+def refresh_all(user_profiles: list[dict], **options) -> dict:
+    return asyncio.run(RefreshScheduler(**options).run(user_profiles))
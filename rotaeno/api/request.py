@@ -1,8 +1,7 @@
 import time
 import json
-import random
 import hashlib
-import requests
+from common import session
 from .model import *
 
 class BaseAPI:
@@ -20,15 +19,9 @@ class BaseAPI:
         elif region == ServerRegion.FRIEND_CN:
             self.base_url = ServerURL.CN
             self.secret = ServerSecret.CN
-            self.friend_account = random.choice(FriendAccount.CN)
-            self.user_profile["objectID"] = self.friend_account["objectID"]
-            self.user_profile["sessionToken"] = self.friend_account["sessionToken"]
         elif region == ServerRegion.FRIEND_GLOBAL:
             self.base_url = ServerURL.GLOBAL
             self.secret = ServerSecret.GLOBAL
-            self.friend_account = random.choice(FriendAccount.GLOBAL)
-            self.user_profile["objectID"] = self.friend_account["objectID"]
-            self.user_profile["sessionToken"] = self.friend_account["sessionToken"]
         else:
             raise ValueError("Invalid region")
 
@@ -44,8 +37,17 @@ class BaseAPI:
             "Content-Type": "application/json"
         }
 
+    def _cloud_save_where(self, object_id: str) -> str:
+        return json.dumps({
+            "user": {
+                "__type": "Pointer",
+                "className": "_User",
+                "objectId": object_id
+            }
+        })
+
     def get(self, endpoint: str, params: dict = None) -> dict:
-        return requests.get(
+        return session.session_pool.get(
             f"{self.base_url}/{endpoint}",
             headers=self._build_headers(),
             params=params,
@@ -53,7 +55,7 @@ class BaseAPI:
         ).json()
 
     def post(self, endpoint: str, data: dict = None) -> dict:
-        return requests.post(
+        return session.session_pool.post(
             f"{self.base_url}/{endpoint}",
             headers=self._build_headers(),
             json=data,
@@ -61,7 +63,7 @@ class BaseAPI:
         ).json()
 
     def put(self, endpoint: str, data: dict = None) -> dict:
-        return requests.put(
+        return session.session_pool.put(
             f"{self.base_url}/{endpoint}",
             headers=self._build_headers(),
             json=data,
@@ -75,16 +77,19 @@ class UserAPI(BaseAPI):
         else:
             object_id = self.get_user_data()["objectId"]
         params = {
-            "where": json.dumps({
-                "user": {
-                    "__type": "Pointer",
-                    "className": "_User",
-                    "objectId": object_id
-                }
-            })
+            "where": self._cloud_save_where(object_id)
         }
         return self.get("/1.1/classes/CloudSave", params=params)
     
+    def get_cloud_save_updated_at(self) -> str | None:
+        params = {
+            "where": self._cloud_save_where(self.user_profile.get("objectID", "")),
+            "keys": "updatedAt",
+            "limit": 1
+        }
+        results = self.get("/1.1/classes/CloudSave", params=params).get("results", [])
+        return results[0].get("updatedAt") if results else None
+    
     def get_user_data(self) -> dict:
         return self.get(f"/1.1/users/me")
 
@@ -96,3 +101,60 @@ class UserAPI(BaseAPI):
     
     def unfollow_user(self, short_id: str) -> dict:
         return self.post("/1.1/call/UnfollowPlayer", data={"ShortId": short_id.lower()})
+
+class AsyncBaseAPI(BaseAPI):
+    async def get(self, endpoint: str, params: dict = None) -> dict:
+        return (await session.async_session_pool.get(
+            f"{self.base_url}/{endpoint}",
+            headers=self._build_headers(),
+            params=params,
+            allow_redirects=True, proxies=self.proxies, timeout=10, verify=False
+        )).json()
+
+    async def post(self, endpoint: str, data: dict = None) -> dict:
+        return (await session.async_session_pool.post(
+            f"{self.base_url}/{endpoint}",
+            headers=self._build_headers(),
+            json=data,
+            allow_redirects=True, proxies=self.proxies, timeout=10, verify=False
+        )).json()
+
+    async def put(self, endpoint: str, data: dict = None) -> dict:
+        return (await session.async_session_pool.put(
+            f"{self.base_url}/{endpoint}",
+            headers=self._build_headers(),
+            json=data,
+            allow_redirects=True, proxies=self.proxies, timeout=10, verify=False
+        )).json()
+
+class AsyncUserAPI(AsyncBaseAPI):
+    async def get_cloud_save(self, get_object_id: bool = False) -> dict:
+        if not get_object_id:
+            object_id = self.user_profile.get("objectID", "")
+        else:
+            object_id = (await self.get_user_data())["objectId"]
+        params = {
+            "where": self._cloud_save_where(object_id)
+        }
+        return await self.get("/1.1/classes/CloudSave", params=params)
+    
+    async def get_cloud_save_updated_at(self) -> str | None:
+        params = {
+            "where": self._cloud_save_where(self.user_profile.get("objectID", "")),
+            "keys": "updatedAt",
+            "limit": 1
+        }
+        results = (await self.get("/1.1/classes/CloudSave", params=params)).get("results", [])
+        return results[0].get("updatedAt") if results else None
+    
+    async def get_user_data(self) -> dict:
+        return await self.get(f"/1.1/users/me")
+
+    async def get_followee_data(self) -> dict:
+        return await self.post("/1.1/call/GetAllFolloweeSocialData", data={})
+    
+    async def follow_user(self, short_id: str) -> dict:
+        return await self.post("/1.1/call/FollowPlayer", data={"ShortId": short_id.lower()})
+    
+    async def unfollow_user(self, short_id: str) -> dict:
+        return await self.post("/1.1/call/UnfollowPlayer", data={"ShortId": short_id.lower()})
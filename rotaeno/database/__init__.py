@@ -1,7 +1,11 @@
+from . import engine
 from . import song_data
 from . import player_data
+from . import player_chart_data
 
 __all__ = [
+    "engine",
     "song_data",
-    "player_data"
+    "player_data",
+    "player_chart_data"
 ]
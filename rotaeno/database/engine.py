@@ -0,0 +1,127 @@
+from sqlalchemy import create_engine, event, inspect, text, Column, MetaData, Table
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+from datetime import datetime
+import pathlib
+import threading
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,
+    "temp_store": "MEMORY"
+}
+
+CATALOGUE_PRAGMAS = ["mmap_size", "cache_size", "temp_store"]
+
+POOL_OPTIONS = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_timeout": 30,
+    "pool_recycle": -1,
+    "pool_pre_ping": False
+}
+
+_engines: dict[tuple[str, bool], Engine] = {}
+_lock = threading.Lock()
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            if value is not None: cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+def _set_catalogue_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for name in CATALOGUE_PRAGMAS:
+            if SQLITE_PRAGMAS.get(name) is not None: cursor.execute(f"PRAGMA {name}={SQLITE_PRAGMAS[name]}")
+    finally:
+        cursor.close()
+
+def _is_file_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:") and not url.database.startswith("file::memory:")
+
+def _create_engine(url: str, wal: bool = True) -> Engine:
+    parsed_url = make_url(url)
+    options = {}
+    if parsed_url.get_backend_name() != "sqlite" or _is_file_sqlite(parsed_url):
+        options.update(poolclass=QueuePool, **POOL_OPTIONS)
+    if parsed_url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    engine = create_engine(url, **options)
+    if parsed_url.get_backend_name() == "sqlite":
+        event.listen(engine, "connect", _set_sqlite_pragmas if wal else _set_catalogue_pragmas)
+    return engine
+
+def get_engine(url: str, wal: bool = True) -> Engine:
+    with _lock:
+        if (url, wal) not in _engines: _engines[(url, wal)] = _create_engine(url, wal)
+        return _engines[(url, wal)]
+
+def dispose_all(close: bool = True) -> None:
+    with _lock:
+        for engine in _engines.values(): engine.dispose(close=close)
+
+def sqlite_engine(database_path: str, wal: bool = True) -> Engine:
+    return get_engine(f"sqlite:///{database_path}", wal)
+
+def read_only_engine(database_path: str) -> Engine:
+    return get_engine(f"sqlite:///file:{pathlib.Path(database_path).resolve().as_posix()}?mode=ro&uri=true", wal=False)
+
+def database_engine(database: str) -> Engine:
+    return get_engine(database if "://" in database else f"sqlite:///{database}")
+
+def _partitioned_table(table: Table, column: str) -> Table:
+    return Table(
+        table.name,
+        MetaData(),
+        *[
+            Column(c.name, c.type, primary_key=c.primary_key or c.name == column, nullable=c.nullable, autoincrement=c.autoincrement is True)
+            for c in table.columns
+        ],
+        postgresql_partition_by=f"RANGE ({column})"
+    )
+
+def ensure_partitions(bind: Engine, table_name: str, start: datetime = None, months: int = 3) -> list[str]:
+    if bind.dialect.name != "postgresql": return []
+    if start is None: start = datetime.now()
+    created = []
+    with bind.begin() as connection:
+        connection.execute(text(f'CREATE TABLE IF NOT EXISTS "{table_name}_default" PARTITION OF "{table_name}" DEFAULT'))
+        year, month = start.year, start.month
+        for _ in range(months):
+            next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+            name = f"{table_name}_y{year:04d}m{month:02d}"
+            connection.execute(text(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table_name}" '
+                f"FOR VALUES FROM ('{year:04d}-{month:02d}-01') TO ('{next_year:04d}-{next_month:02d}-01')"
+            ))
+            created.append(name)
+            year, month = next_year, next_month
+    return created
+
+def create_all(bind: Engine, metadata: MetaData, partitioned: list[Table] = (), column: str = "timestamp") -> None:
+    if bind.dialect.name == "postgresql":
+        for table in partitioned:
+            if inspect(bind).has_table(table.name): continue
+            _partitioned_table(table, column).create(bind)
+            ensure_partitions(bind, table.name)
+    metadata.create_all(bind)
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            if not index.unique: index.create(bind, checkfirst=True)
+
+def configure(pragmas: dict = None, **pool_options) -> None:
+    unknown = set(pool_options) - set(POOL_OPTIONS)
+    if unknown: raise ValueError(f"Unknown pool options: {', '.join(sorted(unknown))}")
+    with _lock:
+        if pragmas: SQLITE_PRAGMAS.update(pragmas)
+        POOL_OPTIONS.update(pool_options)
+        for (url, wal), engine in _engines.items():
+            engine.dispose()
+            engine.pool = _create_engine(url, wal).pool
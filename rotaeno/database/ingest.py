@@ -0,0 +1,17 @@
+from . import player_data as player_data_database
+from . import player_song_data as player_song_data_database
+
+from datetime import datetime
+
+def ingest_save(player: player_data_database.Player, song_scores: list[tuple[str, player_song_data_database.PlayerSongScore]], timestamp: datetime = None) -> dict:
+    if timestamp is None:
+        timestamp = datetime.now()
+    player_data_database.player_data.add_player(player=player, timestamp=timestamp)
+    return player_song_data_database.player_song_score_manager.add_scores(song_scores, timestamp=timestamp)
+
+def ingest_saves(saves: list[tuple[player_data_database.Player, list[tuple[str, player_song_data_database.PlayerSongScore]]]], timestamp: datetime = None) -> dict:
+    if timestamp is None:
+        timestamp = datetime.now()
+    players = player_data_database.player_data.add_players([player for player, _ in saves], timestamp=timestamp)
+    results = player_song_data_database.player_song_score_manager.add_scores([song_score for _, song_scores in saves for song_score in song_scores], timestamp=timestamp)
+    return {"players": players, **results}
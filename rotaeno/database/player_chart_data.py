@@ -0,0 +1,161 @@
+from . import engine
+
+import os
+import json
+import hashlib
+from datetime import datetime
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy import insert, delete, Column, String, Integer, Float, Boolean, DateTime, JSON, Index
+
+class PlayerChartData:
+    _base = declarative_base()
+
+    class Chart(_base):
+        __tablename__ = "player_chart"
+        __table_args__ = (
+            Index("ix_player_chart_rating", "object_id", "rating_mix"),
+            Index("ix_player_chart_diff", "object_id", "diff"),
+            Index("ix_player_chart_status", "object_id", "status", "diff"),
+            Index("ix_player_chart_score", "object_id", "score")
+        )
+
+        object_id = Column(String, primary_key=True)
+        song_id = Column(String, primary_key=True)
+        level = Column(String, primary_key=True)
+        position = Column(Integer, nullable=False)
+        title = Column(String, nullable=False)
+        diff = Column(Float, nullable=False)
+        score = Column(Integer, nullable=False)
+        rating = Column(Float, nullable=False)
+        rating_mix = Column(Float, nullable=False)
+        status = Column(String, nullable=False)
+        is_cleared = Column(Boolean, nullable=False)
+        is_favorite = Column(Boolean, nullable=False)
+        next_point_score = Column(Float, nullable=False)
+
+    class Meta(_base):
+        __tablename__ = "player_chart_meta"
+
+        object_id = Column(String, primary_key=True)
+        updated_at = Column(DateTime, nullable=False)
+        signature = Column(String, nullable=False)
+        player_info = Column(JSON, nullable=False)
+
+    ORDER_COLUMNS = {
+        "rating": "rating_mix",
+        "ratingMix": "rating_mix",
+        "score": "score",
+        "level": "diff",
+        "diff": "diff"
+    }
+
+    STATUS_FILTERS = {
+        "CLEAR": ("is_cleared", True),
+        "NOTCLEAR": ("is_cleared", False),
+        "FAVORITE": ("is_favorite", True),
+        "NOTFAVORITE": ("is_favorite", False)
+    }
+
+    def __init__(self, database_path: str):
+        self.engine = engine.database_engine(database_path)
+        engine.create_all(self.engine, self._base.metadata)
+        self.session = sessionmaker(bind=self.engine)
+
+    @staticmethod
+    def get_signature(user_data: dict) -> str:
+        return hashlib.sha1(json.dumps(user_data, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+    def refresh(self, object_id: str, user_data: dict, updated_at: datetime = None, signature: str = None) -> bool:
+        if signature is None:
+            signature = self.get_signature(user_data)
+        session = self.session()
+        try:
+            meta = session.get(self.Meta, object_id)
+            if meta is not None and meta.signature == signature: return False
+
+            session.execute(delete(self.Chart).where(self.Chart.object_id == object_id))
+            rows = [
+                dict(
+                    object_id=object_id,
+                    song_id=song_data["id"],
+                    level=song_data["level"],
+                    position=position,
+                    title=song_data["title"],
+                    diff=song_data["diff"],
+                    score=song_data["score"],
+                    rating=song_data["rating"],
+                    rating_mix=song_data["ratingMix"],
+                    status=song_data["status"],
+                    is_cleared=song_data["isCleared"],
+                    is_favorite=song_data["isFavorite"],
+                    next_point_score=song_data["nextPointScore"]
+                )
+                for position, song_data in enumerate(user_data["songDatas"])
+            ]
+            if rows: session.execute(insert(self.Chart), rows)
+            session.merge(self.Meta(
+                object_id=object_id,
+                updated_at=updated_at or datetime.now(),
+                signature=signature,
+                player_info=user_data["playerInfo"]
+            ))
+            session.commit()
+            return True
+        except Exception as e:
+            session.rollback()
+            print(f"Player chart data refresh has a mistake: {e}")
+            raise
+        finally:
+            session.close()
+
+    def get_meta(self, object_id: str) -> dict | None:
+        session = self.session()
+        try:
+            meta = session.get(self.Meta, object_id)
+            if meta is None: return None
+            return {"updatedAt": meta.updated_at, "signature": meta.signature, "playerInfo": meta.player_info}
+        finally:
+            session.close()
+
+    def get_charts(self, object_id: str, song_id: str = None, status: str = None, diff_range: tuple = None, order_by: str = None, limit: int = None) -> list[dict]:
+        session = self.session()
+        try:
+            query = session.query(self.Chart).filter(self.Chart.object_id == object_id)
+            if song_id is not None:
+                query = query.filter(self.Chart.song_id == song_id)
+            if status is not None:
+                if status in self.STATUS_FILTERS:
+                    column, value = self.STATUS_FILTERS[status]
+                    query = query.filter(getattr(self.Chart, column) == value)
+                else:
+                    query = query.filter(self.Chart.status == status)
+            if diff_range is not None:
+                query = query.filter(self.Chart.diff >= diff_range[0], self.Chart.diff <= diff_range[1])
+            if order_by is not None:
+                if order_by not in self.ORDER_COLUMNS: raise ValueError(f"Unsupported chart order `{order_by}`")
+                query = query.order_by(getattr(self.Chart, self.ORDER_COLUMNS[order_by]).desc())
+            query = query.order_by(self.Chart.position)
+            if limit is not None:
+                query = query.limit(limit)
+            return [
+                {
+                    "title": row.title,
+                    "diff": row.diff,
+                    "rating": row.rating,
+                    "ratingMix": row.rating_mix,
+                    "score": row.score,
+                    "status": row.status,
+                    "isCleared": row.is_cleared,
+                    "nextPointScore": row.next_point_score,
+                    "isFavorite": row.is_favorite,
+                    "id": row.song_id,
+                    "level": row.level
+                }
+                for row in query
+            ]
+        finally:
+            session.close()
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+player_chart_data = PlayerChartData(os.environ.get("ROTAENO_PLAYER_CHART_DATA_URL", os.path.join(current_dir, "player_chart_data.db")))
@@ -1,6 +1,7 @@
+from . import engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine, Column, String, Integer, JSON, Float, DateTime
+from sqlalchemy import Column, String, Integer, JSON, Float, DateTime, Boolean, Index
 from datetime import datetime
 from pydantic import BaseModel, Field
 
@@ -53,6 +54,9 @@ class PlayerData:
     
     class PlayerHistory(_base):
         __tablename__ = "player_history"
+        __table_args__ = (
+            Index("ix_player_history_object", "object_id", "timestamp"),
+        )
         
         id = Column(Integer, primary_key=True, autoincrement=True)
         timestamp = Column(DateTime, nullable=False, index=True, default=lambda: datetime.now())
@@ -77,26 +81,94 @@ class PlayerData:
 
         play_record = Column(JSON, nullable=True)
     
+    class PlayerHistoryDelta(_base):
+        __tablename__ = "player_history_delta"
+        __table_args__ = (
+            Index("ix_player_history_delta_object", "object_id", "id"),
+            Index("ix_player_history_delta_timestamp", "object_id", "timestamp")
+        )
+        
+        id = Column(Integer, primary_key=True, autoincrement=True)
+        timestamp = Column(DateTime, nullable=False, default=lambda: datetime.now())
+        
+        object_id = Column(String, nullable=False)
+        
+        sequence = Column(Integer, nullable=False)
+        is_full = Column(Boolean, nullable=False)
+        
+        changes = Column(JSON, nullable=False)
+    
+    KEYFRAME_INTERVAL = 32
+    
     def __init__(self, database_path: str) -> None:
-        self.engine = create_engine(f'sqlite:///{database_path}')
-        self._base.metadata.create_all(self.engine)
+        self.engine = engine.database_engine(database_path)
+        engine.create_all(self.engine, self._base.metadata, partitioned=[self.PlayerHistory.__table__, self.PlayerHistoryDelta.__table__])
         self.session = sessionmaker(bind=self.engine)
     
-    def add_player(self, player: Player, timestamp: datetime = None) -> None:
+    @staticmethod
+    def _diff(previous: dict, current: dict) -> dict:
+        changes = {}
+        for key, value in current.items():
+            if key == "play_record":
+                previous_record = previous.get(key) or {}
+                value = value or {}
+                updated = {k: v for k, v in value.items() if k not in previous_record or previous_record[k] != v}
+                removed = [k for k in previous_record if k not in value]
+                if updated or removed: changes[key] = {"set": updated, "unset": removed}
+            elif previous.get(key) != value:
+                changes[key] = value
+        return changes
+    
+    @staticmethod
+    def _apply(snapshot: dict, changes: dict) -> dict:
+        snapshot = dict(snapshot)
+        for key, value in changes.items():
+            if key == "play_record":
+                play_record = dict(snapshot.get(key) or {})
+                play_record.update(value["set"])
+                for k in value["unset"]: play_record.pop(k, None)
+                snapshot[key] = play_record
+            else:
+                snapshot[key] = value
+        return snapshot
+    
+    def _add_player(self, session, player: Player, timestamp: datetime) -> bool:
+        current = player.model_dump()
+        player_latest = session.get(self.PlayerLatest, player.object_id)
+        previous = None if player_latest is None else {c.key: getattr(player_latest, c.key) for c in player_latest.__table__.columns}
+        if previous == current: return False
+        
+        session.merge(self.PlayerLatest(**current))
+        
+        last = (
+            session.query(self.PlayerHistoryDelta.sequence)
+            .filter_by(object_id=player.object_id)
+            .order_by(self.PlayerHistoryDelta.id.desc())
+            .first()
+        )
+        sequence = 0 if last is None else last.sequence + 1
+        is_full = previous is None or sequence % self.KEYFRAME_INTERVAL == 0
+        session.add(self.PlayerHistoryDelta(
+            timestamp=timestamp,
+            object_id=player.object_id,
+            sequence=sequence,
+            is_full=is_full,
+            changes=current if is_full else self._diff(previous, current)
+        ))
+        session.flush()
+        return True
+    
+    def add_player(self, player: Player, timestamp: datetime = None) -> bool:
+        return self.add_players([player], timestamp=timestamp) == 1
+    
+    def add_players(self, players: list[Player], timestamp: datetime = None) -> int:
+        if timestamp is None:
+            timestamp = datetime.now()
         session = self.session()
         try:
-            player_latest = self.PlayerLatest(**player.model_dump())
-            session.merge(player_latest)
-            
-            if timestamp is None:
-                timestamp = datetime.now()
-            player_history = self.PlayerHistory(
-                timestamp=timestamp,
-                **player.model_dump()
-            )
-            session.add(player_history)
-            
+            added = sum(self._add_player(session, player, timestamp) for player in players)
             session.commit()
+            return added
         except Exception as e:
             session.rollback()
             print(f"Player data commit or ??? has a mistake: {e}")
@@ -115,6 +187,35 @@ class PlayerData:
         finally:
             session.close()
     
+    def _get_delta_history(self, session, object_id: str, since: datetime = None, limit: int = 100, order_desc: bool = True) -> list[dict]:
+        query = session.query(self.PlayerHistoryDelta.id).filter_by(object_id=object_id)
+        if since:
+            query = query.filter(self.PlayerHistoryDelta.timestamp >= since)
+        query = query.order_by(self.PlayerHistoryDelta.id.desc() if order_desc else self.PlayerHistoryDelta.id.asc())
+        ids = [row.id for row in query.limit(limit)]
+        if not ids: return []
+        
+        keyframe = (
+            session.query(self.PlayerHistoryDelta.id)
+            .filter_by(object_id=object_id, is_full=True)
+            .filter(self.PlayerHistoryDelta.id <= min(ids))
+            .order_by(self.PlayerHistoryDelta.id.desc())
+            .first()
+        )
+        rows = (
+            session.query(self.PlayerHistoryDelta)
+            .filter_by(object_id=object_id)
+            .filter(self.PlayerHistoryDelta.id >= (keyframe.id if keyframe else 0), self.PlayerHistoryDelta.id <= max(ids))
+            .order_by(self.PlayerHistoryDelta.id.asc())
+        )
+        wanted = set(ids)
+        snapshot, snapshots = {}, {}
+        for row in rows:
+            snapshot = dict(row.changes) if row.is_full else self._apply(snapshot, row.changes)
+            if row.id in wanted:
+                snapshots[row.id] = dict(id=row.id, timestamp=row.timestamp, **snapshot)
+        return [snapshots[id] for id in ids]
+    
     def get_player_history(self, object_id: str, since: datetime = None, limit: int = 100, order_desc: bool = True) -> list[dict]:
         session = self.session()
         try:
@@ -126,14 +227,17 @@ class PlayerData:
             else:
                 query = query.order_by(self.PlayerHistory.timestamp.asc())
             rows = query.limit(limit).all()
-            return [
+            history = [
                 {c.key: getattr(row, c.key) for c in row.__table__.columns}
                 for row in rows
             ]
+            history += self._get_delta_history(session, object_id, since=since, limit=limit, order_desc=order_desc)
+            history.sort(key=lambda row: row["timestamp"], reverse=order_desc)
+            return history[:limit]
         finally:
             session.close()
 
 import os
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
-player_data = PlayerData(os.path.join(current_dir, "player_data.db"))
+player_data = PlayerData(os.environ.get("ROTAENO_PLAYER_DATA_URL", os.path.join(current_dir, "player_data.db")))
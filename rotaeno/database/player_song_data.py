@@ -1,8 +1,14 @@
+from . import engine
+
 import os
+import glob
 from datetime import datetime
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine, Column, String, Integer, Float, DateTime
+from sqlalchemy import create_engine, inspect, insert, update, delete, select, func, text, Column, String, Integer, Float, DateTime, Index
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.pool import NullPool
 
 class PlayerSongScore:
     def __init__(self, object_id: str, difficulty: str, score: int, rating: float = 0.0):
@@ -33,8 +39,8 @@ class PlayerSongData:
         score = Column(Integer, nullable=False)
         rating = Column(Float, nullable=True)
 
-    def __init__(self, db_path: str):
-        self.engine = create_engine(f"sqlite:///{db_path}")
+    def __init__(self, db_path: str, sql_engine=None):
+        self.engine = sql_engine or engine.sqlite_engine(db_path)
         self._base.metadata.create_all(self.engine)
         self.session = sessionmaker(bind=self.engine)
 
@@ -73,7 +79,7 @@ class PlayerSongData:
             row = session.query(self.Latest).filter_by(
                 object_id=object_id,
                 difficulty=difficulty
-            ).first()
+            ).order_by(self.Latest.id.desc()).first()
             return None if row is None else dict(
                 object_id=row.object_id,
                 difficulty=row.difficulty,
@@ -106,15 +112,229 @@ class PlayerSongData:
         finally:
             session.close()
 
+class PlayerSongStore:
+    _base = declarative_base()
+
+    class Latest(_base):
+        __tablename__ = "player_song_latest"
+        __table_args__ = (
+            Index("ux_player_song_latest_key", "song_id", "object_id", "difficulty", unique=True),
+            Index("ix_player_song_latest_object", "object_id", "song_id")
+        )
+
+        id = Column(Integer, primary_key=True, autoincrement=True)
+        song_id = Column(String, nullable=False)
+        object_id = Column(String, nullable=False)
+        difficulty = Column(String, nullable=False)
+        score = Column(Integer, nullable=False)
+        rating = Column(Float, nullable=True)
+
+    class History(_base):
+        __tablename__ = "player_song_history"
+        __table_args__ = (
+            Index("ix_player_song_history_key", "song_id", "object_id", "difficulty", "timestamp"),
+            Index("ix_player_song_history_object", "object_id", "timestamp")
+        )
+
+        id = Column(Integer, primary_key=True, autoincrement=True)
+        timestamp = Column(DateTime, nullable=False, default=lambda: datetime.now())
+        song_id = Column(String, nullable=False)
+        object_id = Column(String, nullable=False)
+        difficulty = Column(String, nullable=False)
+        score = Column(Integer, nullable=False)
+        rating = Column(Float, nullable=True)
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.engine = engine.database_engine(db_path)
+        engine.create_all(self.engine, self._base.metadata, partitioned=[self.History.__table__])
+        self.session = sessionmaker(bind=self.engine)
+        self._unique_latest = "ux_player_song_latest_key" in {index["name"] for index in inspect(self.engine).get_indexes("player_song_latest")}
+
+    def _upsert_latest(self, session, rows: list[dict]):
+        if self._unique_latest and self.engine.dialect.name in ("sqlite", "postgresql"):
+            statement = (sqlite_insert if self.engine.dialect.name == "sqlite" else postgresql_insert)(self.Latest)
+            session.execute(statement.on_conflict_do_update(
+                index_elements=["song_id", "object_id", "difficulty"],
+                set_=dict(score=statement.excluded.score, rating=statement.excluded.rating)
+            ), rows)
+            return
+        for row in rows:
+            updated = session.execute(
+                update(self.Latest)
+                .where(self.Latest.song_id == row["song_id"], self.Latest.object_id == row["object_id"], self.Latest.difficulty == row["difficulty"])
+                .values(score=row["score"], rating=row["rating"])
+            ).rowcount
+            if not updated: session.execute(insert(self.Latest), [row])
+
+    def compact(self, vacuum: bool = True) -> dict:
+        session = self.session()
+        try:
+            keep = select(func.max(self.Latest.id)).group_by(self.Latest.song_id, self.Latest.object_id, self.Latest.difficulty)
+            removed = session.execute(delete(self.Latest).where(self.Latest.id.not_in(keep))).rowcount
+            session.execute(text("DROP INDEX IF EXISTS ix_player_song_latest_key"))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+        for index in self.Latest.__table__.indexes:
+            index.create(self.engine, checkfirst=True)
+        self._unique_latest = True
+        if vacuum and self.engine.dialect.name in ("sqlite", "postgresql"):
+            with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                connection.exec_driver_sql("VACUUM")
+        return {"removed": removed}
+
+    def add_score(self, song_id: str, score: PlayerSongScore, timestamp: datetime = None):
+        self.add_scores([(song_id, score)], timestamp=timestamp)
+
+    def add_scores(self, song_scores: list[tuple[str, PlayerSongScore]], timestamp: datetime = None) -> dict:
+        if timestamp is None:
+            timestamp = datetime.now()
+        session = self.session()
+        try:
+            object_ids = list({score.object_id for _, score in song_scores})
+            latest = {}
+            for index in range(0, len(object_ids), 500):
+                rows = (
+                    session.query(self.Latest.song_id, self.Latest.object_id, self.Latest.difficulty, self.Latest.score, self.Latest.rating)
+                    .filter(self.Latest.object_id.in_(object_ids[index:index + 500]))
+                )
+                for song_id, object_id, difficulty, score, rating in rows:
+                    latest[(song_id, object_id, difficulty)] = (score, rating)
+
+            upserts, history = {}, []
+            for song_id, score in song_scores:
+                key = (song_id, score.object_id, score.difficulty)
+                row = dict(song_id=song_id, object_id=score.object_id, difficulty=score.difficulty, score=score.score, rating=score.rating)
+                previous = latest.get(key)
+                if previous == (score.score, score.rating): continue
+                upserts[key] = row
+                latest[key] = (score.score, score.rating)
+                if previous is None or previous[0] != score.score: history.append(dict(timestamp=timestamp, **row))
+
+            if upserts: self._upsert_latest(session, list(upserts.values()))
+            if history: session.execute(insert(self.History), history)
+            session.commit()
+            return {"latest": len(upserts), "history": len(history), "skipped": len(song_scores) - len(history)}
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+
+    def get_latest(self, song_id: str, object_id: str, difficulty: str) -> dict | None:
+        session = self.session()
+        try:
+            row = session.query(self.Latest).filter_by(
+                song_id=song_id,
+                object_id=object_id,
+                difficulty=difficulty
+            ).order_by(self.Latest.id.desc()).first()
+            return None if row is None else dict(
+                object_id=row.object_id,
+                difficulty=row.difficulty,
+                score=row.score,
+                rating=row.rating
+            )
+        finally:
+            session.close()
+
+    def get_history(self, song_id: str, object_id: str, difficulty: str, limit: int = 50) -> list[dict]:
+        session = self.session()
+        try:
+            rows = (
+                session.query(self.History)
+                .filter_by(song_id=song_id, object_id=object_id, difficulty=difficulty)
+                .order_by(self.History.timestamp.desc())
+                .limit(limit)
+                .all()
+            )
+            return [
+                dict(
+                    timestamp=row.timestamp,
+                    object_id=row.object_id,
+                    difficulty=row.difficulty,
+                    score=row.score,
+                    rating=row.rating
+                )
+                for row in rows
+            ]
+        finally:
+            session.close()
+
+    def import_song_file(self, song_id: str, db_path: str) -> dict:
+        legacy = PlayerSongData(db_path, sql_engine=create_engine(f"sqlite:///{os.path.abspath(db_path)}", poolclass=NullPool))
+        legacy_session = legacy.session()
+        session = self.session()
+        try:
+            latest = [
+                dict(song_id=song_id, object_id=row.object_id, difficulty=row.difficulty, score=row.score, rating=row.rating)
+                for row in legacy_session.query(PlayerSongData.Latest).order_by(PlayerSongData.Latest.id)
+            ]
+            history = [
+                dict(timestamp=row.timestamp, song_id=song_id, object_id=row.object_id, difficulty=row.difficulty, score=row.score, rating=row.rating)
+                for row in legacy_session.query(PlayerSongData.History).order_by(PlayerSongData.History.id)
+            ]
+            if latest: self._upsert_latest(session, list({(row["object_id"], row["difficulty"]): row for row in latest}.values()))
+            if history: session.execute(insert(self.History), history)
+            session.commit()
+            return {"latest": len({(row["object_id"], row["difficulty"]) for row in latest}), "history": len(history)}
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+            legacy_session.close()
+            legacy.engine.dispose()
+
+class PlayerSongStoreView:
+    def __init__(self, store: PlayerSongStore, song_id: str):
+        self.store = store
+        self.song_id = song_id
+
+    def add_score(self, score: PlayerSongScore, timestamp: datetime = None):
+        self.store.add_score(self.song_id, score, timestamp=timestamp)
+
+    def get_latest(self, object_id: str, difficulty: str) -> dict | None:
+        return self.store.get_latest(self.song_id, object_id, difficulty)
+
+    def get_history(self, object_id: str, difficulty: str, limit: int = 50) -> list[dict]:
+        return self.store.get_history(self.song_id, object_id, difficulty, limit=limit)
+
 class PlayerSongDataManager:
-    def __init__(self, base_dir: str):
+    def __init__(self, base_dir: str, db_path: str = None):
         self.base_dir = base_dir
+        self.store = PlayerSongStore(db_path or f"{base_dir}.db")
 
-    def get_song_data(self, song_id: str) -> PlayerSongData:
-        db_file = os.path.join(self.base_dir, f"{song_id}.db")
-        return PlayerSongData(db_file)
+    def get_song_data(self, song_id: str) -> PlayerSongStoreView:
+        return PlayerSongStoreView(self.store, song_id)
 
-import os
+    def add_scores(self, song_scores: list[tuple[str, PlayerSongScore]], timestamp: datetime = None) -> dict:
+        return self.store.add_scores(song_scores, timestamp=timestamp)
+
+    def compact(self, vacuum: bool = True) -> dict:
+        return self.store.compact(vacuum=vacuum)
+
+    def migrate(self, remove: bool = False) -> dict:
+        results = {}
+        for db_file in sorted(glob.glob(os.path.join(glob.escape(self.base_dir), "*.db"))):
+            song_id = os.path.basename(db_file)[:-len(".db")]
+            try:
+                results[song_id] = self.store.import_song_file(song_id, db_file)
+            except Exception as e:
+                print(f"Error migrating player song data `{db_file}`: {e}")
+                continue
+            if remove: os.remove(db_file)
+            else: os.replace(db_file, f"{db_file}.migrated")
+        return results
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
-player_song_score_manager = PlayerSongDataManager(os.path.join(current_dir, "player_song_data"))
+player_song_score_manager = PlayerSongDataManager(os.path.join(current_dir, "player_song_data"), db_path=os.environ.get("ROTAENO_PLAYER_SONG_DATA_URL"))
+
+if __name__ == "__main__":
+    for song_id, counts in player_song_score_manager.migrate().items():
+        print(f"{song_id}: {counts['latest']} latest, {counts['history']} history")
+    print(f"compacted: {player_song_score_manager.compact()['removed']} duplicate latest rows removed")
@@ -1,7 +1,12 @@
-from sqlalchemy import create_engine, Column, String, Integer, JSON
+from . import engine
+from sqlalchemy import Column, String, Integer, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from typing import Dict, List, Union, Any
+import os
+import time
+import bisect
+import threading
 
 class SongData:
     _Base = declarative_base()
@@ -21,10 +26,66 @@ class SongData:
         id = Column(String, primary_key=True)
         levels_data = Column(JSON, nullable=False)
     
-    def __init__(self, database_path: str):
-        self.engine = create_engine(f'sqlite:///{database_path}')
-        self._Base.metadata.create_all(self.engine)
+    LEVEL_NAMES = ["I", "II", "III", "IV", "IV_Alpha"]
+    
+    def __init__(self, database_path: str, check_interval: float = 1.0, read_only: bool = False):
+        self.database_path = database_path
+        self.read_only = read_only and os.path.exists(database_path)
+        if self.read_only:
+            self.engine = engine.read_only_engine(database_path)
+        else:
+            self.engine = engine.sqlite_engine(database_path, wal=False)
+            self._Base.metadata.create_all(self.engine)
         self.Session = sessionmaker(bind=self.engine)
+        self.check_interval = check_interval
+        self._index = None
+        self._rating_index = ([], [])
+        self._index_signature = None
+        self._index_checked_at = 0.0
+        self._index_lock = threading.Lock()
+    
+    def _get_signature(self) -> tuple:
+        signature = []
+        for path in [self.database_path, f"{self.database_path}-wal"]:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+    
+    def _get_index(self) -> Dict[str, Dict[str, Any]]:
+        now = time.monotonic()
+        if self._index is not None and now - self._index_checked_at < self.check_interval:
+            return self._index
+        signature = self._get_signature()
+        with self._index_lock:
+            self._index_checked_at = now
+            if self._index is not None and self._index_signature == signature:
+                return self._index
+            session = self.Session()
+            try:
+                levels = dict(session.query(self.SongLevel.id, self.SongLevel.levels_data).all())
+                index = {}
+                for id, title, artist in session.query(self.Song.id, self.Song.title, self.Song.artist).all():
+                    index[id] = {"id": id, "title": title, "artist": artist}
+                    if id in levels: index[id]["levels"] = levels[id]
+            finally:
+                session.close()
+            ratings = []
+            for position, (id, levels_data) in enumerate(levels.items()):
+                for level_order, level_name in enumerate(self.LEVEL_NAMES):
+                    level_num = (levels_data or {}).get(level_name, {}).get("num", 0)
+                    if level_num != 0: ratings.append((level_num, position, level_order, id, level_name))
+            ratings.sort()
+            self._rating_index = ([rating[0] for rating in ratings], ratings)
+            self._index = index
+            self._index_signature = signature
+            return index
+    
+    def refresh(self) -> None:
+        with self._index_lock:
+            self._index = None
         
     def getAllsong_ids(self) -> List[str]:
         session = self.Session()
@@ -35,6 +96,7 @@ class SongData:
     
     def add_song(self, id: str, title: str, artist: str, duration: int, release: str,
                 levels: Dict[str, Dict[str, Any]], forceUpdate: bool = False) -> None:
+        if self.read_only: raise PermissionError(f"Song catalogue `{self.database_path}` was opened read-only")
         session = self.Session()
         try:
             if forceUpdate:
@@ -62,55 +124,23 @@ class SongData:
             print(f"Error updating song '{id}': {e}")
         finally:
             session.close()
+            self.refresh()
     
     def get_song(self, id: str) -> Dict[str, Any]:
-        session = self.Session()
-        try:
-            song = session.query(self.Song).filter(self.Song.id == id).first()
-            if not song:
-                return {}
-            
-            levels = session.query(self.SongLevel).filter(self.SongLevel.id == id).first()
-            if not levels:
-                return {"id": id, "title": song.title, "artist": song.artist}
-            
-            return {
-                "id": id,
-                "title": song.title,
-                "artist": song.artist,
-                "levels": levels.levels_data
-            }
-        finally:
-            session.close()
+        song = self._get_index().get(id)
+        return dict(song) if song is not None else {}
     
     def get_songs_rating_real_range(self, song_rating_real_min: float, song_rating_real_max: float) -> List[Dict[str, Union[str, List[str]]]]:
-        session = self.Session()
-        try:
-            results = []
-            all_levels = session.query(self.SongLevel).all()
-            
-            for level_data in all_levels:
-                song_levels = []
-                levels_json = level_data.levels_data
-                
-                for level_name in ["I", "II", "III", "IV", "IV_Alpha"]:
-                    level_info = levels_json.get(level_name, {})
-                    level_num = level_info.get("num", 0)
-                    
-                    if level_num != 0 and song_rating_real_min <= level_num <= song_rating_real_max:
-                        song_levels.append(level_name)
-                
-                if song_levels != []:
-                    results.append({
-                        "id": level_data.id,
-                        "levels": song_levels
-                    })
-            
-            return results
-        finally:
-            session.close()
-
-import os
+        self._get_index()
+        level_nums, ratings = self._rating_index
+        start = bisect.bisect_left(level_nums, song_rating_real_min)
+        end = bisect.bisect_right(level_nums, song_rating_real_max)
+        
+        results = {}
+        for _, position, level_order, id, level_name in sorted(ratings[start:end], key=lambda rating: (rating[1], rating[2])):
+            if id not in results: results[id] = {"id": id, "levels": []}
+            results[id]["levels"].append(level_name)
+        return list(results.values())
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 song_data = SongData(os.path.join(current_dir, "song_data.db"))
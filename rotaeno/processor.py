@@ -1,9 +1,14 @@
 from . import api
 from . import utils
+from . import raster
 from . import database
 
 import os
+import copy
 import time
+import hashlib
+import functools
+import asyncio
 import json
 import string
 
@@ -26,6 +31,19 @@ for locale_file in os.listdir(LOCALES_DIR):
 def t(locale="zh-CN"):
     return LOCALES.get(str(locale), LOCALES.get("zh-CN", {}))
 
+DATA_PLACEHOLDER = "\x00data\x00"
+
+def get_template(template_path: str, locale: str = "zh-CN") -> list[str]:
+    locale = str(locale) if str(locale) in LOCALES else "zh-CN"
+    return utils.template_cache.get(template_path, key=locale, compile=lambda template: SafeTemplate(template).safe_substitute({
+        "data": DATA_PLACEHOLDER,
+        **t(locale)
+    }).split(DATA_PLACEHOLDER))
+
+def get_shell(template_path: str, locale: str = "zh-CN") -> str:
+    locale = str(locale) if str(locale) in LOCALES else "zh-CN"
+    return utils.template_cache.get(template_path, key=(locale, "shell"), compile=lambda template: "null".join(get_template(template_path, locale)))
+
 def get_api_processor(user_profile: dict) -> api.processor.Processor:
     if user_profile["serverCode"] == "cn": region = api.model.ServerRegion.CN
     elif user_profile["serverCode"] == "global": region = api.model.ServerRegion.GLOBAL
@@ -33,97 +51,138 @@ def get_api_processor(user_profile: dict) -> api.processor.Processor:
     elif user_profile["serverCode"] == "friend_global": region = api.model.ServerRegion.FRIEND_GLOBAL
     return api.processor.Processor(region=region, user_profile=user_profile)
 
-def get_best40(user_profile: dict, just_data: bool = False, just_html: bool = False) -> str | dict:
-    user_data = get_api_processor(user_profile).get_cloud_save(save_path=os.path.join(CLOUD_SAVES_DIR, f"{user_profile.get('objectID', 'EMPTY')}-{time.time()}.msgpack"), add_to_database=True)
-    user_data["songDatas"] = sorted(user_data["songDatas"], key=lambda x: x["ratingMix"], reverse=True)[:40]
-    
-    if just_data: return user_data["songDatas"]
-    
-    with open(f"{ASSETS_DIR}/html/b40.html", "r", encoding="utf-8") as f:
-        html = SafeTemplate(f.read()).safe_substitute({
-            "data": json.dumps(user_data, indent=4, ensure_ascii=False),
-            **t(user_profile.get("locale", "zh-CN"))
-        })
-    
-    if just_html: return html
-    
-    return utils.render_html_to_jpg(window_size=(1600, 1350), html=html)
+def _get_user_data(user_profile: dict, processor: api.processor.Processor = None) -> dict:
+    if processor is None: processor = get_api_processor(user_profile)
+    return processor.get_cloud_save(save_path=os.path.join(CLOUD_SAVES_DIR, f"{api.processor.get_object_id(user_profile) or 'EMPTY'}-{time.time()}.msgpack"), add_to_database=True)
+
+def _get_player_key(user_profile: dict) -> str:
+    object_id = api.processor.get_object_id(user_profile)
+    if object_id: return object_id
+    return f"session_{hashlib.sha1(user_profile.get('sessionToken', '').encode('utf-8')).hexdigest()}"
+
+def _get_player_charts(user_profile: dict) -> tuple[str, dict]:
+    object_id = _get_player_key(user_profile)
+    
+    def fetch() -> tuple[str | None, dict]:
+        processor = get_api_processor(user_profile)
+        user_data = _get_user_data(user_profile, processor)
+        database.player_chart_data.player_chart_data.refresh(object_id, user_data)
+        return getattr(processor, "cloud_save_updated_at", None), user_data["playerInfo"]
+    
+    check = None
+    if not user_profile["serverCode"].startswith("friend_"):
+        check = lambda: get_api_processor(user_profile).get_cloud_save_updated_at()
+    player_info = api.cache.cloud_save_cache.get(object_id, fetch, check=check)
+    return object_id, {"playerInfo": copy.deepcopy(player_info)}
 
-def get_song(user_profile: dict, song_id: str, just_data: bool = False, just_html: bool = False) -> str | dict:
-    user_data = get_api_processor(user_profile).get_cloud_save(save_path=os.path.join(CLOUD_SAVES_DIR, f"{user_profile.get('objectID', 'EMPTY')}-{time.time()}.msgpack"), add_to_database=True)
+def _get_best40_data(user_profile: dict) -> dict:
+    object_id, user_data = _get_player_charts(user_profile)
+    user_data["songDatas"] = database.player_chart_data.player_chart_data.get_charts(object_id, order_by="ratingMix", limit=40)
+    return user_data
+
+def _get_song_data(user_profile: dict, song_id: str) -> dict:
+    object_id, user_data = _get_player_charts(user_profile)
     song_artist = database.song_data.song_data.get_song(id=song_id).get("artist", "Unknown Artist")
     song_data = {}
-    for song_level_data in user_data["songDatas"]:
-        if song_level_data["id"] == song_id:
-            song_level_data.update({"artist": song_artist})
-            song_data[song_level_data["level"]] = song_level_data
+    for song_level_data in database.player_chart_data.player_chart_data.get_charts(object_id, song_id=song_id):
+        song_level_data.update({"artist": song_artist})
+        song_data[song_level_data["level"]] = song_level_data
     user_data["songData"] = song_data
-    del user_data["songDatas"]
-    
-    if just_data: return user_data["songData"]
-    
-    with open(f"{ASSETS_DIR}/html/song.html", "r", encoding="utf-8") as f:
-        html = SafeTemplate(f.read()).safe_substitute({
-            "data": json.dumps(user_data, indent=4, ensure_ascii=False),
-            **t(user_profile.get("locale", "zh-CN"))
-        })
-    
-    if just_html: return html
-    
-    return utils.render_html_to_jpg(window_size=(1360, 900), html=html)
+    return user_data
 
-def get_song_status(user_profile: dict, song_status: str, just_data: bool = False, just_html: bool = False) -> str | dict:
-    user_data = get_api_processor(user_profile).get_cloud_save(save_path=os.path.join(CLOUD_SAVES_DIR, f"{user_profile.get('objectID', 'EMPTY')}-{time.time()}.msgpack"), add_to_database=True)
-    
-    song_datas = []
-    for song_data in user_data["songDatas"]:
-        if song_status == "CLEAR" and song_data["isCleared"]: song_datas.append(song_data)
-        elif song_status == "NOTCLEAR" and not song_data["isCleared"]: song_datas.append(song_data)
-        elif song_status == "FAVORITE" and song_data["isFavorite"]: song_datas.append(song_data)
-        elif song_status == "NOTFAVORITE" and not song_data["isFavorite"]: song_datas.append(song_data)
-        elif song_status == song_data["status"]: song_datas.append(song_data)
-    user_data["songDatas"] = song_datas
+def _get_song_status_data(user_profile: dict, song_status: str) -> dict:
+    object_id, user_data = _get_player_charts(user_profile)
+    user_data["songDatas"] = database.player_chart_data.player_chart_data.get_charts(object_id, status=song_status)
     user_data["songStatus"] = song_status
-    
-    if just_data: return user_data["songDatas"]
-    
-    with open(f"{ASSETS_DIR}/html/song_status.html", "r", encoding="utf-8") as f:
-        html = SafeTemplate(f.read()).safe_substitute({
-            "data": json.dumps(user_data, indent=4, ensure_ascii=False),
-            **t(user_profile.get("locale", "zh-CN"))
-        })
-    
-    if just_html: return html
-    
-    return utils.render_html_to_jpg(window_size=(1600, 1310), html=html)
+    return user_data
 
-def get_song_rtr(user_profile: dict, song_level_num_range: tuple = (12.5, 1145), song_sort_type: str = "rating", just_data: bool = False, just_html: bool = False) -> str | dict:
-    user_data = get_api_processor(user_profile).get_cloud_save(save_path=os.path.join(CLOUD_SAVES_DIR, f"{user_profile.get('objectID', 'EMPTY')}-{time.time()}.msgpack"), add_to_database=True)
-    
-    song_datas = []
-    for song_data in user_data["songDatas"]:
-        if song_level_num_range[0] <= song_data["diff"] <= song_level_num_range[1]:
-            song_datas.append(song_data)
-    
-    if song_sort_type == "rating":
-        song_datas = sorted(song_datas, key=lambda x: x["ratingMix"], reverse=True)
-    elif song_sort_type == "score":
-        song_datas = sorted(song_datas, key=lambda x: x["score"], reverse=True)
-    elif song_sort_type == "level":
-        song_datas = sorted(song_datas, key=lambda x: x["diff"], reverse=True)
-    
-    user_data["songDatas"] = song_datas
+def _get_song_rtr_data(user_profile: dict, song_level_num_range: tuple, song_sort_type: str) -> dict:
+    object_id, user_data = _get_player_charts(user_profile)
+    order_by = song_sort_type if song_sort_type in ["rating", "score", "level"] else None
+    user_data["songDatas"] = database.player_chart_data.player_chart_data.get_charts(object_id, diff_range=song_level_num_range, order_by=order_by)
     user_data["songLevelNumRange"] = song_level_num_range
     user_data["songSortType"] = song_sort_type.capitalize()
+    return user_data
+
+def _build_html(template_path: str, user_data: dict, locale: str = "zh-CN") -> str:
+    return json.dumps(user_data, indent=4, ensure_ascii=False).join(get_template(template_path, locale))
+
+def _render_job(template_name: str, user_data: dict, window_size: tuple, locale: str = "zh-CN", client_side: bool = False) -> dict:
+    template_path = os.path.join(ASSETS_DIR, "html", template_name)
+    if client_side: html, data = get_shell(template_path, locale), user_data
+    else: html, data = _build_html(template_path, user_data, locale), None
+    cache_key = utils.render_cache.make_key(template_path, user_data, locale=t(locale), window_size=window_size)
+    return {"window_size": window_size, "html": html, "data": data, "cache_key": cache_key}
+
+def _render(template_name: str, user_data: dict, user_profile: dict, window_size: tuple, just_html: bool = False, in_memory: bool = False, client_side: bool = False) -> str | bytes:
+    locale = user_profile.get("locale", "zh-CN")
+    if just_html: return _build_html(os.path.join(ASSETS_DIR, "html", template_name), user_data, locale)
     
-    if just_data: return user_data["songDatas"]
-    
-    with open(f"{ASSETS_DIR}/html/song_rtr.html", "r", encoding="utf-8") as f:
-        html = SafeTemplate(f.read()).safe_substitute({
-            "data": json.dumps(user_data, indent=4, ensure_ascii=False),
-            **t(user_profile.get("locale", "zh-CN"))
-        })
-    
-    if just_html: return html
+    job = _render_job(template_name, user_data, window_size, locale, client_side)
+    if in_memory: return utils.render_html_to_bytes(**job)
+    return utils.render_html_to_jpg(**job)
+
+async def _async_render(template_name: str, user_data: dict, user_profile: dict, window_size: tuple, just_html: bool = False, in_memory: bool = False, client_side: bool = False) -> str | bytes:
+    locale = user_profile.get("locale", "zh-CN")
+    if just_html: return _build_html(os.path.join(ASSETS_DIR, "html", template_name), user_data, locale)
     
-    return utils.render_html_to_jpg(window_size=(1600, 1310), html=html)
+    job = _render_job(template_name, user_data, window_size, locale, client_side)
+    if in_memory: return await utils.async_render_html_to_bytes(**job)
+    return await utils.async_render_html_to_jpg(**job)
+
+def _render_raster(draw, user_data: dict, user_profile: dict, in_memory: bool = False) -> str | bytes:
+    locale = t(user_profile.get("locale", "zh-CN"))
+    cache_key = utils.render_cache.make_key(raster.__file__, {"draw": draw.__name__, "data": user_data}, locale=locale)
+    if in_memory: return utils.render_image_to_bytes(functools.partial(draw, user_data, locale), cache_key=cache_key)
+    return utils.render_image_to_jpg(functools.partial(draw, user_data, locale), cache_key=cache_key)
+
+def render_many(jobs: list[tuple], locale: str = "zh-CN", in_memory: bool = False, client_side: bool = True, return_exceptions: bool = False):
+    yield from utils.render_many([_render_job(template_name, user_data, window_size, locale, client_side) for template_name, user_data, window_size in jobs], in_memory=in_memory, return_exceptions=return_exceptions)
+
+async def async_render_many(jobs: list[tuple], locale: str = "zh-CN", in_memory: bool = False, client_side: bool = True, return_exceptions: bool = False):
+    async for item in utils.async_render_many([_render_job(template_name, user_data, window_size, locale, client_side) for template_name, user_data, window_size in jobs], in_memory=in_memory, return_exceptions=return_exceptions):
+        yield item
+
+def get_best40(user_profile: dict, just_data: bool = False, just_html: bool = False, in_memory: bool = False, client_side: bool = False, renderer: str = "html") -> str | dict | bytes:
+    if renderer not in ["html", "pillow"]: raise ValueError(f"Unsupported renderer `{renderer}`")
+    user_data = _get_best40_data(user_profile)
+    if just_data: return user_data["songDatas"]
+    if renderer == "pillow" and not just_html: return _render_raster(raster.draw_best40, user_data, user_profile, in_memory=in_memory)
+    return _render("b40.html", user_data, user_profile, (1600, 1350), just_html=just_html, in_memory=in_memory, client_side=client_side)
+
+def get_song(user_profile: dict, song_id: str, just_data: bool = False, just_html: bool = False, in_memory: bool = False, client_side: bool = False) -> str | dict | bytes:
+    user_data = _get_song_data(user_profile, song_id)
+    if just_data: return user_data["songData"]
+    return _render("song.html", user_data, user_profile, (1360, 900), just_html=just_html, in_memory=in_memory, client_side=client_side)
+
+def get_song_status(user_profile: dict, song_status: str, just_data: bool = False, just_html: bool = False, in_memory: bool = False, client_side: bool = False) -> str | dict | bytes:
+    user_data = _get_song_status_data(user_profile, song_status)
+    if just_data: return user_data["songDatas"]
+    return _render("song_status.html", user_data, user_profile, (1600, 1310), just_html=just_html, in_memory=in_memory, client_side=client_side)
+
+def get_song_rtr(user_profile: dict, song_level_num_range: tuple = (12.5, 1145), song_sort_type: str = "rating", just_data: bool = False, just_html: bool = False, in_memory: bool = False, client_side: bool = False) -> str | dict | bytes:
+    user_data = _get_song_rtr_data(user_profile, song_level_num_range, song_sort_type)
+    if just_data: return user_data["songDatas"]
+    return _render("song_rtr.html", user_data, user_profile, (1600, 1310), just_html=just_html, in_memory=in_memory, client_side=client_side)
+
+async def async_get_best40(user_profile: dict, just_data: bool = False, just_html: bool = False, in_memory: bool = False, client_side: bool = False, renderer: str = "html") -> str | dict | bytes:
+    if renderer not in ["html", "pillow"]: raise ValueError(f"Unsupported renderer `{renderer}`")
+    user_data = await asyncio.to_thread(_get_best40_data, user_profile)
+    if just_data: return user_data["songDatas"]
+    if renderer == "pillow" and not just_html: return await asyncio.to_thread(_render_raster, raster.draw_best40, user_data, user_profile, in_memory)
+    return await _async_render("b40.html", user_data, user_profile, (1600, 1350), just_html=just_html, in_memory=in_memory, client_side=client_side)
+
+async def async_get_song(user_profile: dict, song_id: str, just_data: bool = False, just_html: bool = False, in_memory: bool = False, client_side: bool = False) -> str | dict | bytes:
+    user_data = await asyncio.to_thread(_get_song_data, user_profile, song_id)
+    if just_data: return user_data["songData"]
+    return await _async_render("song.html", user_data, user_profile, (1360, 900), just_html=just_html, in_memory=in_memory, client_side=client_side)
+
+async def async_get_song_status(user_profile: dict, song_status: str, just_data: bool = False, just_html: bool = False, in_memory: bool = False, client_side: bool = False) -> str | dict | bytes:
+    user_data = await asyncio.to_thread(_get_song_status_data, user_profile, song_status)
+    if just_data: return user_data["songDatas"]
+    return await _async_render("song_status.html", user_data, user_profile, (1600, 1310), just_html=just_html, in_memory=in_memory, client_side=client_side)
+
+async def async_get_song_rtr(user_profile: dict, song_level_num_range: tuple = (12.5, 1145), song_sort_type: str = "rating", just_data: bool = False, just_html: bool = False, in_memory: bool = False, client_side: bool = False) -> str | dict | bytes:
+    user_data = await asyncio.to_thread(_get_song_rtr_data, user_profile, song_level_num_range, song_sort_type)
+    if just_data: return user_data["songDatas"]
+    return await _async_render("song_rtr.html", user_data, user_profile, (1600, 1310), just_html=just_html, in_memory=in_memory, client_side=client_side)
@@ -0,0 +1,154 @@
+from . import utils
+
+import os
+import functools
+from PIL import Image, ImageChops, ImageDraw
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(CURRENT_DIR, "assets", "img")
+LOGO_PATH = os.path.join(os.path.dirname(CURRENT_DIR), "data", "logo.png")
+
+WIDTH = 1600
+ACCENT = (0, 188, 212, 255)
+LEVEL_COLORS = {"I": "#00ff37", "II": "#0080ff", "III": "#ff8800", "IV": "#a454fa", "IV_ALPHA": "#c697f7"}
+SCORE_GRADIENTS = {
+    "score-rainbow": ["red", "orange", "orange", "yellow", "red"],
+    "score-blue": [(0, 72, 255), (81, 0, 255), (81, 0, 255), (0, 102, 255), (0, 128, 255)]
+}
+
+CARD_GAP = 12
+CARD_HEIGHT = 99
+SECTION_TITLE_HEIGHT = 26
+
+def get_rank(score: int) -> str:
+    for rank, threshold in [("EX+", 1008000), ("EX", 1000000), ("S+", 980000), ("S", 950000), ("A+", 900000), ("A", 850000), ("B", 800000), ("C", 700000), ("D", 600000), ("E", 500000)]:
+        if score >= threshold: return rank
+    return "F"
+
+def get_score_class(score: int) -> str:
+    score = int(score)
+    if score == 1010000: return "score-rainbow"
+    if 1008000 <= score <= 1009999: return "score-blue"
+    if 1000000 <= score <= 1007999: return "score-yellow"
+    return "score-white"
+
+def fit_text(draw: ImageDraw.ImageDraw, text: str, font, max_width: float) -> str:
+    if draw.textlength(text, font=font) <= max_width: return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if draw.textlength(text[:middle] + "…", font=font) <= max_width: low = middle
+        else: high = middle - 1
+    return text[:low] + "…"
+
+def _gradient_text(img: Image.Image, xy: tuple, text: str, font, colors: list) -> None:
+    left, top, right, bottom = font.getbbox(text)
+    size = (max(1, right), max(1, bottom))
+    mask = Image.new("L", size, 0)
+    ImageDraw.Draw(mask).text((0, 0), text, font=font, fill=255)
+    strip = Image.new("RGB", (len(colors), 1))
+    strip.putdata([Image.new("RGB", (1, 1), color).getpixel((0, 0)) for color in colors])
+    gradient = strip.resize(size, Image.BILINEAR).convert("RGBA")
+    gradient.putalpha(mask)
+    img.alpha_composite(gradient, (int(xy[0]), int(xy[1])))
+
+def _grid_height(count: int, columns: int) -> int:
+    rows = (count + columns - 1) // columns
+    return rows * CARD_HEIGHT + max(0, rows - 1) * CARD_GAP
+
+@functools.lru_cache(maxsize=8)
+def _card_background(width: int) -> Image.Image:
+    background = Image.new("RGBA", (width, CARD_HEIGHT), (34, 34, 34, 122))
+    background.putalpha(ImageChops.multiply(background.getchannel("A"), utils.rounded_mask((width, CARD_HEIGHT), 8)))
+    return background
+
+@functools.lru_cache(maxsize=8)
+def _overlay(height: int) -> Image.Image:
+    overlay = Image.new("RGBA", (WIDTH, height), (43, 45, 66, 128))
+    overlay.alpha_composite(Image.new("RGBA", (WIDTH, 168), (17, 17, 17, 60)))
+    return overlay
+
+def _draw_card(img: Image.Image, draw: ImageDraw.ImageDraw, box: tuple, song: dict, song_rank: int, locale: dict) -> None:
+    x, y, width = box
+    img.alpha_composite(_card_background(int(width)), (int(x), int(y)))
+
+    ring_y = y + (CARD_HEIGHT - 69) / 2
+    draw.ellipse((x + 10, ring_y, x + 79, ring_y + 69), outline=LEVEL_COLORS.get(str(song["level"]).upper(), "#dcdcdc"), width=3)
+    img.alpha_composite(utils.tile_cache.get(os.path.join(IMAGES_DIR, "thumb", f"{song['id']}.png"), (64, 64), radius=32), (int(x + 12.5), int(ring_y + 2.5)))
+    img.alpha_composite(utils.tile_cache.get(os.path.join(IMAGES_DIR, "rank", f"{get_rank(song['score'])}.png"), (64, 64), radius=32, fill=(0, 0, 0, 0)), (int(x + width - 74), int(y + (CARD_HEIGHT - 64) / 2)))
+
+    details_x = x + 89
+    details_width = width - 89 - 84
+    line_y = y + 10
+    title_font = utils.load_font(16, bold=True)
+    draw.text((details_x, line_y), fit_text(draw, song["title"], title_font, min(120, details_width)), font=title_font, fill="white")
+    line_y += 21
+    score_font = utils.load_font(18, bold=True)
+    score_class = get_score_class(song["score"])
+    if score_class in SCORE_GRADIENTS: _gradient_text(img, (details_x, line_y), str(song["score"]), score_font, SCORE_GRADIENTS[score_class])
+    else: draw.text((details_x, line_y), str(song["score"]), font=score_font, fill="#ffc800" if score_class == "score-yellow" else "white")
+    line_y += 24
+    meta_font = utils.load_font(13)
+    draw.text((details_x, line_y), f"{locale.get('diff_cfl', '')} {song['diff']:.1f} ➔ {song['ratingMix']:.4f}", font=meta_font, fill="#aaa")
+    line_y += 17
+    draw.text((details_x, line_y), f"#{song_rank} {song['status'].replace('APP', 'AP+')}", font=meta_font, fill="#aaa")
+
+def draw_best40(user_data: dict, locale: dict) -> Image.Image:
+    player_data = user_data["playerInfo"]
+    songs = sorted(user_data["songDatas"], key=lambda song: song["rating"], reverse=True)[:40]
+    sections = [(f"#1-#10 ({locale.get('weight_60', '')})", songs[0:10]), (f"#11-#20 ({locale.get('weight_20', '')})", songs[10:20]), (f"#21-#40 ({locale.get('weight_20', '')})", songs[20:40])]
+
+    content_width = WIDTH - 40
+    columns = max(1, (content_width + CARD_GAP) // (280 + CARD_GAP))
+    card_width = (content_width - (columns - 1) * CARD_GAP) / columns
+    height = 168 + 32 + 44 + 32
+    for index, (_, section_songs) in enumerate(sections):
+        height += (0 if index == 0 else 10) + SECTION_TITLE_HEIGHT + 10 + _grid_height(len(section_songs), columns)
+    height += 30 + 37
+
+    img = utils.tile_cache.get(os.path.join(IMAGES_DIR, "background", f"{player_data['background']}.png"), (WIDTH, height), blur=8, fill=(43, 45, 66, 255)).copy()
+    img.alpha_composite(_overlay(height))
+    draw = ImageDraw.Draw(img)
+
+    img.alpha_composite(utils.tile_cache.get(LOGO_PATH, (128, 128), radius=12.8), (20, 20))
+    draw.text((163, 40), locale.get("rotaeno_cfl", ""), font=utils.load_font(35), fill="white")
+    draw.text((163, 87), locale.get("best40_title", ""), font=utils.load_font(30), fill="white")
+
+    name_font = utils.load_font(24, bold=True)
+    rating_font = utils.load_font(16)
+    rating_text = f"{locale.get('rating_cfl', '')}: {float(player_data['rating']):.4f}"
+    rating_width = draw.textlength(rating_text, font=rating_font) + 30
+    info_width = max(draw.textlength(player_data["displayName"], font=name_font), rating_width)
+    info_x = WIDTH - 20 - info_width
+    img.alpha_composite(utils.tile_cache.get(os.path.join(IMAGES_DIR, "avatar", f"{player_data['avatar']}.png"), (128, 128), radius=64), (int(info_x - 143), 20))
+    draw.text((info_x, 45), player_data["displayName"], font=name_font, fill="white")
+    draw.rounded_rectangle((info_x, 82, info_x + rating_width, 123), radius=8, fill="#0e4c57")
+    draw.text((info_x + 15, 92), rating_text, font=rating_font, fill="white")
+
+    title_font = utils.load_font(24)
+    title_width = draw.textlength("Best 40", font=title_font) + 32
+    title_x = (WIDTH - title_width) / 2
+    draw.rectangle((32, 221, title_x - 12, 222), fill=ACCENT)
+    draw.rectangle((title_x + title_width + 12, 221, WIDTH - 33, 222), fill=ACCENT)
+    draw.text((title_x + 16, 206), "Best 40", font=title_font, fill=ACCENT)
+
+    y = 276
+    song_rank = 1
+    section_font = utils.load_font(19)
+    for index, (title, section_songs) in enumerate(sections):
+        if index: y += 10
+        draw.rectangle((20, y, 23, y + SECTION_TITLE_HEIGHT - 1), fill=ACCENT)
+        draw.text((34, y + 2), title, font=section_font, fill="white")
+        y += SECTION_TITLE_HEIGHT + 10
+        for song_index, song in enumerate(section_songs):
+            row, column = divmod(song_index, columns)
+            _draw_card(img, draw, (20 + column * (card_width + CARD_GAP), y + row * (CARD_HEIGHT + CARD_GAP), card_width), song, song_rank, locale)
+            song_rank += 1
+        y += _grid_height(len(section_songs), columns)
+
+    y += 30
+    img.alpha_composite(Image.new("RGBA", (WIDTH, 37), (17, 17, 17, 113)), (0, y))
+    footer_font = utils.load_font(13)
+    footer = locale.get("footer", "")
+    draw.text(((WIDTH - draw.textlength(footer, font=footer_font)) / 2, y + 10), footer, font=footer_font, fill="#888")
+    return img.convert("RGB")
@@ -0,0 +1,93 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import io
+import pytest
+import PIL.Image
+import PIL.ImageChops
+import PIL.ImageStat
+import phigros
+import common.render
+
+best30_result = {
+    "user_info": {"nickname": "Player", "intro": "", "avatar": "default", "background": "default", "summary": {"rks": 15.5, "challenge": 0, "gameVersion": 0}},
+    "song_data": [{"id": f"Song{i}.Artist", "title": f"Song {i}", "score": 1000000 - i * 5000, "accuracy": 100 - i / 10, "rating": 16 - i / 10, "diff": 15.0, "level": "IN", "status": "AP" if i < 2 else "NONE"} for i in range(30)]
+}
+
+def browser_available():
+    try:
+        with common.render.playwright.sync_api.sync_playwright() as driver:
+            driver.chromium.launch(headless=True).close()
+        return True
+    except Exception:
+        return False
+
+class TestRasterRenderer:
+    def test_rank_labels_and_grades(self):
+        assert phigros.raster.get_rank_labels(best30_result["song_data"][:4]) == ["#Φ1", "#Φ2", "#01", "#02"]
+        assert phigros.raster.get_grade(1000000, "AP") == "PHI"
+        assert phigros.raster.get_grade(930000, "NONE") == "S"
+    
+    def test_draw_best30_layout(self):
+        img = phigros.raster.draw_best30(best30_result)
+        assert img.size == (1100, 2576)
+    
+    @pytest.mark.skipif(not browser_available(), reason="Chromium is not installed")
+    def test_pillow_output_matches_html_output(self):
+        html = phigros.processor._build_html(phigros.config.HTML_ASSETS_DIR / "best30.html", best30_result)
+        pool = phigros.utils.RenderPool(browsers=1)
+        try:
+            html_image = PIL.Image.open(io.BytesIO(pool.render((1100, 1350), html=html, in_memory=True))).convert("L")
+        finally:
+            pool.close()
+        pillow_image = phigros.raster.draw_best30(best30_result).convert("L")
+        assert abs(html_image.height - pillow_image.height) <= html_image.height * 0.05
+        html_image = html_image.resize((html_image.width // 8, html_image.height // 8))
+        pillow_image = pillow_image.resize(html_image.size)
+        assert PIL.ImageStat.Stat(PIL.ImageChops.difference(html_image, pillow_image)).mean[0] < 24
+
+class TestRenderService:
+    def test_renders_into_the_package_temp_dir(self, tmp_path):
+        assert isinstance(phigros.utils.render_service, common.render.RenderService)
+        assert phigros.utils.render_pool is phigros.utils.render_service.pool
+        assert phigros.utils.render_pool.temp_dir == phigros.utils.async_renderer.temp_dir == phigros.config.TEMP_DIR
+        path = phigros.utils.render_image_to_jpg(lambda: PIL.Image.new("RGB", (8, 8)), cache=phigros.utils.RenderCache(tmp_path))
+        try:
+            assert os.path.dirname(path) == str(phigros.config.TEMP_DIR)
+        finally:
+            os.remove(path)
+
+class TestSongData:
+    def test_get_songs_matches_get_song(self, tmp_path):
+        song_data = phigros.database.song_data.SongData(str(tmp_path / "song_data.db"))
+        song_data.add_song("Glaciaxion.SunsetRay", "Glaciaxion", "SunsetRay", "a", "b", 1.0, 6.0, 12.5)
+        song_data.add_song("Rrhar'il.TeamGrimoire", "Rrhar'il", "Team Grimoire", "a", "b", 4.0, 10.0, 15.7, 16.4)
+        
+        songs = song_data.get_songs(["Glaciaxion.SunsetRay", "Rrhar'il.TeamGrimoire", "Missing.Song", "Glaciaxion.SunsetRay"])
+        assert list(songs) == ["Glaciaxion.SunsetRay", "Rrhar'il.TeamGrimoire", "Missing.Song"]
+        assert songs["Rrhar'il.TeamGrimoire"]["levels"]["AT"] == 16.4
+        assert "AT" not in songs["Glaciaxion.SunsetRay"]["levels"]
+        assert songs["Missing.Song"]["title"] == ""
+        for id, song in songs.items():
+            assert song_data.get_song(id) == song
+    
+    def test_shipped_catalogue_is_not_switched_to_wal(self):
+        song_data = phigros.database.song_data.song_data
+        with open(song_data.database_path, "rb") as f:
+            header = f.read(20)
+        song_data.get_songs(["Glaciaxion.SunsetRay"])
+        assert "mode" not in song_data.engine.url.query
+        with open(song_data.database_path, "rb") as f:
+            assert f.read(20) == header
+        with song_data.engine.connect() as connection:
+            assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() != "wal"
+    
+    def test_read_only_reader_is_opt_in(self, tmp_path):
+        phigros.database.song_data.SongData(str(tmp_path / "song_data.db")).add_song("Glaciaxion.SunsetRay", "Glaciaxion", "SunsetRay", "a", "b", 1.0, 6.0, 12.5)
+        reader = phigros.database.song_data.SongData(str(tmp_path / "song_data.db"), read_only=True)
+        assert reader.engine.url.query["mode"] == "ro"
+        assert reader.get_song("Glaciaxion.SunsetRay")["levels"]["IN"] == 12.5
+        with pytest.raises(PermissionError):
+            reader.add_song("Rrhar'il.TeamGrimoire", "Rrhar'il", "Team Grimoire", "a", "b", 4.0, 10.0, 15.7, 16.4)
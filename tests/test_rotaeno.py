@@ -1,10 +1,24 @@
 import sys
 import os
+import sqlite3
+import datetime
+import json
+import concurrent.futures
+import http.server
+import threading
+import collections
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+import io
+import time
 import pytest
+import asyncio
+import PIL.Image
+import PIL.ImageChops
+import PIL.ImageStat
 import rotaeno
+import common.render
 
 user_profiles = [
     {
@@ -27,6 +41,18 @@ user_profiles = [
     }
 ]
 
+@pytest.fixture(params=["sqlite", "postgresql"])
+def database_url(request, tmp_path):
+    if request.param == "sqlite":
+        yield f"sqlite:///{tmp_path / 'store.db'}"
+        return
+    url = os.environ.get("ROTAENO_TEST_POSTGRES_URL")
+    if not url: pytest.skip("ROTAENO_TEST_POSTGRES_URL is not set")
+    yield url
+    engine = rotaeno.database.engine.get_engine(url)
+    rotaeno.database.player_data.PlayerData._base.metadata.drop_all(engine)
+    rotaeno.database.player_song_data.PlayerSongStore._base.metadata.drop_all(engine)
+
 class TestRequestProcessor:
     @pytest.mark.skip(reason="COMPLEX")
     @pytest.mark.parametrize("user_profile", user_profiles)
@@ -74,4 +100,1054 @@ class TestProcessor:
     def test_get_song_image(self, user_profile):
         song_id = "alive"
         song_image = rotaeno.processor.get_song(user_profile=user_profile, song_id=song_id)
-        assert isinstance(song_image, str)
\ No newline at end of file
+        assert isinstance(song_image, str)
+
+class FakePage:
+    def __init__(self):
+        self.closed = False
+    
+    def is_closed(self):
+        return self.closed
+    
+    def close(self):
+        self.closed = True
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+    
+    def is_connected(self):
+        return self.connected
+    
+    def new_page(self):
+        return FakePage()
+    
+    def close(self):
+        self.connected = False
+
+class FakePlaywright:
+    def __init__(self):
+        self.chromium = self
+        self.launches = 0
+    
+    def launch(self, headless=True):
+        self.launches += 1
+        return FakeBrowser()
+    
+    def start(self):
+        return self
+    
+    def stop(self):
+        ...
+
+class TestRenderPool:
+    def test_render_reuses_warm_browser(self, monkeypatch):
+        fake_playwright = FakePlaywright()
+        monkeypatch.setattr(common.render.playwright.sync_api, "sync_playwright", lambda: fake_playwright)
+        monkeypatch.setattr(common.render, "_render_page", lambda page, window_size, temp_dir, **kwargs: f"{window_size[0]}.png")
+        
+        pool = rotaeno.utils.RenderPool(browsers=1, max_queue=4)
+        try:
+            assert [pool.render((i, 10), html="") for i in range(3)] == ["0.png", "1.png", "2.png"]
+            stats = pool.stats()
+        finally:
+            pool.close()
+        
+        assert fake_playwright.launches == 1
+        assert stats["rendered"] == 3
+        assert stats["failed"] == 0
+        assert stats["queue_depth"] == 0
+        assert stats["avg_latency"] is not None
+    
+    def test_render_failure_is_reported(self, monkeypatch):
+        def fail(page, window_size, temp_dir, **kwargs):
+            raise RuntimeError("render failed")
+        monkeypatch.setattr(common.render.playwright.sync_api, "sync_playwright", FakePlaywright)
+        monkeypatch.setattr(common.render, "_render_page", fail)
+        
+        pool = rotaeno.utils.RenderPool(browsers=1)
+        try:
+            with pytest.raises(RuntimeError):
+                pool.render((10, 10), html="")
+            assert pool.stats()["failed"] == 1
+        finally:
+            pool.close()
+
+class TestAsyncRenderer:
+    def test_render_respects_concurrency_limit(self, monkeypatch):
+        active = 0
+        peak = 0
+        
+        class FakeAsyncPage:
+            async def close(self):
+                ...
+        
+        class FakeAsyncBrowser:
+            def is_connected(self):
+                return True
+            
+            async def new_page(self):
+                return FakeAsyncPage()
+        
+        class FakeAsyncPlaywright:
+            def __init__(self):
+                self.chromium = self
+            
+            async def start(self):
+                return self
+            
+            async def launch(self, headless=True):
+                return FakeAsyncBrowser()
+        
+        async def render_page(page, window_size, temp_dir, **kwargs):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return f"{window_size[0]}.png"
+        
+        monkeypatch.setattr(common.render.playwright.async_api, "async_playwright", FakeAsyncPlaywright)
+        monkeypatch.setattr(common.render, "_async_render_page", render_page)
+        
+        async def main():
+            renderer = rotaeno.utils.AsyncRenderer(concurrency=3)
+            return await asyncio.gather(*[renderer.render((i, 10), html="") for i in range(10)])
+        
+        assert asyncio.run(main()) == [f"{i}.png" for i in range(10)]
+        assert peak == 3
+    
+    def test_in_memory_cache_io_stays_off_the_event_loop(self, tmp_path):
+        threads = []
+        
+        class RecordingCache(rotaeno.utils.RenderCache):
+            def get(self, key):
+                threads.append(threading.get_ident())
+                return super().get(key)
+            
+            def put(self, key, image_bytes, persist=True):
+                threads.append(threading.get_ident())
+                return super().put(key, image_bytes, persist=persist)
+        
+        class FakeRenderer:
+            async def render(self, window_size, **kwargs):
+                return png_bytes(size=window_size)
+        
+        service = common.render.RenderService(str(tmp_path), cache=RecordingCache(tmp_path / "cache"), async_renderer=FakeRenderer())
+        
+        async def main():
+            first = await service.async_render_html_to_bytes((8, 8), html="", cache_key="key")
+            second = await service.async_render_html_to_bytes((8, 8), html="", cache_key="key")
+            return first, second, threading.get_ident()
+        
+        first, second, loop_thread = asyncio.run(main())
+        assert first == second
+        assert len(threads) == 3 and loop_thread not in threads
+    
+    def test_each_event_loop_gets_its_own_browser(self, monkeypatch):
+        browsers = []
+        
+        class FakeAsyncBrowser:
+            def __init__(self):
+                self.loop = asyncio.get_running_loop()
+                browsers.append(self)
+            
+            def is_connected(self):
+                return True
+            
+            async def new_page(self):
+                assert asyncio.get_running_loop() is self.loop, "browser belongs to a closed event loop"
+                return FakeAsyncPage()
+            
+            async def close(self):
+                ...
+        
+        class FakeAsyncPage:
+            async def close(self):
+                ...
+        
+        class FakeAsyncPlaywright:
+            def __init__(self):
+                self.chromium = self
+            
+            async def start(self):
+                return self
+            
+            async def launch(self, headless=True):
+                return FakeAsyncBrowser()
+            
+            async def stop(self):
+                ...
+        
+        async def render_page(page, window_size, temp_dir, **kwargs):
+            return f"{window_size[0]}.png"
+        
+        monkeypatch.setattr(common.render.playwright.async_api, "async_playwright", FakeAsyncPlaywright)
+        monkeypatch.setattr(common.render, "_async_render_page", render_page)
+        renderer = rotaeno.utils.AsyncRenderer(concurrency=2)
+        
+        async def main():
+            return await asyncio.gather(*[renderer.render((i, 10), html="") for i in range(3)])
+        
+        assert asyncio.run(main()) == asyncio.run(main()) == ["0.png", "1.png", "2.png"]
+        assert len(browsers) == 2
+
+class TestCompressImageBytes:
+    def test_small_image_is_returned_untouched(self):
+        output = io.BytesIO()
+        PIL.Image.new("RGB", (64, 64), "white").save(output, format="PNG")
+        assert rotaeno.utils.compress_image_bytes(output.getvalue(), max_size_mb=1) == output.getvalue()
+    
+    def test_large_image_is_compressed_in_memory(self):
+        output = io.BytesIO()
+        PIL.Image.frombytes("RGB", (512, 512), os.urandom(512 * 512 * 3)).save(output, format="PNG")
+        compressed = rotaeno.utils.compress_image_bytes(output.getvalue(), max_size_mb=0.2)
+        assert len(compressed) <= 0.2 * 1024 * 1024
+
+class TestEncodeImage:
+    @pytest.mark.parametrize("image_format", ["WEBP", "JPEG", "PNG"])
+    def test_encode_fits_size_in_few_passes(self, image_format):
+        img = PIL.Image.frombytes("RGB", (800, 1200), os.urandom(800 * 1200 * 3))
+        image_bytes, metrics = rotaeno.utils.encode_image(img, max_size_mb=0.5, image_format=image_format)
+        assert len(image_bytes) <= 0.5 * 1024 * 1024
+        assert metrics["format"] == image_format
+        assert metrics["size"] == len(image_bytes)
+        assert metrics["passes"] <= 3
+        assert metrics["fits"] is True
+        assert metrics["encode_time"] > 0
+    
+    def test_missed_size_target_is_reported(self):
+        img = PIL.Image.frombytes("RGB", (256, 256), os.urandom(256 * 256 * 3))
+        image_bytes, metrics = rotaeno.utils.encode_image(img, max_size_mb=0.01, max_passes=1)
+        assert len(image_bytes) > 0.01 * 1024 * 1024
+        assert metrics["fits"] is False
+        assert rotaeno.utils.encode_metrics[-1] is metrics
+        with pytest.raises(ValueError):
+            rotaeno.utils.encode_image(img, max_size_mb=0.01, max_passes=1, strict=True)
+        assert rotaeno.utils.encode_image(img, max_size_mb=1, strict=True)[1]["fits"] is True
+    
+    def test_encode_rejects_unknown_format(self):
+        with pytest.raises(ValueError):
+            rotaeno.utils.encode_image(PIL.Image.new("RGB", (8, 8)), image_format="BMP")
+
+def png_bytes(size=(16, 16), color="white"):
+    output = io.BytesIO()
+    PIL.Image.new("RGB", size, color).save(output, format="PNG")
+    return output.getvalue()
+
+class TestRenderCache:
+    def test_key_depends_on_template_locale_and_data(self, tmp_path):
+        template_path = tmp_path / "b40.html"
+        template_path.write_text("$$data", encoding="utf-8")
+        cache = rotaeno.utils.RenderCache(tmp_path / "cache")
+        
+        key = cache.make_key(template_path, {"score": 1}, locale={"footer": "a"})
+        assert key == cache.make_key(template_path, {"score": 1}, locale={"footer": "a"})
+        assert key != cache.make_key(template_path, {"score": 2}, locale={"footer": "a"})
+        assert key != cache.make_key(template_path, {"score": 1}, locale={"footer": "b"})
+        
+        template_path.write_text("<b>$$data</b>", encoding="utf-8")
+        assert key != cache.make_key(template_path, {"score": 1}, locale={"footer": "a"})
+    
+    def test_formats_get_their_own_entries(self, tmp_path):
+        template_path = tmp_path / "b40.html"
+        template_path.write_text("$$data", encoding="utf-8")
+        service = common.render.RenderService(str(tmp_path / "out"), cache=rotaeno.utils.RenderCache(tmp_path / "cache"))
+        noise = PIL.Image.frombytes("RGB", (64, 64), os.urandom(64 * 64 * 3))
+        draw = lambda: noise
+        
+        images = {}
+        for image_format in ["WEBP", "JPEG", "WEBP"]:
+            cache_key = service.cache.make_key(template_path, {"score": 1}, image_format=image_format, max_size_mb=0.005)
+            images.setdefault(image_format, []).append(service.render_image_to_bytes(draw, image_format=image_format, max_size_mb=0.005, cache_key=cache_key))
+        assert [PIL.Image.open(io.BytesIO(image_bytes)).format for image_bytes in images["WEBP"] + images["JPEG"]] == ["WEBP", "WEBP", "JPEG"]
+        assert service.cache.hits == 1
+        assert service.cache.make_key(template_path, {"score": 1}, image_format="jpg") == service.cache.make_key(template_path, {"score": 1}, image_format="JPEG")
+        assert service.cache.make_key(template_path, {"score": 1}) != service.cache.make_key(template_path, {"score": 1}, max_size_mb=1)
+    
+    def test_put_get_and_hit_rate(self, tmp_path):
+        cache = rotaeno.utils.RenderCache(tmp_path)
+        assert cache.get("key") is None
+        
+        path = cache.put("key", png_bytes())
+        assert path.endswith("key.png")
+        assert cache.get("key") == png_bytes()
+        assert cache.get_path("key") == path
+        assert cache.stats()["hit_rate"] == 2 / 3
+        
+        assert rotaeno.utils.RenderCache(tmp_path).get("key") == png_bytes()
+    
+    def test_lru_eviction_and_ttl(self, tmp_path):
+        image_bytes = png_bytes()
+        cache = rotaeno.utils.RenderCache(tmp_path, max_memory_bytes=len(image_bytes) * 2, max_disk_bytes=len(image_bytes) * 2)
+        cache.put("a", image_bytes)
+        cache.put("b", image_bytes)
+        cache.get("a")
+        cache.put("c", image_bytes)
+        
+        assert cache.get_path("b") is None
+        assert cache.get_path("a") is not None
+        assert cache.stats()["evictions"] >= 1
+        
+        cache.ttl = 0
+        time.sleep(0.01)
+        assert cache.get("a") is None
+        assert not os.path.exists(os.path.join(tmp_path, "a.png"))
+    
+    def test_memory_only_entries_never_touch_disk(self, tmp_path):
+        cache = rotaeno.utils.RenderCache(tmp_path)
+        assert cache.put("key", png_bytes(), persist=False) is None
+        assert cache.get("key") == png_bytes()
+        
+        cache = rotaeno.utils.RenderCache(tmp_path / "no_disk", max_disk_bytes=0)
+        assert cache.put("key", png_bytes()) is None
+        assert cache.get("key") == png_bytes()
+        assert os.listdir(tmp_path) == ["no_disk"] and os.listdir(tmp_path / "no_disk") == []
+    
+    def test_rendered_paths_belong_to_the_caller(self, tmp_path, monkeypatch):
+        cache = rotaeno.utils.RenderCache(tmp_path / "cache")
+        service = common.render.RenderService(str(tmp_path / "out"), cache=cache)
+        draw = lambda: PIL.Image.new("RGB", (16, 16), "white")
+        first = service.render_image_to_jpg(draw, cache_key="key")
+        second = service.render_image_to_jpg(draw, cache_key="key")
+        assert cache.hits == 1
+        assert len({first, second}) == 2 and all(os.path.dirname(path) == str(tmp_path / "out") for path in (first, second))
+        for name in os.listdir(tmp_path / "cache"): os.remove(tmp_path / "cache" / name)
+        assert os.path.exists(first) and os.path.exists(second)
+        
+        image_bytes = service.render_image_to_bytes(lambda: PIL.Image.new("RGB", (8, 8)), cache_key="memory")
+        assert cache.get("memory") == image_bytes
+        assert not any(name.startswith("memory") for name in os.listdir(tmp_path / "cache"))
+
+
+class TestTemplateCache:
+    def test_template_is_reloaded_when_modified(self, tmp_path):
+        template_path = tmp_path / "song.html"
+        template_path.write_text("a", encoding="utf-8")
+        cache = rotaeno.utils.TemplateCache()
+        assert cache.get(template_path, compile=str.upper) == "A"
+        
+        template_path.write_text("bb", encoding="utf-8")
+        os.utime(template_path, ns=(0, 0))
+        assert cache.get(template_path, compile=str.upper) == "BB"
+    
+    @pytest.mark.parametrize("template_name", ["b40.html", "song.html", "song_status.html", "song_rtr.html"])
+    @pytest.mark.parametrize("locale", ["zh-CN", "en-US"])
+    def test_build_html_matches_full_substitution(self, template_name, locale):
+        template_path = os.path.join(rotaeno.processor.ASSETS_DIR, "html", template_name)
+        user_data = {"playerInfo": {"displayName": "$$footer"}, "songDatas": []}
+        with open(template_path, "r", encoding="utf-8") as f:
+            expected = rotaeno.processor.SafeTemplate(f.read()).safe_substitute({
+                "data": rotaeno.processor.json.dumps(user_data, indent=4, ensure_ascii=False),
+                **rotaeno.processor.t(locale)
+            })
+        assert rotaeno.processor._build_html(template_path, user_data, locale) == expected
+
+class TestClientSideRender:
+    def test_shell_pages_are_reused_per_template(self, monkeypatch):
+        opened = []
+        
+        class FakeShellPage(FakePage):
+            def goto(self, url):
+                self.url = url
+            
+            def set_content(self, html, wait_until="load"):
+                opened.append(html)
+        
+        class FakeShellBrowser(FakeBrowser):
+            def new_page(self):
+                return FakeShellPage()
+        
+        fake_playwright = FakePlaywright()
+        fake_playwright.launch = lambda headless=True: FakeShellBrowser()
+        monkeypatch.setattr(common.render.playwright.sync_api, "sync_playwright", lambda: fake_playwright)
+        monkeypatch.setattr(common.render, "_render_page", lambda page, window_size, temp_dir, **kwargs: kwargs["data"]["id"])
+        
+        pool = rotaeno.utils.RenderPool(browsers=1, shell_max_uses=3)
+        try:
+            results = [pool.render((10, 10), html=html, in_memory=True, data={"id": i}) for i, html in enumerate(["a", "a", "b", "a", "a"])]
+        finally:
+            pool.close()
+        
+        assert results == [0, 1, 2, 3, 4]
+        assert opened == ["a", "b", "a"]
+    
+    @pytest.mark.parametrize("template_name", ["b40.html", "song.html", "song_status.html", "song_rtr.html"])
+    def test_shell_has_no_embedded_data(self, template_name):
+        template_path = os.path.join(rotaeno.processor.ASSETS_DIR, "html", template_name)
+        shell = rotaeno.processor.get_shell(template_path, "en-US")
+        assert shell == rotaeno.processor._build_html(template_path, None, "en-US")
+        assert "renderData" in shell
+
+class TestRenderMany:
+    @pytest.fixture
+    def gated_pool(self, monkeypatch):
+        gates = collections.defaultdict(threading.Event)
+        started = []
+        def render_page(page, window_size, temp_dir, **kwargs):
+            started.append(window_size[0])
+            assert gates[window_size[0]].wait(5)
+            return png_bytes(size=(window_size[0], 10))
+        monkeypatch.setattr(common.render.playwright.sync_api, "sync_playwright", FakePlaywright)
+        monkeypatch.setattr(common.render, "_render_page", render_page)
+        pools = []
+        def make_pool(browsers):
+            pools.append(rotaeno.utils.RenderPool(browsers=browsers))
+            return pools[-1]
+        yield make_pool, gates, started
+        for pool in pools: pool.close()
+    
+    def test_results_stream_as_they_finish(self, gated_pool):
+        make_pool, gates, started = gated_pool
+        jobs = [{"window_size": (width, 10), "html": ""} for width in (60, 1, 20)]
+        results = rotaeno.utils.render_many(jobs, pool=make_pool(2), in_memory=True)
+        
+        gates[1].set()
+        first = next(results)
+        gates[20].set()
+        second = next(results)
+        gates[60].set()
+        third = next(results)
+        
+        assert [index for index, _ in (first, second, third)] == [1, 2, 0]
+        assert [PIL.Image.open(io.BytesIO(image_bytes)).width for _, image_bytes in (first, second, third)] == [1, 20, 60]
+    
+    def test_jobs_enter_the_pool_in_order(self, gated_pool):
+        make_pool, gates, started = gated_pool
+        for width in range(1, 6): gates[width].set()
+        jobs = [{"window_size": (width, 10), "html": ""} for width in range(1, 6)]
+        assert [index for index, _ in rotaeno.utils.render_many(jobs, pool=make_pool(1), in_memory=True)] == [0, 1, 2, 3, 4]
+        assert started == [1, 2, 3, 4, 5]
+    
+    def test_failures_can_be_returned(self, monkeypatch):
+        async def render(window_size, **kwargs):
+            if window_size[0] == 0: raise RuntimeError("render failed")
+            return window_size[0]
+        monkeypatch.setattr(rotaeno.utils.render_service, "async_render_html_to_bytes", render)
+        
+        async def main():
+            return [item async for item in rotaeno.utils.async_render_many([{"window_size": (i, 10)} for i in range(3)], in_memory=True, return_exceptions=True)]
+        
+        results = dict(asyncio.run(main()))
+        assert isinstance(results.pop(0), RuntimeError)
+        assert results == {1: 1, 2: 2}
+
+def browser_available():
+    try:
+        with common.render.playwright.sync_api.sync_playwright() as driver:
+            driver.chromium.launch(headless=True).close()
+        return True
+    except Exception:
+        return False
+
+def image_difference(a, b):
+    a = a.convert("L").resize((a.width // 8, a.height // 8))
+    b = b.convert("L").resize(a.size)
+    return PIL.ImageStat.Stat(PIL.ImageChops.difference(a, b)).mean[0]
+
+best40_user_data = {
+    "playerInfo": {"avatar": "default", "displayName": "Player", "rating": 14.5, "background": "default"},
+    "songDatas": [{"id": f"song{i}", "title": f"Song {i}", "level": "IV", "diff": 13.0 - i / 10, "score": 1010000 - i * 5000, "rating": 15 - i / 10, "ratingMix": 15 - i / 10, "status": "FC"} for i in range(40)]
+}
+
+class TestRasterRenderer:
+    def test_draw_best40_uses_cached_tiles(self):
+        locale = rotaeno.processor.t("en-US")
+        img = rotaeno.raster.draw_best40(best40_user_data, locale)
+        hits = rotaeno.utils.tile_cache.hits
+        assert rotaeno.raster.draw_best40(best40_user_data, locale).tobytes() == img.tobytes()
+        assert img.width == 1600
+        assert rotaeno.utils.tile_cache.hits - hits >= 40
+    
+    def test_pillow_renderer_returns_image_bytes(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(rotaeno.processor, "_get_best40_data", lambda user_profile: best40_user_data)
+        monkeypatch.setattr(rotaeno.utils.render_service, "cache", rotaeno.utils.RenderCache(tmp_path))
+        image_bytes = rotaeno.processor.get_best40({"locale": "en-US"}, in_memory=True, renderer="pillow")
+        assert PIL.Image.open(io.BytesIO(image_bytes)).width == 1600
+        with pytest.raises(ValueError):
+            rotaeno.processor.get_best40({}, renderer="svg")
+    
+    @pytest.mark.skipif(not browser_available(), reason="Chromium is not installed")
+    def test_pillow_output_matches_html_output(self):
+        template_path = os.path.join(rotaeno.processor.ASSETS_DIR, "html", "b40.html")
+        pool = rotaeno.utils.RenderPool(browsers=1)
+        try:
+            html_image = PIL.Image.open(io.BytesIO(pool.render((1600, 1350), html=rotaeno.processor._build_html(template_path, best40_user_data, "en-US"), in_memory=True)))
+        finally:
+            pool.close()
+        pillow_image = rotaeno.raster.draw_best40(best40_user_data, rotaeno.processor.t("en-US"))
+        assert abs(html_image.height - pillow_image.height) <= html_image.height * 0.05
+        assert image_difference(html_image, pillow_image) < 24
+
+class TestSongDataIndex:
+    def test_get_song_is_served_from_index_and_refreshed(self, tmp_path):
+        database_path = str(tmp_path / "song_data.db")
+        song_data = rotaeno.database.song_data.SongData(database_path, check_interval=0)
+        song_data.add_song("alive", "Alive", "Artist", 120, "1.0", {"IV": {"num": 13.2}})
+        assert song_data.get_song("alive") == {"id": "alive", "title": "Alive", "artist": "Artist", "levels": {"IV": {"num": 13.2}}}
+        assert song_data.get_song("missing") == {}
+        
+        index = song_data._get_index()
+        assert song_data._get_index() is index
+        
+        rotaeno.database.song_data.SongData(database_path).add_song("alive", "Alive 2", "Artist", 120, "1.0", {"IV": {"num": 13.4}}, forceUpdate=True)
+        assert song_data.get_song("alive")["title"] == "Alive 2"
+    
+    def test_rating_range_uses_sorted_index(self, tmp_path):
+        song_data = rotaeno.database.song_data.SongData(str(tmp_path / "song_data.db"), check_interval=0)
+        song_data.add_song("alive", "Alive", "Artist", 120, "1.0", {"I": {"num": 3.0}, "III": {"num": 11.5}, "IV": {"num": 13.2}, "IV_Alpha": {"num": 13.2}})
+        song_data.add_song("blaze", "Blaze", "Artist", 120, "1.0", {"II": {"num": 7.0}, "IV": {"num": 12.0}})
+        song_data.add_song("calm", "Calm", "Artist", 120, "1.0", {"IV": {"num": 0}})
+        
+        assert song_data.get_songs_rating_real_range(11.5, 13.2) == [{"id": "alive", "levels": ["III", "IV", "IV_Alpha"]}, {"id": "blaze", "levels": ["IV"]}]
+        assert song_data.get_songs_rating_real_range(0, 7.0) == [{"id": "alive", "levels": ["I"]}, {"id": "blaze", "levels": ["II"]}]
+        assert song_data.get_songs_rating_real_range(14, 15) == []
+        
+        song_data.add_song("blaze", "Blaze", "Artist", 120, "1.0", {"IV": {"num": 14.5}}, forceUpdate=True)
+        assert song_data.get_songs_rating_real_range(14, 15) == [{"id": "blaze", "levels": ["IV"]}]
+
+    def test_module_singleton_accepts_updates(self):
+        song_data = rotaeno.database.song_data.song_data
+        song_data.add_song("test-singleton-song", "Singleton", "Artist", 120, "1.0", {"IV": {"num": 12.3}}, forceUpdate=True)
+        try:
+            assert song_data.get_song("test-singleton-song")["levels"] == {"IV": {"num": 12.3}}
+        finally:
+            session = song_data.Session()
+            session.query(song_data.Song).filter_by(id="test-singleton-song").delete()
+            session.query(song_data.SongLevel).filter_by(id="test-singleton-song").delete()
+            session.commit()
+            session.close()
+            song_data.refresh()
+    
+    def test_read_only_reader_is_opt_in(self, tmp_path):
+        database_path = str(tmp_path / "song_data.db")
+        rotaeno.database.song_data.SongData(database_path).add_song("alive", "Alive", "Artist", 120, "1.0", {"IV": {"num": 13.2}})
+        reader = rotaeno.database.song_data.SongData(database_path, read_only=True)
+        assert reader.engine.url.query["mode"] == "ro"
+        assert reader.get_song("alive")["title"] == "Alive"
+        with pytest.raises(PermissionError):
+            reader.add_song("blaze", "Blaze", "Artist", 120, "1.0", {"IV": {"num": 12.0}})
+
+class TestPlayerSongStore:
+    def test_views_share_one_store(self, tmp_path):
+        manager = rotaeno.database.player_song_data.PlayerSongDataManager(str(tmp_path / "songs"))
+        manager.get_song_data("alive").add_score(rotaeno.database.player_song_data.PlayerSongScore("player", "IV", 1000000, 13.5))
+        manager.get_song_data("other").add_score(rotaeno.database.player_song_data.PlayerSongScore("player", "IV", 900000, 10.0))
+        
+        assert manager.get_song_data("alive").store is manager.get_song_data("other").store
+        assert manager.get_song_data("alive").get_latest("player", "IV")["score"] == 1000000
+        assert [row["score"] for row in manager.get_song_data("other").get_history("player", "IV")] == [900000]
+        assert manager.get_song_data("missing").get_latest("player", "IV") is None
+    
+    def test_migrate_imports_per_song_files(self, tmp_path):
+        base_dir = tmp_path / "songs"
+        base_dir.mkdir()
+        legacy = rotaeno.database.player_song_data.PlayerSongData(str(base_dir / "alive.db"))
+        legacy.add_score(rotaeno.database.player_song_data.PlayerSongScore("player", "IV", 990000, 13.0))
+        legacy.add_score(rotaeno.database.player_song_data.PlayerSongScore("player", "IV", 1000000, 13.5))
+        legacy.engine.dispose()
+        
+        manager = rotaeno.database.player_song_data.PlayerSongDataManager(str(base_dir))
+        engines = set(rotaeno.database.engine._engines)
+        assert manager.migrate() == {"alive": {"latest": 1, "history": 2}}
+        assert set(rotaeno.database.engine._engines) == engines
+        assert manager.migrate() == {}
+        assert os.path.exists(base_dir / "alive.db.migrated")
+        assert [row["score"] for row in manager.get_song_data("alive").get_history("player", "IV")] == [1000000, 990000]
+        assert manager.get_song_data("alive").get_latest("player", "IV")["score"] == 1000000
+    
+    def test_add_scores_writes_once_and_skips_unchanged(self, database_url):
+        PlayerSongScore = rotaeno.database.player_song_data.PlayerSongScore
+        store = rotaeno.database.player_song_data.PlayerSongStore(database_url)
+        scores = [(f"song{i}", PlayerSongScore("player", "IV", 900000 + i, 10.0)) for i in range(400)]
+        assert store.add_scores(scores) == {"latest": 400, "history": 400, "skipped": 0}
+        
+        scores[0] = ("song0", PlayerSongScore("player", "IV", 1000000, 13.0))
+        assert store.add_scores(scores) == {"latest": 1, "history": 1, "skipped": 399}
+        assert store.get_latest("song0", "player", "IV")["score"] == 1000000
+        assert [row["score"] for row in store.get_history("song0", "player", "IV")] == [1000000, 900000]
+        assert len(store.get_history("song1", "player", "IV")) == 1
+    
+    def test_compact_dedupes_latest_rows_and_adds_unique_key(self, tmp_path):
+        db_path = str(tmp_path / "songs.db")
+        connection = sqlite3.connect(db_path)
+        connection.execute("CREATE TABLE player_song_latest (id INTEGER PRIMARY KEY AUTOINCREMENT, song_id VARCHAR NOT NULL, object_id VARCHAR NOT NULL, difficulty VARCHAR NOT NULL, score INTEGER NOT NULL, rating FLOAT)")
+        connection.execute("CREATE INDEX ix_player_song_latest_key ON player_song_latest (song_id, object_id, difficulty)")
+        connection.executemany("INSERT INTO player_song_latest (song_id, object_id, difficulty, score, rating) VALUES (?, ?, ?, ?, ?)", [("alive", "player", "IV", score, 13.0) for score in (980000, 990000, 1000000)])
+        connection.commit()
+        connection.close()
+        
+        store = rotaeno.database.player_song_data.PlayerSongStore(db_path)
+        assert store.get_latest("alive", "player", "IV")["score"] == 1000000
+        with sqlite3.connect(db_path) as connection:
+            assert connection.execute("SELECT COUNT(*) FROM player_song_latest").fetchone() == (3,)
+        assert store.compact() == {"removed": 2}
+        assert store.compact() == {"removed": 0}
+        
+        store.add_score("alive", rotaeno.database.player_song_data.PlayerSongScore("player", "IV", 1005000, 13.2))
+        with sqlite3.connect(db_path) as connection:
+            assert connection.execute("SELECT score FROM player_song_latest").fetchall() == [(1005000,)]
+            assert {row[1] for row in connection.execute("PRAGMA index_list(player_song_latest)")} == {"ux_player_song_latest_key", "ix_player_song_latest_object"}
+
+class TestPlayerDataHistory:
+    def make_player(self, rating: float, record: dict) -> "rotaeno.database.player_data.Player":
+        return rotaeno.database.player_data.Player(object_id="player", name="Player", rating=rating, play_record=record)
+    
+    def test_unchanged_snapshots_are_skipped(self, database_url):
+        player_data = rotaeno.database.player_data.PlayerData(database_url)
+        assert player_data.add_player(self.make_player(13.0, {"Miss": 1}))
+        assert not player_data.add_player(self.make_player(13.0, {"Miss": 1}))
+        assert len(player_data.get_player_history("player")) == 1
+    
+    def test_history_is_rebuilt_from_deltas(self, database_url):
+        player_data = rotaeno.database.player_data.PlayerData(database_url)
+        player_data.KEYFRAME_INTERVAL = 4
+        start = datetime.datetime(2026, 1, 1)
+        for index in range(10):
+            record = {"Miss": index, "Good": 5}
+            if index % 3: record["Bonus"] = index
+            player_data.add_player(self.make_player(13.0 + index / 10, record), timestamp=start + datetime.timedelta(days=index))
+        
+        session = player_data.session()
+        rows = session.query(player_data.PlayerHistoryDelta).order_by(player_data.PlayerHistoryDelta.id).all()
+        assert [row.is_full for row in rows] == [True, False, False, False, True, False, False, False, True, False]
+        assert rows[1].changes == {"rating": 13.1, "play_record": {"set": {"Miss": 1, "Bonus": 1}, "unset": []}}
+        session.close()
+        
+        history = player_data.get_player_history("player", limit=3)
+        assert [row["rating"] for row in history] == [13.9, 13.8, 13.7]
+        assert history[0]["play_record"] == {"Miss": 9, "Good": 5}
+        assert history[1]["play_record"] == {"Miss": 8, "Good": 5, "Bonus": 8}
+        assert history[0]["name"] == "Player"
+        
+        history = player_data.get_player_history("player", since=start + datetime.timedelta(days=5), order_desc=False)
+        assert [row["play_record"]["Miss"] for row in history] == [5, 6, 7, 8, 9]
+        assert history[-1] == dict(player_data.get_player_latest("player", is_dict=True), id=history[-1]["id"], timestamp=start + datetime.timedelta(days=9))
+
+class TestEngine:
+    def test_sqlite_engine_applies_pragmas_and_is_shared(self, tmp_path):
+        engine = rotaeno.database.engine.sqlite_engine(str(tmp_path / "tuned.db"))
+        assert engine is rotaeno.database.engine.sqlite_engine(str(tmp_path / "tuned.db"))
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+            assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+            assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+    
+    def test_configure_applies_to_existing_engines(self, tmp_path):
+        engine = rotaeno.database.engine.sqlite_engine(str(tmp_path / "tuned.db"))
+        pragmas = dict(rotaeno.database.engine.SQLITE_PRAGMAS)
+        pool_options = dict(rotaeno.database.engine.POOL_OPTIONS)
+        try:
+            rotaeno.database.engine.configure(pragmas={"cache_size": -1024}, pool_size=2)
+            with engine.connect() as connection:
+                assert connection.exec_driver_sql("PRAGMA cache_size").scalar() == -1024
+                assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+            assert engine.pool.size() == 2
+            with pytest.raises(ValueError):
+                rotaeno.database.engine.configure(pool_sizes=2)
+        finally:
+            rotaeno.database.engine.configure(pragmas=pragmas, **pool_options)
+    
+    def test_stores_write_from_many_threads(self, tmp_path):
+        store = rotaeno.database.player_song_data.PlayerSongStore(str(tmp_path / "songs.db"))
+        PlayerSongScore = rotaeno.database.player_song_data.PlayerSongScore
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            list(executor.map(lambda index: store.add_scores([(f"song{index}", PlayerSongScore(f"player{index}", "IV", 1000000, 13.0))]), range(32)))
+        assert all(store.get_latest(f"song{index}", f"player{index}", "IV") for index in range(32))
+    
+    def test_history_tables_are_partitioned_on_postgres(self):
+        from sqlalchemy.dialects import postgresql
+        from sqlalchemy.schema import CreateTable
+        table = rotaeno.database.engine._partitioned_table(rotaeno.database.player_song_data.PlayerSongStore.History.__table__, "timestamp")
+        ddl = str(CreateTable(table).compile(dialect=postgresql.dialect()))
+        assert "PARTITION BY RANGE (timestamp)" in ddl
+        assert "PRIMARY KEY (id, timestamp)" in ddl
+        assert "id SERIAL NOT NULL" in ddl
+
+class TestPlayerChartData:
+    @pytest.fixture
+    def user_data(self):
+        song_datas = []
+        for index, (song_id, level, diff, score, status) in enumerate([
+            ("alive", "IV", 13.2, 1010000, "APP"), ("alive", "III", 11.0, 990000, "FC"), ("blaze", "IV", 12.8, 1005000, "AP"),
+            ("calm", "IV", 13.0, 1005000, "AP"), ("dawn", "II", 7.0, 800000, "NONE"), ("echo", "IV_Alpha", 13.4, 950000, "CLEAR")
+        ]):
+            song_datas.append({
+                "title": song_id.title(), "diff": diff, "rating": diff + index / 10, "ratingMix": diff + index / 10, "score": score, "status": status,
+                "isCleared": status != "NONE", "nextPointScore": 1010000 - score, "isFavorite": index % 2 == 0, "id": song_id, "level": level
+            })
+        return {"playerInfo": {"displayName": "Player", "rating": 14.0}, "songDatas": song_datas}
+    
+    @pytest.fixture
+    def charts(self, tmp_path, monkeypatch, user_data):
+        charts = rotaeno.database.player_chart_data.PlayerChartData(str(tmp_path / "charts.db"))
+        monkeypatch.setattr(rotaeno.database.player_chart_data, "player_chart_data", charts)
+        monkeypatch.setattr(rotaeno.processor, "_get_user_data", lambda user_profile, processor=None: json.loads(json.dumps(user_data)))
+        monkeypatch.setattr(rotaeno.api.cache, "cloud_save_cache", rotaeno.api.cache.CloudSaveCache(freshness=0))
+        return charts
+    
+    def test_refresh_only_rewrites_new_saves(self, charts, user_data):
+        assert charts.refresh("player", user_data)
+        assert not charts.refresh("player", user_data)
+        assert charts.get_meta("player")["playerInfo"] == user_data["playerInfo"]
+        assert charts.get_charts("player") == user_data["songDatas"]
+        
+        user_data["songDatas"] = user_data["songDatas"][:2]
+        assert charts.refresh("player", user_data)
+        assert len(charts.get_charts("player")) == 2
+        assert charts.get_charts("other") == []
+    
+    def test_indexed_queries(self, charts, user_data):
+        charts.refresh("player", user_data)
+        assert [(row["id"], row["level"]) for row in charts.get_charts("player", status="AP", diff_range=(12.5, 13.4), order_by="score")] == [("blaze", "IV"), ("calm", "IV")]
+        assert [row["id"] for row in charts.get_charts("player", status="NOTCLEAR")] == ["dawn"]
+        assert [row["id"] for row in charts.get_charts("player", order_by="ratingMix", limit=2)] == ["echo", "calm"]
+        with pytest.raises(ValueError):
+            charts.get_charts("player", order_by="title")
+    
+    def test_views_match_in_memory_filters(self, charts, user_data):
+        user_profile = {"serverCode": "cn", "objectID": "player", "sessionToken": ""}
+        song_datas = user_data["songDatas"]
+        
+        assert rotaeno.processor.get_best40(user_profile, just_data=True) == sorted(song_datas, key=lambda x: x["ratingMix"], reverse=True)[:40]
+        assert rotaeno.processor.get_song_status(user_profile, "FAVORITE", just_data=True) == [song_data for song_data in song_datas if song_data["isFavorite"]]
+        assert rotaeno.processor.get_song_rtr(user_profile, (12.5, 13.2), "score", just_data=True) == sorted([song_data for song_data in song_datas if 12.5 <= song_data["diff"] <= 13.2], key=lambda x: x["score"], reverse=True)
+        assert list(rotaeno.processor.get_song(user_profile, "alive", just_data=True)) == ["IV", "III"]
+
+class TestCloudSaveCache:
+    def test_burst_costs_one_fetch(self):
+        cache = rotaeno.api.cache.CloudSaveCache(freshness=60)
+        calls = []
+        def fetch():
+            calls.append(1)
+            time.sleep(0.05)
+            return "2026-01-01T00:00:00.000Z", {"rating": 14.0}
+        with concurrent.futures.ThreadPoolExecutor(5) as executor:
+            results = list(executor.map(lambda _: cache.get("player", fetch), range(5)))
+        assert len(calls) == 1
+        assert all(result == {"rating": 14.0} for result in results)
+        assert cache.stats() == {"items": 1, "hits": 4, "revalidations": 0, "misses": 1}
+    
+    def test_stale_entries_are_revalidated_by_updated_at(self):
+        cache = rotaeno.api.cache.CloudSaveCache(freshness=0)
+        updated_at = ["2026-01-01T00:00:00.000Z"]
+        fetches = []
+        def fetch():
+            fetches.append(updated_at[0])
+            return updated_at[0], len(fetches)
+        
+        assert cache.get("player", fetch, check=lambda: updated_at[0]) == 1
+        assert cache.get("player", fetch, check=lambda: updated_at[0]) == 1
+        updated_at[0] = "2026-01-02T00:00:00.000Z"
+        assert cache.get("player", fetch, check=lambda: updated_at[0]) == 2
+        assert cache.get("player", fetch) == 3
+        assert cache.stats()["revalidations"] == 1
+    
+    def test_failed_fetches_are_not_cached(self):
+        cache = rotaeno.api.cache.CloudSaveCache()
+        def fetch():
+            raise ConnectionError("offline")
+        with pytest.raises(ConnectionError):
+            cache.get("player", fetch)
+        assert cache.get("player", lambda: (None, "ok")) == "ok"
+
+@pytest.fixture
+def http_server():
+    state = {"ports": set(), "failures": 0, "requests": 0, "active": 0, "max_active": 0}
+    lock = threading.Lock()
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        def do_GET(self):
+            with lock:
+                state["requests"] += 1
+                state["ports"].add(self.client_address[1])
+                state["active"] += 1
+                state["max_active"] = max(state["max_active"], state["active"])
+            if self.path.startswith("/slow"): time.sleep(0.05)
+            with lock:
+                state["active"] -= 1
+            status = 200
+            if self.path == "/flaky" and state["failures"] < 2:
+                state["failures"] += 1
+                status = 503
+            body = json.dumps({"path": self.path}).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        def log_message(self, *args): pass
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", state
+    server.shutdown()
+    server.server_close()
+
+class TestSessionPool:
+    def test_games_share_one_pool(self):
+        import kalpa
+        import phigros
+        assert kalpa.api.session is phigros.api.session is rotaeno.api.session
+        assert kalpa.api.request.session.session_pool is phigros.api.request.session.session_pool is rotaeno.api.request.session.session_pool
+        assert kalpa.api.request.session.async_session_pool is phigros.api.processor.session.async_session_pool is rotaeno.api.request.session.async_session_pool
+    
+    def test_requests_reuse_warm_connections(self, http_server):
+        url, state = http_server
+        pool = rotaeno.api.session.SessionPool()
+        assert pool.session(f"{url}/a") is pool.session(f"{url}/b")
+        for index in range(10):
+            assert pool.get(f"{url}/{index}").json() == {"path": f"/{index}"}
+        assert state["requests"] == 10
+        assert len(state["ports"]) == 1
+        pool.close()
+    
+    def test_retries_with_backoff(self, http_server):
+        url, state = http_server
+        pool = rotaeno.api.session.SessionPool(backoff_factor=0)
+        assert pool.get(f"{url}/flaky").status_code == 200
+        assert state["failures"] == 2
+        
+        pool.configure(max_retries=0)
+        state["failures"] = 0
+        assert pool.get(f"{url}/flaky").status_code == 503
+        with pytest.raises(ValueError):
+            pool.configure(pool_size=4)
+        pool.close()
+    
+    def test_trace_sink_is_opt_in(self, http_server):
+        url, state = http_server
+        pool = rotaeno.api.session.SessionPool()
+        pool.get(f"{url}/warm")
+        assert pool.session(url).hooks["response"] == []
+        
+        recorder = rotaeno.api.session.TraceRecorder()
+        pool.set_trace_sink(recorder)
+        pool.get(f"{url}/traced")
+        pool.set_trace_sink(None)
+        pool.get(f"{url}/untraced")
+        assert pool.session(url).hooks["response"] == []
+        
+        [record] = recorder.records()
+        assert record["method"] == "GET" and record["url"] == f"{url}/traced"
+        assert record["status"] == 200 and record["bytes"] == len(b'{"path": "/traced"}')
+        assert record["latency"] >= 0
+        assert recorder.stats()[url.split("//")[1]]["requests"] == 1
+        pool.close()
+
+class TestAsyncAPI:
+    def test_async_pool_limits_concurrency_per_host(self, http_server):
+        url, state = http_server
+        pool = rotaeno.api.session.AsyncSessionPool(limit_per_host=4, backoff_factor=0)
+        
+        async def main():
+            try:
+                return await asyncio.gather(*[pool.get(f"{url}/slow/{index}") for index in range(20)])
+            finally:
+                await pool.close()
+        
+        responses = asyncio.run(main())
+        assert [response.json()["path"] for response in responses] == [f"/slow/{index}" for index in range(20)]
+        assert state["max_active"] <= 4
+        assert len(state["ports"]) <= 4
+    
+    def test_async_pool_traces_requests(self, http_server):
+        url, state = http_server
+        state["failures"] = 0
+        recorder = rotaeno.api.session.TraceRecorder()
+        pool = rotaeno.api.session.AsyncSessionPool(backoff_factor=0)
+        pool.set_trace_sink(recorder)
+        
+        async def main():
+            try:
+                return await pool.get(f"{url}/flaky")
+            finally:
+                await pool.close()
+        
+        assert asyncio.run(main()).status_code == 200
+        assert [record["status"] for record in recorder.records()] == [503, 503, 200]
+        assert list(recorder.stats().values())[0]["errors"] == 2
+    
+    def test_async_pool_retries(self, http_server):
+        url, state = http_server
+        pool = rotaeno.api.session.AsyncSessionPool(backoff_factor=0)
+        
+        async def main():
+            try:
+                return await pool.get(f"{url}/flaky")
+            finally:
+                await pool.close()
+        
+        assert asyncio.run(main()).status_code == 200
+        assert state["failures"] == 2
+    
+    def test_async_processor_reuses_sync_parser(self, monkeypatch):
+        user_profile = {"serverCode": "cn", "objectID": "player", "sessionToken": ""}
+        followee_data = {"playerDisplayName": "Player", "playerAvatar": "default", "playerBackground": "background_default", "playerCharacter": "character_ilot", "playerLevel": 3, "songScores": {}}
+        raw_data = rotaeno.api.processor.Processor(region=rotaeno.api.model.ServerRegion.CN, user_profile=dict(user_profile)).followee_data_to_cloud_save_raw_data_format(followee_data=followee_data)
+        raw_data["results"][0]["updatedAt"] = "2026-01-01T00:00:00.000Z"
+        
+        async def get_cloud_save(self, get_object_id=False):
+            return raw_data
+        monkeypatch.setattr(rotaeno.api.request.AsyncUserAPI, "get_cloud_save", get_cloud_save)
+        
+        processor = rotaeno.api.processor.AsyncProcessor(region=rotaeno.api.model.ServerRegion.CN, user_profile=dict(user_profile))
+        cloud_save = asyncio.run(processor.get_cloud_save())
+        assert cloud_save == rotaeno.api.processor.Processor(region=rotaeno.api.model.ServerRegion.CN, user_profile=dict(user_profile)).get_cloud_save(raw_data=raw_data)
+        assert processor.cloud_save_updated_at == "2026-01-01T00:00:00.000Z"
+
+def checked_in_connections():
+    return rotaeno.database.song_data.song_data.engine.pool.checkedin()
+
+class TestRefreshScheduler:
+    def test_rate_limiter_spaces_requests(self):
+        limiter = rotaeno.api.refresh.HostRateLimiter(rate=50, burst=1)
+        
+        async def main():
+            started = time.monotonic()
+            for _ in range(6): await limiter.acquire()
+            return time.monotonic() - started
+        
+        assert asyncio.run(main()) >= 0.09
+    
+    def test_bulk_refresh_fetches_parses_and_writes_in_batches(self, tmp_path, monkeypatch):
+        player_data = rotaeno.database.player_data.PlayerData(str(tmp_path / "players.db"))
+        song_scores = rotaeno.database.player_song_data.PlayerSongDataManager(str(tmp_path / "songs"))
+        monkeypatch.setattr(rotaeno.database.player_data, "player_data", player_data)
+        monkeypatch.setattr(rotaeno.database.player_song_data, "player_song_score_manager", song_scores)
+        
+        followee_data = {"playerDisplayName": "Player", "playerAvatar": "default", "playerBackground": "background_default", "playerCharacter": "character_ilot", "playerLevel": 3, "songScores": {}}
+        raw_data = rotaeno.api.processor.Processor(region=rotaeno.api.model.ServerRegion.CN, user_profile={"serverCode": "cn"}).followee_data_to_cloud_save_raw_data_format(followee_data=followee_data)
+        active, max_active = 0, 0
+        
+        async def get_cloud_save(self, get_object_id=False):
+            nonlocal active, max_active
+            active += 1
+            max_active = max(max_active, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            if self.user_profile["objectID"] == "broken": raise ConnectionError("offline")
+            return raw_data
+        monkeypatch.setattr(rotaeno.api.request.AsyncUserAPI, "get_cloud_save", get_cloud_save)
+        
+        user_profiles = [{"serverCode": "cn", "objectID": f"player{index}", "sessionToken": ""} for index in range(12)]
+        user_profiles += [{"serverCode": "cn", "objectID": "broken", "sessionToken": ""}, {"serverCode": "cn", "objectID": "", "sessionToken": ""}]
+        scheduler = rotaeno.api.refresh.RefreshScheduler(concurrency=4, default_rate=1000, batch_size=5, parse_workers=2)
+        stats = asyncio.run(scheduler.run(user_profiles))
+        
+        assert stats["queued"] == 14 and stats["completed"] == 12 and stats["failed"] == 2
+        assert stats["batches"] >= 3
+        assert {failure["stage"] for failure in stats["failures"]} == {"fetch", "parse"}
+        assert stats["throughput"] > 0 and stats["maxQueueLag"] >= stats["averageQueueLag"] > 0
+        assert max_active == 4
+        assert player_data.get_player_latest("player11").name == "Player"
+        assert player_data.get_player_latest("broken") is None
+    
+    def test_parse_workers_drop_inherited_connections(self):
+        rotaeno.database.song_data.song_data.get_song("alive")
+        assert checked_in_connections() > 0
+        with concurrent.futures.ProcessPoolExecutor(1, initializer=rotaeno.api.refresh._init_parse_worker) as executor:
+            assert executor.submit(checked_in_connections).result() == 0
+
+class TestFriendAccountPool:
+    @pytest.fixture
+    def server(self, monkeypatch):
+        state = {"following": {}, "calls": [], "snapshots": []}
+        known = {f"p{index}" for index in range(10)}
+        
+        def social_data(short_id):
+            return {
+                "shortId": short_id.upper(), "rating": 10.0, "displayName": f"Player {short_id}", "playStats": {"all": {}}, "scores": {}, "isTwoWayFriend": False,
+                "backgroundId": "background_default", "characterId": "character_ilot", "badgeId": "default", "exp": 300
+            }
+        
+        async def follow_user(self, short_id):
+            state["calls"].append(("follow", self.user_profile["sessionToken"]))
+            await asyncio.sleep(0.001)
+            if short_id not in known: raise ValueError("unknown player")
+            state["following"].setdefault(self.user_profile["sessionToken"], set()).add(short_id)
+            return {"result": social_data(short_id)}
+        
+        async def get_followee_data(self):
+            state["calls"].append(("followees", self.user_profile["sessionToken"]))
+            following = sorted(state["following"].get(self.user_profile["sessionToken"], set()))
+            state["snapshots"].append(following)
+            return {"result": {"socialDatas": [social_data(short_id) for short_id in following]}}
+        
+        async def unfollow_user(self, short_id):
+            state["calls"].append(("unfollow", self.user_profile["sessionToken"]))
+            state["following"][self.user_profile["sessionToken"]].discard(short_id)
+            return {"result": {}}
+        
+        monkeypatch.setattr(rotaeno.api.request.AsyncUserAPI, "follow_user", follow_user)
+        monkeypatch.setattr(rotaeno.api.request.AsyncUserAPI, "get_followee_data", get_followee_data)
+        monkeypatch.setattr(rotaeno.api.request.AsyncUserAPI, "unfollow_user", unfollow_user)
+        return state
+    
+    def make_pool(self, size, **options):
+        accounts = [{"objectID": f"friend{index}", "sessionToken": f"token{index}"} for index in range(size)]
+        return rotaeno.api.friend.FriendAccountPool({rotaeno.api.model.ServerRegion.FRIEND_CN: accounts}, **options)
+    
+    def test_only_the_pool_assigns_accounts(self):
+        user_profile = {"serverCode": "friend_cn", "shortID": "p0"}
+        for region in [rotaeno.api.model.ServerRegion.FRIEND_CN, rotaeno.api.model.ServerRegion.FRIEND_GLOBAL]:
+            api = rotaeno.api.request.UserAPI(region=region, user_profile=user_profile)
+            assert not hasattr(api, "friend_account")
+        assert user_profile == {"serverCode": "friend_cn", "shortID": "p0"}
+    
+    def test_lookups_are_batched_per_account(self, server):
+        pool = self.make_pool(2, rate=1000)
+        followees = asyncio.run(pool.fetch_followees(rotaeno.api.model.ServerRegion.FRIEND_CN, ["P0", "p1", "p2", "p3", "p4", "p5", "missing"]))
+        assert sorted(followees) == ["p0", "p1", "p2", "p3", "p4", "p5"]
+        assert sum(call[0] == "followees" for call in server["calls"]) == 2
+        assert sum(call[0] == "follow" for call in server["calls"]) == 7
+        assert sum(call[0] == "unfollow" for call in server["calls"]) == 6
+        assert all(not following for following in server["following"].values())
+    
+    def test_leases_keep_concurrent_lookups_apart(self, server):
+        pool = self.make_pool(1, rate=200)
+        
+        async def main():
+            started = time.monotonic()
+            results = await asyncio.gather(*[pool.fetch_followees(rotaeno.api.model.ServerRegion.FRIEND_CN, short_ids) for short_ids in (["p0", "p1"], ["p2", "p3"])])
+            return results, time.monotonic() - started
+        
+        (first, second), elapsed = asyncio.run(main())
+        assert sorted(first) == ["p0", "p1"] and sorted(second) == ["p2", "p3"]
+        assert sorted(server["snapshots"]) == [["p0", "p1"], ["p2", "p3"]]
+        assert elapsed >= 9 / 200
+    
+    def test_every_call_takes_a_host_token(self, server):
+        class Limiter:
+            tokens = 0
+            async def acquire(self, tokens=1):
+                Limiter.tokens += tokens
+        
+        pool = self.make_pool(2, rate=1000)
+        asyncio.run(pool.fetch_followees(rotaeno.api.model.ServerRegion.FRIEND_CN, ["p0", "p1", "p2", "missing"], limiter=Limiter()))
+        assert Limiter.tokens == len(server["calls"]) == 4 + 2 + 3
+    
+    def test_regions_without_accounts_are_rejected(self):
+        pool = rotaeno.api.friend.FriendAccountPool({rotaeno.api.model.ServerRegion.FRIEND_CN: []})
+        with pytest.raises(ValueError):
+            asyncio.run(pool.fetch_followees(rotaeno.api.model.ServerRegion.FRIEND_CN, ["p0"]))
+    
+    def test_oversized_acquire_waits_for_its_tokens(self):
+        limiter = rotaeno.api.refresh.HostRateLimiter(rate=100, burst=1)
+        
+        async def main():
+            started = time.monotonic()
+            await limiter.acquire(6)
+            return time.monotonic() - started
+        
+        assert asyncio.run(main()) >= 0.045
+    
+    def test_scheduler_refreshes_friend_profiles_in_one_cycle(self, server, tmp_path, monkeypatch):
+        monkeypatch.setattr(rotaeno.database.player_data, "player_data", rotaeno.database.player_data.PlayerData(str(tmp_path / "players.db")))
+        monkeypatch.setattr(rotaeno.database.player_song_data, "player_song_score_manager", rotaeno.database.player_song_data.PlayerSongDataManager(str(tmp_path / "songs")))
+        monkeypatch.setattr(rotaeno.api.refresh, "friend_account_pool", self.make_pool(2, rate=1000))
+        
+        user_profiles = [{"serverCode": "friend_cn", "shortID": f"P{index}"} for index in range(5)] + [{"serverCode": "friend_cn", "shortID": "missing"}]
+        stats = asyncio.run(rotaeno.api.refresh.RefreshScheduler(default_rate=1000, parse_workers=2).run(user_profiles))
+        assert stats["completed"] == 5 and [failure["objectID"] for failure in stats["failures"]] == ["friend_cn_missing"]
+        assert sum(call[0] == "followees" for call in server["calls"]) == 2
+        assert rotaeno.database.player_data.player_data.get_player_latest("friend_cn_p3").name == "Player p3"